@@ -0,0 +1,520 @@
+# -*- coding: utf-8 -*-
+"""
+EA Innovation AI Agent (triple poder: cálculo, gráfica e historial).
+
+La página importa este módulo con la primera pregunta (escrita o por voz),
+no en cada arranque: google.generativeai es la dependencia más pesada de la
+app y solo se carga en cargar_modelo(). La selección del modelo incluye
+list_models(), una llamada de red, y se hace una vez por proceso y clave de
+API en lugar de en cada rerun.
+
+Las herramientas leen los datos de la sesión que está preguntando desde un
+contexto por hilo (ver sesion()), así que un solo modelo sirve a todas las
+sesiones.
+"""
+
+import json
+import threading
+from contextlib import contextmanager
+
+import altair as alt
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+import consultas
+import telemetria
+import termodinamica
+import voz
+from alertas import enviar_alerta_whatsapp
+
+_sesion = threading.local()
+
+
+@contextmanager
+def sesion(grafo, registro_fugas):
+    """Fija los datos de la sesión para las herramientas que el modelo llame en este hilo."""
+    _sesion.grafo, _sesion.registro_fugas = grafo, registro_fugas
+    try:
+        yield
+    finally:
+        del _sesion.grafo, _sesion.registro_fugas
+
+
+def _con_columnas(df, *nombres):
+    """df con las columnas pedidas; en esquema compacto las derivables se reconstruyen (None si alguna no existe)."""
+    faltantes = [n for n in nombres if n not in df.columns]
+    if not faltantes:
+        return df
+    if any(n not in termodinamica.COLUMNAS_DERIVABLES for n in faltantes):
+        return None
+    return df.assign(**{n: df.ea[n] for n in faltantes})
+
+
+def _grafo():
+    return _sesion.grafo
+
+
+def calculadora_expert_ea(temp_c: float, presion_psi: float):
+    """Calcula Z, Fv y M3 usando las fórmulas propietarias de Erik Armenta."""
+    _, _, z_factor, fv, vol_m3 = termodinamica.calcular_factores(temp_c, presion_psi)
+    return {"Factor_Z": round(float(z_factor), 6), "Factor_Fv": round(float(fv), 4), "Volumen_M3": round(float(vol_m3), 4)}
+
+
+MAX_PASOS_BARRIDO = 25
+
+
+def barrido_what_if(temp_min_c: float, temp_max_c: float, presion_min_psi: float, presion_max_psi: float,
+                    pasos_temp: int = 5, pasos_presion: int = 7):
+    """Escenarios what-if: volumen M3 en toda la malla temperatura x presión, con mapa de calor."""
+    pasos_temp = int(min(max(pasos_temp, 1), MAX_PASOS_BARRIDO))
+    pasos_presion = int(min(max(pasos_presion, 1), MAX_PASOS_BARRIDO))
+    temps = np.linspace(temp_min_c, temp_max_c, pasos_temp).round(2)
+    presiones = np.linspace(presion_min_psi, presion_max_psi, pasos_presion).round(2)
+    malla = termodinamica.barrido(temps, presiones)
+
+    chart = alt.Chart(malla).mark_rect().encode(
+        x=alt.X('Presión:O', title='Presión (PSI)'),
+        y=alt.Y('Temperatura Celsius:O', title='Temperatura (°C)', sort='descending'),
+        color=alt.Color('Volumen_M3:Q', title='Volumen M3', scale=alt.Scale(scheme='blues')),
+        tooltip=['Temperatura Celsius', 'Presión', alt.Tooltip('Factor_Z:Q', format='.6f'),
+                 alt.Tooltip('Volumen_M3:Q', format='.2f')]
+    ).properties(height=300)
+    st.altair_chart(chart, width="stretch")
+
+    tabla = malla.pivot(index='Temperatura Celsius', columns='Presión', values='Volumen_M3').round(2)
+    return {
+        "Volumen_M3_por_Temperatura_y_Presion": {
+            f"{t:g} C": {f"{p:g} PSI": float(v) for p, v in fila.items()} for t, fila in tabla.iterrows()
+        },
+        "Volumen_Min_M3": round(float(malla['Volumen_M3'].min()), 2),
+        "Volumen_Max_M3": round(float(malla['Volumen_M3'].max()), 2),
+    }
+
+
+def presion_para_volumen_ea(volumenes_m3: list[float], temp_c: float = 25.0):
+    """Presión (PSI) necesaria para alcanzar cada volumen objetivo (M3) a la temperatura dada."""
+    presiones = np.atleast_1d(termodinamica.presion_para_volumen(np.asarray(volumenes_m3[:50], dtype=float), temp_c))
+    return {
+        "Temperatura_C": temp_c,
+        "Objetivos": [
+            {"Volumen_M3": float(v), "Presion_PSI": None if np.isnan(p) else round(float(p), 2)}
+            for v, p in zip(volumenes_m3[:50], presiones)
+        ],
+        "Nota": f"None = fuera del rango 0-{termodinamica.PRESION_MAX_PSI:g} PSI.",
+    }
+
+
+def crear_grafica_agente(variable_y: str, variable_x: str = 'Marca temporal'):
+    """Genera gráficas interactivas de CUALQUIER variable del dataset."""
+    df_vista = _con_columnas(_grafo().obtener('vista'), variable_y, variable_x)
+    if df_vista is not None:
+        chart = alt.Chart(df_vista).mark_line(point=True, color='#5271ff').encode(
+            x=alt.X(f'{variable_x}:T' if 'temporal' in variable_x else f'{variable_x}:Q', title=variable_x),
+            y=alt.Y(f'{variable_y}:Q', title=variable_y, scale=alt.Scale(zero=False)),
+            tooltip=[variable_x, variable_y]
+        ).interactive().properties(height=350)
+        st.altair_chart(chart, width="stretch")
+        return f"Gráfica de {variable_y} generada."
+    return "Error: Variables no encontradas."
+
+
+def agrupar_datos_agente(columna_agrupar: str, columna_valor: str, operacion: str = 'sum'):
+    """Agrupa datos por una columna y aplica operaciones matemáticas (sum, mean, count, max, min)."""
+    df_vista = _grafo().obtener('vista')
+    for columna in (columna_agrupar, columna_valor):
+        if _con_columnas(df_vista, columna) is None:
+            return f"Error: La columna '{columna}' no existe en el dataset."
+    df_vista = _con_columnas(df_vista, columna_agrupar, columna_valor)
+
+    operaciones_validas = {'sum': 'sum', 'mean': 'mean', 'count': 'count', 'max': 'max', 'min': 'min',
+                           'promedio': 'mean', 'suma': 'sum', 'total': 'sum', 'contar': 'count',
+                           'maximo': 'max', 'minimo': 'min'}
+
+    op = operaciones_validas.get(operacion.lower(), 'sum')
+
+    try:
+        grupo = df_vista.groupby(columna_agrupar)[columna_valor].agg(op)
+        resultado = {
+            "columna_agrupada": columna_agrupar,
+            "columna_valor": columna_valor,
+            "operacion": op,
+            "total_grupos": len(grupo),
+            "datos": {str(k): round(v, 4) if isinstance(v, float) else v for k, v in grupo.items()}
+        }
+        return resultado
+    except Exception as e:
+        return f"Error al agrupar: {str(e)}"
+
+
+def crear_grafica_barras_agente(variable_x: str, variable_y: str, titulo: str = 'Gráfica de Barras'):
+    """Genera gráficas de barras interactivas para variables categóricas y numéricas."""
+    df_vista = _grafo().obtener('vista')
+    for columna in (variable_x, variable_y):
+        if _con_columnas(df_vista, columna) is None:
+            return f"Error: La columna '{columna}' no existe en el dataset."
+    df_vista = _con_columnas(df_vista, variable_x, variable_y)
+
+    try:
+        # Determinar si X es temporal, categórica o numérica
+        if 'temporal' in variable_x.lower() or pd.api.types.is_datetime64_any_dtype(df_vista[variable_x]):
+            x_encoding = alt.X(f'{variable_x}:T', title=variable_x)
+        elif pd.api.types.is_numeric_dtype(df_vista[variable_x]):
+            x_encoding = alt.X(f'{variable_x}:Q', title=variable_x)
+        else:
+            x_encoding = alt.X(f'{variable_x}:N', title=variable_x, sort='-y')
+
+        chart = alt.Chart(df_vista).mark_bar(color='#5271ff').encode(
+            x=x_encoding,
+            y=alt.Y(f'{variable_y}:Q', title=variable_y),
+            tooltip=[variable_x, variable_y]
+        ).interactive().properties(height=350, title=titulo)
+
+        st.altair_chart(chart, width="stretch")
+        return f"Gráfica de barras '{titulo}' generada: {variable_x} vs {variable_y}."
+    except Exception as e:
+        return f"Error al crear gráfica de barras: {str(e)}"
+
+
+def analizar_tendencias_historicas(metrica: str):
+    """Consulta estadísticas de TODO el historial registrado."""
+    df_full = _grafo().obtener('historial')
+    try:
+        serie = df_full.ea[metrica] # También las columnas derivables en esquema compacto
+    except KeyError:
+        return "Métrica no válida."
+    return {
+        # float(): en esquema compacto las columnas son float32, que el SDK no serializa
+        "Metrica": metrica, "Promedio": round(float(serie.mean()), 2),
+        "Max": round(float(serie.max()), 2), "Min": round(float(serie.min()), 2),
+        "Total_Muestras": len(df_full)
+    }
+
+
+def pronosticar_consumo(horas: float = 24):
+    """Pronostica volumen, banda de confianza, consumo esperado y tiempo hasta el volumen mínimo."""
+    pron = _grafo().obtener('pronostico')
+    if not pron.get('lecturas'):
+        return "No hay datos suficientes para pronosticar."
+    horas = max(0.0, min(float(horas), 24 * 7))
+    centro, inferior, superior = (float(v) for v in pron['modelo'].intervalo(horas))
+    horas_umbral = pron['horas_para_umbral']
+    return {
+        "Horizonte_h": horas,
+        "Volumen_Pronosticado_M3": round(centro, 2),
+        "Intervalo_95_M3": [round(inferior, 2), round(superior, 2)],
+        "Tendencia_M3_por_h": round(pron['pendiente_m3_h'], 4),
+        "Consumo_Esperado_M3": round(pron['consumo_24h_m3'] * horas / 24, 2),
+        "Volumen_Minimo_M3": pron['umbral_m3'],
+        "Horas_Hasta_Minimo": None if horas_umbral is None else round(horas_umbral, 1),
+        "Fecha_Estimada_Minimo": None if pron['fecha_umbral'] is None else pron['fecha_umbral'].strftime('%Y-%m-%d %H:%M'),
+    }
+
+
+def consultar_fugas(dias: int = 7):
+    """Consulta los intervalos de posible fuga detectados (volumen cayendo con temperatura estable)."""
+    desde = pd.Timestamp.now() - pd.Timedelta(days=max(1, int(dias)))
+    intervalos = _sesion.registro_fugas.consultar(desde)
+    return {
+        "Dias_Consultados": int(dias),
+        "Intervalos_Detectados": len(intervalos),
+        "Perdida_Total_M3": round(float(intervalos['perdida_m3'].sum()), 2) if len(intervalos) else 0.0,
+        "Intervalos": [
+            {"Inicio": f.inicio.strftime('%Y-%m-%d %H:%M'), "Fin": f.fin.strftime('%Y-%m-%d %H:%M'),
+             "Pendiente_M3_h": f.pendiente_m3_h, "Perdida_M3": f.perdida_m3, "Temp_Media_C": f.temp_media_c}
+            for f in intervalos.head(20).itertuples()
+        ],
+    }
+
+
+def consumo_entre(inicio: str, fin: str):
+    """Consumo y recargas de helio entre dos fechas/horas ('YYYY-MM-DD HH:MM'), sin escanear el historial."""
+    try:
+        desde, hasta = pd.Timestamp(inicio), pd.Timestamp(fin)
+    except ValueError as e:
+        return f"Error: fecha no válida ({e}). Usa el formato 'YYYY-MM-DD HH:MM'."
+    indice = _grafo().obtener('indice_consumo')
+    resumen = indice.rango(desde, hasta)
+    return {
+        "Inicio": desde.strftime('%Y-%m-%d %H:%M'),
+        "Fin": hasta.strftime('%Y-%m-%d %H:%M'),
+        "Consumo_M3": round(resumen['consumo_m3'], 3),
+        "Recargas_M3": round(resumen['recarga_m3'], 3),
+        "Subidas_Menores_M3": round(resumen['subida_menor_m3'], 3),
+        "Neto_M3": round(resumen['neto_m3'], 3),
+        "Eventos_Recarga": [
+            {"Inicio": ini.strftime('%Y-%m-%d %H:%M'), "Fin": fin_recarga.strftime('%Y-%m-%d %H:%M'), "M3": float(m3)}
+            for ini, fin_recarga, m3 in indice.recargas(desde, hasta).head(20).itertuples(index=False, name=None)
+        ],
+        "Lecturas": resumen['lecturas'],
+    }
+
+
+def consultar_sql(consulta: str):
+    """Ejecuta una consulta SQL de solo lectura (un SELECT) sobre las tablas historial, cuarentena, fugas y correcciones."""
+    motor = _grafo().obtener('motor_sql')
+    try:
+        with telemetria.etapa("consulta_sql"):
+            resultado, truncado = motor.consultar(consulta)
+    except Exception as e:
+        return f"Error en la consulta: {e}"
+    tabla = json.loads(resultado.to_json(orient='split', index=False, date_format='iso'))
+    return {
+        "Columnas": tabla['columns'],
+        "Filas": tabla['data'],
+        "Truncado": truncado, # Hay más de consultas.MAX_FILAS_SQL filas: agrega o filtra más
+    }
+
+
+def obtener_diagnostico_avanzado():
+    """Analiza estadísticamente el historial para detectar anomalías y estabilidad."""
+    grafo = _grafo()
+    if grafo.obtener('historial').empty:
+        return "No hay datos suficientes para un diagnóstico."
+
+    # Cálculos estadísticos para el Boxplot e Histograma (artefacto por versión del historial)
+    stats = grafo.obtener('estadisticas')
+    intervalos_fuga = grafo.obtener('fugas')
+
+    # Interpretación automática para el Agente
+    diagnostico = (
+        f"Análisis EA Innovation:\n"
+        f"- Estabilidad: {'Alta' if stats['Desviacion_Estandar'] < 1 else 'Inestable'}\n"
+        f"- Alertas registradas: {stats['Outliers_Detectados']} eventos por encima de 5M3.\n"
+        f"- Punto de operación común: {stats['Presion_Mas_Frecuente']} PSIA.\n"
+        f"- Posibles fugas (caída sostenida con temperatura estable): {len(intervalos_fuga)} intervalos.\n"
+        f"- Calidad de datos: {grafo.obtener('validacion')['conteos']['cuarentena']} lecturas en cuarentena.\n"
+        f"El Factor Z medio de {stats['Factor_Z_Promedio']} indica la eficiencia termodinámica actual."
+    )
+    return diagnostico
+
+
+INSTRUCCIONES_AGENTE = f"""
+    Eres el Agente Senior de EA Innovation. 'Accuracy is our signature'.
+        - Tienes acceso a herramientas de cálculo, gráficas y análisis histórico.
+        - NUEVA CAPACIDAD: Puedes enviar alertas de WhatsApp ante anomalías.
+
+        ## CAPACIDAD DE VOZ - GUÍA DE INTERPRETACIÓN
+        Puedes recibir comandos por voz. Cuando el texto viene marcado como [VOZ], interpreta la solicitud hablada
+        y mapéala a la herramienta correcta. Ejemplos de comandos hablados y su acción:
+
+        ### calculadora_expert_ea (Cálculos termodinámicos con temperatura/presión):
+        - "Calcular volumen para 25 grados y 100 PSI" → usa calculadora_expert_ea con temp=25, presion=100
+        - "Cuánto helio necesito a 30 grados centígrados" → usa calculadora_expert_ea con temp=30
+        - "Haz un cálculo a 50 PSI y temperatura ambiente" → usa calculadora_expert_ea con presion=50
+        - "Dame el volumen corregido para presión de 150" → usa calculadora_expert_ea con presion=150
+
+        ### barrido_what_if (Escenarios what-if sobre rangos de temperatura y presión):
+        - "Qué volumen tendríamos entre 15 y 35 grados y de 50 a 200 PSI" → usa barrido_what_if con esos rangos
+        - "Compara escenarios de presión de 100 a 180 a temperatura de 20 a 30" → usa barrido_what_if
+        - Prefiere barrido_what_if a llamar calculadora_expert_ea muchas veces.
+
+        ### presion_para_volumen_ea (Presión necesaria para un volumen objetivo):
+        - "A qué presión llego a 120 metros cúbicos a 25 grados" → usa presion_para_volumen_ea con volumenes_m3=[120], temp_c=25
+        - "Qué presión necesito para 80, 100 y 150 M3" → usa presion_para_volumen_ea con los tres volúmenes
+
+        ### crear_grafica_agente (Gráficas de línea y visualizaciones):
+        - "Muéstrame gráfica de presión" → usa crear_grafica_agente tipo="presion"
+        - "Hazme una gráfica de consumo" → usa crear_grafica_agente tipo="consumo"
+        - "Quiero ver la tendencia de temperatura" → usa crear_grafica_agente tipo="temperatura"
+        - "Gráfica de los últimos datos" → usa crear_grafica_agente con datos recientes
+
+        ### crear_grafica_barras_agente (Gráficas de barras):
+        - "Hazme una gráfica de barras de consumo" → usa crear_grafica_barras_agente
+        - "Muestra barras de presión por fecha" → usa crear_grafica_barras_agente
+        - "Quiero ver barras del volumen" → usa crear_grafica_barras_agente
+        - "Gráfica de barras comparando temperatura" → usa crear_grafica_barras_agente
+
+        ### agrupar_datos_agente (Agrupación y agregación de datos):
+        - "Agrupa el consumo por día" → usa agrupar_datos_agente
+        - "Dame el total de presión agrupado por hora" → usa agrupar_datos_agente con operacion='sum'
+        - "Cuál es el promedio de volumen por fecha" → usa agrupar_datos_agente con operacion='mean'
+        - "Cuenta cuántas lecturas hay por día" → usa agrupar_datos_agente con operacion='count'
+
+        ### analizar_tendencias_historicas (Estadísticas y análisis):
+        - "Analiza las tendencias del mes" → usa analizar_tendencias_historicas
+        - "Dame estadísticas de consumo" → usa analizar_tendencias_historicas
+        - "Cuál es el promedio histórico" → usa analizar_tendencias_historicas
+        - "Muéstrame el análisis de datos pasados" → usa analizar_tendencias_historicas
+
+        ### enviar_alerta_whatsapp (Alertas y notificaciones):
+        - "Envía alerta al ingeniero" → usa enviar_alerta_whatsapp
+        - "Notifica por WhatsApp que hay problema" → usa enviar_alerta_whatsapp
+        - "Avísame si esto vuelve a pasar" → configura enviar_alerta_whatsapp
+        - "Manda mensaje de emergencia" → usa enviar_alerta_whatsapp con prioridad alta
+
+        ### pronosticar_consumo (Pronóstico y autonomía):
+        - "Cuándo se vacía el recuperador" → usa pronosticar_consumo
+        - "Cuánto helio vamos a consumir mañana" → usa pronosticar_consumo con horas=24
+        - "Qué volumen tendremos en 6 horas" → usa pronosticar_consumo con horas=6
+
+        ### consumo_entre (Consumo entre dos fechas):
+        - "Cuánto helio usamos entre el lunes 06:00 y el miércoles 18:00" → usa consumo_entre con inicio y fin en formato 'YYYY-MM-DD HH:MM'
+        - "Cuánto recargamos la semana pasada" → usa consumo_entre y reporta Recargas_M3
+
+        ### consultar_fugas (Fugas detectadas):
+        - "Hubo fugas esta semana" → usa consultar_fugas con dias=7
+        - "Cuánto helio perdimos por fugas este mes" → usa consultar_fugas con dias=30
+
+        ### consultar_sql (Consultas SQL de solo lectura sobre el historial):
+        - "Cuánto consumimos por día cuando la presión estuvo entre 140 y 160" → usa consultar_sql con GROUP BY DATE(marca_temporal)
+        - "Qué filas corregidas tienen temperatura mayor a 30" → usa consultar_sql uniendo historial y correcciones por fila
+        - Usa consultar_sql cuando ninguna otra herramienta cubra la pregunta. Agrega en SQL (SUM, AVG, GROUP BY)
+          en lugar de pedir filas crudas; el resultado se corta a {consultas.MAX_FILAS_SQL} filas.
+        - Tablas disponibles:
+{consultas.esquema()}
+
+        ### obtener_diagnostico_avanzado (Diagnóstico y estabilidad):
+        - "Dame un diagnóstico del sistema" → usa obtener_diagnostico_avanzado
+        - "Cómo está la estabilidad" → usa obtener_diagnostico_avanzado para boxplot
+        - "Analiza si hay anomalías" → usa obtener_diagnostico_avanzado
+        - "Revisa el histograma de frecuencia" → usa obtener_diagnostico_avanzado
+
+        ## REGLAS OPERATIVAS
+        - REGLA DE ORO: Si detectas un consumo > 5 M3 o una anomalía crítica, ES OBLIGATORIO que primero ejecutes la herramienta 'enviar_alerta_whatsapp' ANTES de dar tu respuesta de texto. No solo digas que la enviaste, ¡ejecútala!
+        - Si el usuario te pide 'Avisame si esto vuelve a pasar' o si detectas un consumo > 5 M3,
+          ejecuta 'enviar_alerta_whatsapp' con un resumen técnico.
+        - CUANDO EL USUARIO PREGUNTE POR LAS GRÁFICAS DE TABS O ESTADÍSTICA: Usa 'obtener_diagnostico_avanzado' para leer la estabilidad (boxplot) y frecuencia (histograma).
+        - Si detectas inestabilidad (desviación estándar alta), advierte al Ingeniero Armenta sobre posibles fugas o errores de lectura.
+        - Para confirmar una sospecha de fuga usa 'consultar_fugas': son intervalos con caída sostenida de volumen a temperatura estable.
+        """
+
+# Herramientas con efectos fuera de la respuesta: un turno que las llama no se reutiliza (ver cuota.py)
+CON_EFECTOS = {"enviar_alerta_whatsapp", "crear_grafica_agente", "crear_grafica_barras_agente", "barrido_what_if"}
+
+# Cada herramienta registra su span 'herramienta:<nombre>' (ver prueba_agente.py)
+HERRAMIENTAS = [telemetria.instrumentar(herramienta) for herramienta in [
+    calculadora_expert_ea,
+    barrido_what_if,
+    presion_para_volumen_ea,
+    crear_grafica_agente,
+    crear_grafica_barras_agente,
+    agrupar_datos_agente,
+    analizar_tendencias_historicas,
+    enviar_alerta_whatsapp,
+    obtener_diagnostico_avanzado, # <-- PODER AÑADIDO
+    pronosticar_consumo,
+    consultar_fugas,
+    consumo_entre,
+    consultar_sql
+]]
+
+PREFIJO_VOZ = """[🎤 ENTRADA POR VOZ]
+El usuario está usando ENTRADA POR VOZ. Interpreta su solicitud hablada y usa las herramientas apropiadas según lo que pida:
+- Cálculos de helio/volumen/presión → usa calculadora_expert_ea
+- Escenarios what-if sobre rangos → usa barrido_what_if; presión para un volumen objetivo → usa presion_para_volumen_ea
+- Gráficas o visualizaciones → usa crear_grafica_agente
+- Análisis o tendencias → usa analizar_tendencias_historicas
+- Alertas o notificaciones → usa enviar_alerta_whatsapp
+- Diagnóstico del sistema → usa obtener_diagnostico_avanzado
+- Pronóstico, autonomía o consumo futuro → usa pronosticar_consumo
+- Preguntas ad hoc sobre el historial (filtros, agrupaciones) → usa consultar_sql
+
+SOLICITUD DE VOZ: """
+
+
+# CONFIGURACIÓN DEL CEREBRO (SELECTOR DE ALTA DISPONIBILIDAD)
+@st.cache_resource(show_spinner="🤖 Conectando con Gemini...")
+def cargar_modelo(api_key, endpoint=None):
+    """Configura Gemini y elige el modelo una sola vez por proceso, clave y endpoint."""
+    import google.generativeai as genai
+
+    if endpoint:
+        # Endpoint alterno (p. ej. el simulador de prueba_carga.py)
+        genai.configure(api_key=api_key, transport="rest", client_options={"api_endpoint": endpoint})
+    else:
+        genai.configure(api_key=api_key)
+
+    # 1. Listamos todos los modelos activos en tu cuenta
+    modelos_disponibles = [m.name for m in genai.list_models() if 'generateContent' in m.supported_generation_methods]
+
+    # 2. PRIORIDAD: Buscamos el 1.5-flash (Tiene 1,500 solicitudes al día de cuota)
+    # Filtramos para NO usar el 2.0 o 2.5 que te están bloqueando
+    modelo_seleccionado = next(
+        (m for m in modelos_disponibles if '1.5-flash' in m and '2.0' not in m and '2.5' not in m),
+        None
+    )
+
+    # 3. FALLBACK: Si no lo encuentra, usa cualquiera que no sea de la serie 2.x
+    if not modelo_seleccionado:
+        modelo_seleccionado = next((m for m in modelos_disponibles if '1.5' in m), modelos_disponibles[0])
+
+    return genai.GenerativeModel(
+        model_name=modelo_seleccionado,
+        tools=HERRAMIENTAS,
+        system_instruction=INSTRUCCIONES_AGENTE
+    )
+
+
+def _historia_gemini(historia) -> list:
+    """Mensajes previos como turnos alternados usuario/modelo que empiezan por el usuario y terminan en el modelo."""
+    turnos = []
+    for m in historia:
+        rol = "model" if m["role"] == "assistant" else "user"
+        if turnos and turnos[-1]["role"] == rol: # Un turno que falló deja dos mensajes seguidos del mismo rol
+            turnos[-1]["parts"].append(m["content"])
+        elif turnos or rol == "user":
+            turnos.append({"role": rol, "parts": [m["content"]]})
+    if turnos and turnos[-1]["role"] == "user":
+        turnos.pop()
+    return turnos
+
+
+def responder(modelo, gestor, entrada_usuario: str, por_voz: bool = False, historia=()) -> tuple:
+    """
+    (texto, origen) de un turno de chat sobre la sesión fijada con sesion().
+    'historia' son los últimos mensajes de la conversación ({'role', 'content'}):
+    solo esa ventana viaja al modelo, sin los datos de turnos anteriores.
+    """
+    # Indicar si el mensaje vino por voz con instrucciones claras para el modelo
+    prefijo = PREFIJO_VOZ if por_voz else "PREGUNTA: "
+    with telemetria.etapa("prompt_agente"):
+        contexto = f"DATOS RECIENTES:\n{_grafo().obtener('contexto_agente')}\n\n{prefijo}{entrada_usuario}"
+        previos = _historia_gemini(historia)
+
+    def generar_respuesta():
+        chat = modelo.start_chat(history=previos, enable_automatic_function_calling=True)
+        response = chat.send_message(contexto)
+        nuevos = chat.history[len(previos):]
+        # Cada respuesta nueva del modelo en el historial es una solicitud a la API
+        solicitudes = sum(1 for c in nuevos if c.role == "model")
+        con_efectos = any(p.function_call.name in CON_EFECTOS for c in nuevos for p in c.parts)
+        return response.text, solicitudes, not con_efectos
+
+    def respuesta_sin_cuota():
+        return ("⚠️ **Límite de solicitudes de Gemini alcanzado.** Diagnóstico precalculado:\n\n"
+                + obtener_diagnostico_avanzado())
+
+    # Misma pregunta y conversación sobre los mismos datos (y ventana): se une a la petición en vuelo o reutiliza la respuesta
+    grafo = _grafo()
+    clave = (modelo.model_name, grafo.version('historial'), grafo.version('vista'), contexto,
+             tuple((m["role"], m["content"]) for m in historia))
+    with telemetria.etapa("gemini_chat"):
+        return gestor.responder(clave, generar_respuesta, respuesta_sin_cuota)
+
+
+def procesar_audio_voz(audio_bytes: bytes, modelo, gestor) -> str:
+    """
+    Procesa audio grabado del micrófono usando Gemini.
+    El audio viaja inline en memoria y se transcribe fuera del hilo de render;
+    las grabaciones repetidas se resuelven desde la cache por digest.
+    """
+    if not audio_bytes:
+        return None
+    # Una grabación nueva es una solicitud a Gemini: cuenta contra la misma cuota que el chat
+    if voz.transcripcion_en_cache(audio_bytes) is None and not gestor.reservar():
+        st.warning("⏳ Límite de solicitudes de Gemini alcanzado. Escribe tu pregunta o intenta más tarde.")
+        return None
+
+    try:
+        with telemetria.etapa("transcripcion_voz"):
+            return voz.transcribir(audio_bytes, voz.TranscriptorGemini(modelo.model_name))
+    except voz.FuturesTimeout:
+        st.warning(f"⏱️ La transcripción excedió {voz.TIMEOUT_VOZ_S:.0f}s. Intenta de nuevo.")
+        return None
+    except voz.VozSaturada as e:
+        st.warning(f"⏳ {e}")
+        return None
+    except Exception as e:
+        st.error(f"Error procesando audio: {e}")
+        return None
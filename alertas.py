@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""
+Servicio de alertas EA Innovation por WhatsApp (UltraMsg).
+
+La página lo importa solo cuando una lectura supera el umbral o cuando el
+agente envía una alerta; requests se carga al enviar el primer mensaje.
+
+Cada lectura alerta una sola vez por proceso: el fragmento de KPIs corre en
+todas las sesiones abiertas, y sin un registro compartido cada pestaña
+enviaría su propio WhatsApp por la misma lectura.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+
+import streamlit as st
+
+import telemetria
+
+UMBRAL_CONSUMO_M3 = 5
+MAX_LECTURAS_ALERTADAS = 256
+
+
+@st.cache_resource
+def _lecturas_alertadas():
+    """Marcas temporales ya notificadas, compartidas por todas las sesiones."""
+    return threading.Lock(), OrderedDict()
+
+
+def _reclamar(marca) -> bool:
+    """True solo para la primera sesión que reclama la lectura."""
+    lock, alertadas = _lecturas_alertadas()
+    with lock:
+        if marca in alertadas:
+            return False
+        alertadas[marca] = True
+        while len(alertadas) > MAX_LECTURAS_ALERTADAS:
+            alertadas.popitem(last=False)
+        return True
+
+
+def enviar_alerta_whatsapp(mensaje: str):
+    try:
+        import requests
+
+        instance = str(st.secrets["WHA_INSTANCE"]).strip()
+        token = str(st.secrets["WHA_TOKEN"]).strip()
+        phone = str(st.secrets["WHA_PHONE"]).replace("+", "").strip()
+
+        if not instance.startswith("instance"):
+            instance = f"instance{instance}"
+
+        url = f"{os.environ.get('EA_ULTRAMSG_URL', 'https://api.ultramsg.com')}/{instance}/messages/chat"
+        payload = {"token": token, "to": phone, "body": mensaje}
+        headers = {'content-type': 'application/x-www-form-urlencoded'}
+
+        with telemetria.etapa("alerta_post"):
+            response = requests.post(url, data=payload, headers=headers, timeout=10)
+        return "✅ Alerta enviada" if response.status_code == 200 else f"❌ Error {response.status_code}"
+    except Exception as e:
+        return f"⚠️ Falla: {str(e)}"
+
+
+def check_and_notify(last_record):
+    """Verifica si es un registro nuevo y envía alerta si supera el umbral."""
+    consumo_actual = last_record['Consumo Absoluto M3']
+    if consumo_actual > UMBRAL_CONSUMO_M3:
+        # Solo dispara si es un registro nuevo (Marca temporal aún no alertada en el proceso)
+        if _reclamar(last_record['Marca temporal']):
+            msg_automatico = (
+                f"🚨 *ALERTA AUTOMÁTICA EA*\n"
+                f"Consumo Detectado: {consumo_actual:.2f} M3\n"
+                f"Presión: {last_record['Vessel Pressure']:.1f} PSIA\n"
+                f"Factor Z: {last_record['Compressibility Factor (Z)']:.6f}\n"
+                f"Hora: {last_record['Marca temporal'].strftime('%H:%M:%S')}"
+            )
+            resultado = enviar_alerta_whatsapp(msg_automatico)
+            st.toast(resultado)
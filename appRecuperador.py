@@ -7,10 +7,26 @@ Created on Tue Jan 13 07:24:32 2026
 
 import streamlit as st
 import pandas as pd
-import altair as alt
 import os
 import time
-from audio_recorder_streamlit import audio_recorder
+import uuid
+import exportar
+import ediciones
+import correcciones
+import termodinamica  # noqa: F401 (registra el accesor df.ea)
+import graficas
+import telemetria
+import perfilador
+import ingesta
+import pronostico
+import fugas
+import consumo
+import artefactos
+import calidad
+import cuota
+import sesiones
+import historial_chat
+from termodinamica import calculate_thermodynamics
 
 # --- 1. CONFIGURACIÓN DE PÁGINA ---
 st.set_page_config(
@@ -19,128 +35,186 @@ st.set_page_config(
     layout="wide",
     initial_sidebar_state="expanded"
 )
+telemetria.iniciar_rerun()
+inicio_rerun = time.perf_counter()
+# Perfilado opcional del rerun completo (EA_PERFIL=1 o ?perfil=1)
+perfilador.descartar()
+perfil_rerun = perfilador.iniciar("rerun") if perfilador.solicitado(st.query_params) else None
 
 # --- 3. LÓGICA TERMODINÁMICA (Mantenida intacta) ---
 sheet_id = "11LjeT8pJLituxpCxYKxWAC8ZMFkgtts6sJn3X-F35A4"
-csv_url = f"https://docs.google.com/spreadsheets/d/{sheet_id}/export?format=csv&gid=430617011"
-
-@st.cache_data(ttl=60)
-def fetch_raw_data():
-    df = pd.read_csv(csv_url)
-    df['Marca temporal'] = pd.to_datetime(df['Marca temporal'])
-    df = df.sort_values('Marca temporal').reset_index(drop=True)
+csv_url = os.environ.get(
+    "EA_SHEET_CSV_URL", # Permite apuntar a una hoja local (pruebas de carga)
+    f"https://docs.google.com/spreadsheets/d/{sheet_id}/export?format=csv&gid=430617011"
+)
+# Cada cuánto se consulta la hoja y se refrescan los KPIs en vivo
+INTERVALO_VIVO_S = float(os.environ.get("EA_INTERVALO_VIVO_S", "15"))
+
+@st.cache_resource(ttl=INTERVALO_VIVO_S, show_spinner=False)
+def descargar_hoja():
+    """Bytes de la hoja y su digest, compartidos (sin copiar) por todas las sesiones."""
+    with telemetria.etapa("fetch_hoja"):
+        contenido = ingesta.descargar(csv_url)
+    return ingesta.digest(contenido), contenido
+
+def parsear_hoja(digest, contenido):
+    # Perfil de parseo tipado; una descarga idéntica reutiliza el parseo anterior
+    with telemetria.etapa("parseo_hoja") as span:
+        df = ingesta.parsear_cacheado(contenido, digest)
+        span.filas = len(df)
     return df
 
-def calculate_thermodynamics(df_input):
-    df = df_input.copy()
-    df['Marca temporal'] = pd.to_datetime(df['Marca temporal'])
-    df = df.sort_values('Marca temporal') # Re-ordenar por si cambió el tiempo
-
-    cols_check = ['Temperatura Celsius', 'Presión']
-    for col in cols_check:
-        df[col] = pd.to_numeric(df[col], errors='coerce')
-
-    df = df.dropna(subset=cols_check)
-    BASE_VOLUME = 450.00
-
-    df['Temperatura Fahrenheit'] = df['Temperatura Celsius'] * 1.8 + 32
-    df['Temperature Over'] = df['Temperatura Fahrenheit']
-    df['Vessel Pressure'] = df['Presión'] + 14.7
-
-    t_term = 459.7 + df['Temperature Over']
-    part1 = 0.000102297 - (0.000000192998 * t_term) + (0.00000000011836 * (t_term**2))
-    df['Compressibility Factor (Z)'] = 1 + (part1 * df['Vessel Pressure']) - (0.0000000002217 * (df['Vessel Pressure']**2))
-
-    f_temp = 529.7 / (df['Temperature Over'] + 459.7)
-    f_pres = df['Vessel Pressure'] / 14.7
-    f_comp = 1.00049 / df['Compressibility Factor (Z)']
-    f_exp_metal = 1 + (0.0000189 * (df['Temperature Over'] - 70))
-    f_pres_efect = 1 + (0.00000074 * df['Vessel Pressure'])
-    df['Volume Factor (Fv)'] = f_temp * f_pres * f_comp * f_exp_metal * f_pres_efect
-
-    df['Volume Helium ft3'] = (BASE_VOLUME * df['Volume Factor (Fv)'])
-    df['Volume in Cubic Meters ( M3 )'] = df['Volume Helium ft3'] / 35.315
-
-    df['Diferencia M3'] = df['Volume in Cubic Meters ( M3 )'].diff().fillna(0)
-    df['Consumo Absoluto M3'] = df['Diferencia M3'].abs()
-
-    return df.reset_index(drop=True)
-
-def obtener_analisis_termodinamico(temp_c, presion_psi):
-    """
-    Calcula el volumen y factor de compresibilidad usando la lógica de EA Innovation.
-    """
-    # Aquí encapsulas la lógica que ya tienes en 'calculate_thermodynamics'
-    # para un solo punto de dato si el usuario pregunta algo específico.
-    vessel_pres = presion_psi + 14.7
-    t_term = 459.7 + (temp_c * 1.8 + 32)
-    # ... (tu fórmula de Factor Z)
-    return {"volumen_m3": 12.34, "factor_z": 0.998} # Ejemplo de retorno
-
-
-# --- SECCIÓN 3.5: SERVICIO DE ALERTAS EA INNOVATION ---
-import requests
-
-def enviar_alerta_whatsapp(mensaje: str):
-    try:
-        instance = str(st.secrets["WHA_INSTANCE"]).strip()
-        token = str(st.secrets["WHA_TOKEN"]).strip()
-        phone = str(st.secrets["WHA_PHONE"]).replace("+", "").strip()
-
-        if not instance.startswith("instance"):
-            instance = f"instance{instance}"
-
-        url = f"https://api.ultramsg.com/{instance}/messages/chat"
-        payload = {"token": token, "to": phone, "body": mensaje}
-        headers = {'content-type': 'application/x-www-form-urlencoded'}
-
-        response = requests.post(url, data=payload, headers=headers, timeout=10)
-        return "✅ Alerta enviada" if response.status_code == 200 else f"❌ Error {response.status_code}"
-    except Exception as e:
-        return f"⚠️ Falla: {str(e)}"
-
-# --- 3.7: LOGICA DE CALLBACKS Y NOTIFICACIONES ---
-def check_and_notify(last_record):
-    """Verifica si es un registro nuevo y envía alerta si supera el umbral."""
-    consumo_actual = last_record['Consumo Absoluto M3']
-    if consumo_actual > 5:
-        # Solo dispara si es un registro nuevo (Marca temporal diferente)
-        if "ultima_alerta_enviada" not in st.session_state or st.session_state.ultima_alerta_enviada != last_record['Marca temporal']:
-            msg_automatico = (
-                f"🚨 *ALERTA AUTOMÁTICA EA*\n"
-                f"Consumo Detectado: {consumo_actual:.2f} M3\n"
-                f"Presión: {last_record['Vessel Pressure']:.1f} PSIA\n"
-                f"Factor Z: {last_record['Compressibility Factor (Z)']:.6f}\n"
-                f"Hora: {last_record['Marca temporal'].strftime('%H:%M:%S')}"
-            )
-            resultado = enviar_alerta_whatsapp(msg_automatico)
-            st.toast(resultado)
-            st.session_state.ultima_alerta_enviada = last_record['Marca temporal']
+@st.cache_resource
+def get_registro_correcciones():
+    return correcciones.RegistroCorrecciones()
+
+@st.cache_resource
+def get_registro_fugas():
+    return fugas.RegistroFugas()
+
+@st.cache_resource
+def get_registro_sesiones():
+    """Memoria por sesión y desalojo de las inactivas (vista de administración en el panel de rendimiento)."""
+    return sesiones.RegistroSesiones()
+
+@st.cache_resource
+def get_historial_chat():
+    return historial_chat.HistorialChat()
+
+@st.cache_resource
+def get_gestor_cuota():
+    """Cuota de Gemini, cache de respuestas y peticiones en vuelo compartidas por todas las sesiones."""
+    return cuota.GestorCuota()
+
+def detectar_fugas(historial):
+    """Ventanas con temperatura estable y caída sostenida de volumen; se persisten por versión del historial."""
+    with telemetria.etapa("deteccion_fugas", len(historial)):
+        intervalos = fugas.detectar(historial)
+    get_registro_fugas().guardar(intervalos)
+    return intervalos
+
+def validar_hoja(hoja, estado_correcciones):
+    """Hoja + correcciones persistidas -> lecturas válidas ordenadas y cuarentena con motivos."""
+    df = hoja.copy()
+    df.index.name = 'Fila' # Número de fila en la hoja: clave estable para las ediciones
+    correcciones.aplicar_estado(df, estado_correcciones)
+    with telemetria.etapa("validacion", len(df)):
+        return calidad.validar(df)
+
+def calcular_historial(validacion):
+    """Lecturas válidas -> historial termodinámico completo."""
+    limpio = validacion['limpio']
+    with telemetria.etapa("calculo_termodinamico", len(limpio)):
+        return calculate_thermodynamics(limpio)
+
+def filtrar_vista(historial, ventana):
+    _, cutoff = ventana
+    with telemetria.etapa("filtrado", len(historial)) as span:
+        vista = historial if cutoff is None else historial[historial['Marca temporal'] >= cutoff]
+        span.filas = len(vista)
+    return vista
+
+def calcular_estadisticas(historial):
+    """Estadísticas del historial usadas por la pestaña de salud y el diagnóstico del agente."""
+    consumo = historial['Consumo Absoluto M3']
+    moda_presion = historial['Vessel Pressure'].mode()
+    return {
+        "Consumo_Medio": round(consumo.mean(), 4),
+        "Desviacion_Estandar": round(consumo.std(), 4),
+        "Max_Consumo": round(consumo.max(), 2),
+        "Consumo_Total": consumo.sum(),
+        "Outliers_Detectados": int((consumo > 5).sum()),
+        "Presion_Mas_Frecuente": round(moda_presion.iloc[0], 2) if not moda_presion.empty else None,
+        "Factor_Z_Promedio": round(historial['Compressibility Factor (Z)'].mean(), 6),
+    }
 
+def ventana_de_vista(opcion):
+    """(opción, corte); el corte se redondea al minuto para que sirva como versión del filtrado."""
+    if opcion == "Últimas 24 Horas":
+        return opcion, pd.Timestamp.now().floor('min') - pd.Timedelta(hours=24)
+    if opcion == "Últimos 7 Días":
+        return opcion, pd.Timestamp.now().floor('min') - pd.Timedelta(days=7)
+    return opcion, None
+
+def actualizar_fuentes(grafo):
+    """Fija las versiones actuales de la hoja y de la bitácora (no calcula nada)."""
+    digest_hoja, contenido_hoja = descargar_hoja()
+    grafo.fijar('hoja', digest_hoja, cargador=lambda d=digest_hoja, c=contenido_hoja: parsear_hoja(d, c))
+    registro = get_registro_correcciones()
+    # Reaplicamos las correcciones persistidas (snapshot + cola de eventos) solo si cambió la bitácora
+    grafo.fijar('correcciones', registro.version(), cargador=lambda r=registro: r.estado()[1])
+
+def construir_motor_sql(historial, validacion, intervalos_fuga, _estado_correcciones):
+    import consultas # Solo con la primera consulta SQL del agente
+
+    with telemetria.etapa("motor_sql", len(historial)):
+        return consultas.MotorConsultas({
+            'historial': historial,
+            'cuarentena': validacion['cuarentena'],
+            'fugas': intervalos_fuga,
+            'correcciones': get_registro_correcciones().historial(MAX_EVENTOS_SQL),
+        })
+
+MAX_EVENTOS_SQL = 100_000
+
+def construir_grafo():
+    """Artefactos derivados de la sesión; los nodos compartidos se reutilizan entre sesiones."""
+    grafo = artefactos.GrafoArtefactos()
+    grafo.fuente('hoja').fuente('correcciones').fuente('ventana')
+    grafo.derivado('validacion', validar_hoja, ['hoja', 'correcciones'], compartir=True)
+    grafo.derivado('historial', calcular_historial, ['validacion'], compartir=True)
+    grafo.derivado('vista', filtrar_vista, ['historial', 'ventana'], compartir=True)
+    grafo.derivado('estadisticas', calcular_estadisticas, ['historial'], compartir=True)
+    # Pronóstico en línea: el estado de correcciones es la firma del pasado (si cambia, se reajusta)
+    grafo.derivado('pronostico', lambda historial, estado: pronostico.pronosticar(historial, firma=estado),
+                   ['historial', 'correcciones'], compartir=True)
+    grafo.derivado('fugas', detectar_fugas, ['historial'], compartir=True)
+    grafo.derivado('indice_consumo', consumo.IndiceConsumo, ['historial'], compartir=True)
+    grafo.derivado('spec_tendencia',
+                   lambda vista, pron, intervalos: graficas.construir_spec_tendencia(vista, pron.get('banda'), intervalos),
+                   ['vista', 'pronostico', 'fugas'], compartir=True)
+    for tipo, origen in [('multivariable', 'vista'), ('boxplot', 'historial'), ('histograma', 'historial')]:
+        grafo.derivado(f'spec_{tipo}', lambda df, tipo=tipo: graficas.construir_spec(tipo, df), [origen], compartir=True)
+    # Motor SQL del agente: se construye solo cuando el agente lo usa, una vez por versión
+    grafo.derivado('motor_sql', construir_motor_sql, ['historial', 'validacion', 'fugas', 'correcciones'], compartir=True)
+    grafo.derivado('contexto_agente', lambda vista: vista.tail(10).to_string(index=False), ['vista'])
+    return grafo
+
+# --- 3.7: LOGICA DE CALLBACKS ---
 def refresh_data_callback():
     """Callback para el botón de recarga."""
-    st.cache_data.clear()
-    if 'master_data' in st.session_state:
-        del st.session_state['master_data']
-
-def update_data_callback():
-    """Callback para el data_editor."""
-    # Al usar on_change, la data editada ya está en st.session_state.data_editor
-    if 'data_editor' in st.session_state:
-        # data_editor devuelve el dataframe completo modificado
-        new_df = st.session_state.data_editor
-        # Actualizamos master_data conservando índices si fuera necesario, 
-        # pero aquí data_editor maneja el df_vista (subset). 
-        # IMPORTANTE: update funciona si índices coinciden.
-        # Simplificación: Actualizamos los valores en master_data correspondientes.
-        st.session_state.master_data.update(new_df)
-        st.session_state.master_data = calculate_thermodynamics(st.session_state.master_data)
+    # Solo se invalida la descarga: si la hoja no cambió, su digest tampoco y nada se recalcula
+    descargar_hoja.clear()
+
+def cargar_anteriores_callback():
+    """Una página más de historial de chat en la ventana visible."""
+    st.session_state.paginas_chat += 1
+
+def update_data_callback(editor_key, filas_pagina, en_cuarentena=False):
+    """Callback para el data_editor paginado y el de la cuarentena."""
+    # El estado del editor solo trae las celdas cambiadas de la página visible
+    estado = st.session_state.get(editor_key)
+    if not estado or not estado.get("edited_rows"):
+        return
+    grafo = st.session_state.artefactos
+    # Las filas en cuarentena no están en el historial: el valor anterior sale de la cuarentena
+    origen = grafo.obtener('validacion')['cuarentena'] if en_cuarentena else grafo.obtener('historial')
+    parches = ediciones.construir_parches(estado["edited_rows"], filas_pagina, origen)
+    if not parches:
+        return
+    autor = st.session_state.get('operador') or "anónimo"
+    try:
+        # Versionado optimista contra la versión de la bitácora con la que se pintó el editor
+        get_registro_correcciones().registrar(parches, autor, grafo.version('correcciones'))
+    except correcciones.ConflictoEdicion as e:
+        # El siguiente rerun toma la nueva versión de la bitácora con las correcciones de la otra sesión
+        st.toast(f"⚠️ {e}")
 
 # --- 2. SIDEBAR ---
 with st.sidebar:
     logo_path = "EA_2.png"
     if os.path.exists(logo_path):
-        st.image(logo_path, use_container_width=True)
+        st.image(logo_path, width="stretch")
     else:
         st.warning("Coloca 'EA_2.png' en la raíz")
 
@@ -153,6 +227,8 @@ with st.sidebar:
     )
 
     st.button("🔄 Recargar Datos Originales", on_click=refresh_data_callback)
+    st.text_input("Operador:", key="operador", help="Autor registrado en la bitácora de correcciones.")
+    mostrar_rendimiento = st.toggle("⏱️ Panel de rendimiento", key="panel_rendimiento")
 
 
     st.markdown("---")
@@ -162,35 +238,89 @@ with st.sidebar:
 
 
 # --- 4. GESTIÓN DE ESTADO (SESSION STATE) ---
-if 'master_data' not in st.session_state:
-    try:
-        raw_df = fetch_raw_data()
-        st.session_state.master_data = calculate_thermodynamics(raw_df)
-    except Exception as e:
-        st.error(f"Error cargando datos: {e}")
-        st.stop()
+# Cada fuente lleva su versión (digest de la hoja, versión de la bitácora, ventana de vista)
+# y cada artefacto derivado se recalcula solo si cambió alguna versión aguas arriba
+if 'artefactos' not in st.session_state:
+    st.session_state.artefactos = construir_grafo()
+grafo = st.session_state.artefactos
+
+def registrar_interaccion():
+    """La sesión deja de contar como inactiva (y reanuda los KPIs si estaba desalojada)."""
+    get_registro_sesiones().tocar(st.session_state.setdefault('id_sesion', uuid.uuid4().hex), grafo)
+
+# Rerun completo = interacción, salvo el que dispara el fragmento de KPIs al llegar lecturas
+if not st.session_state.pop('rerun_por_lecturas', False):
+    registrar_interaccion()
+
+try:
+    actualizar_fuentes(grafo)
+    df_full = grafo.obtener('historial')
+except Exception as e:
+    st.error(f"Error cargando datos: {e}")
+    perfilador.descartar() # st.stop no llega al cierre del perfil al final del script
+    st.stop()
 
-df_full = st.session_state.master_data
+data_version = grafo.version('historial')
+st.session_state.data_version = data_version
 
 # --- 5. FILTRADO ---
-if view_option == "Últimas 24 Horas":
-    cutoff = pd.Timestamp.now() - pd.Timedelta(hours=24)
-    df_vista = df_full[df_full['Marca temporal'] >= cutoff].copy()
-elif view_option == "Últimos 7 Días":
-    cutoff = pd.Timestamp.now() - pd.Timedelta(days=7)
-    df_vista = df_full[df_full['Marca temporal'] >= cutoff].copy()
-else:
-    df_vista = df_full.copy()
+ventana_vista = ventana_de_vista(view_option)
+grafo.fijar('ventana', repr(ventana_vista), ventana_vista)
+df_vista = grafo.obtener('vista')
+
+# --- 5.5. CONSUMO POR RANGO (SIDEBAR) ---
+# Consulta O(log n) sobre el índice de sumas acumuladas de consumo y recargas
+with st.sidebar:
+    st.markdown("---")
+    st.subheader("⛽ Consumo por rango")
+    hoy = pd.Timestamp.now().normalize()
+    rango_consumo = st.date_input(
+        "Rango de fechas:", value=((hoy - pd.Timedelta(days=7)).date(), hoy.date()), key="rango_consumo"
+    )
+    if len(rango_consumo) == 2:
+        resumen_rango = grafo.obtener('indice_consumo').rango(
+            pd.Timestamp(rango_consumo[0]), pd.Timestamp(rango_consumo[1]) + pd.Timedelta(days=1)
+        )
+        col_c, col_r = st.columns(2)
+        col_c.metric("Consumo", f"{resumen_rango['consumo_m3']:.2f} M3")
+        col_r.metric("Recargas", f"{resumen_rango['recarga_m3']:.2f} M3", f"{resumen_rango['recargas']} eventos", delta_color="off")
+        st.caption(f"Neto {resumen_rango['neto_m3']:+.2f} M3 · Subidas menores {resumen_rango['subida_menor_m3']:.2f} M3 · "
+                   f"{resumen_rango['lecturas']} lecturas")
 
 # --- 6. KPI DASHBOARD (UNIFICADO) ---
 st.title("🛡️ Helium Recovery System")
 st.caption("Industrial Monitoring & Thermodynamic Calculation Engine")
 
-if not df_vista.empty:
-    last = df_vista.iloc[-1]
-
-    # Definimos las 4 columnas una sola vez
-    c1, c2, c3, c4 = st.columns(4)
+@st.fragment(run_every=INTERVALO_VIVO_S)
+def kpis_en_vivo():
+    """KPIs y centinela de alerta: se refrescan solos sin rerun de la página completa."""
+    # Cada sesión viva dispara el barrido (a lo más uno por EA_BARRIDO_SESIONES_S en el proceso)
+    registro = get_registro_sesiones()
+    registro.barrer()
+    if registro.desalojada(st.session_state.id_sesion):
+        # Sin interacción: no se rehidrata el grafo en cada refresco
+        st.caption("⏸️ KPIs en pausa por inactividad: interactúa con la página para reanudar.")
+        return
+    try:
+        actualizar_fuentes(grafo)
+    except Exception as e:
+        st.caption(f"⚠️ Sin lectura nueva: {e}")
+    if grafo.version('historial') != data_version:
+        # Llegaron lecturas o correcciones: solo entonces se redibujan editor, gráficas y pestañas
+        st.session_state.rerun_por_lecturas = True
+        st.rerun(scope="app")
+
+    with telemetria.etapa("kpis_vivos") as span:
+        ventana = ventana_de_vista(view_option)
+        grafo.fijar('ventana', repr(ventana), ventana)
+        vista = grafo.obtener('vista')
+        span.filas = len(vista)
+    if vista.empty:
+        return
+    last = vista.iloc[-1]
+
+    # Definimos las 5 columnas una sola vez
+    c1, c2, c3, c4, c5 = st.columns(5)
 
     # 1. Métricas estándar
     c1.metric("Volumen M3", f"{last['Volume in Cubic Meters ( M3 )']:.2f}")
@@ -202,7 +332,8 @@ if not df_vista.empty:
     alert_val = consumo_actual > 5
 
     if alert_val:
-        check_and_notify(last)
+        import alertas # Se carga solo cuando hay algo que notificar
+        alertas.check_and_notify(last)
 
 
     # 3. Dibujamos la métrica final en c4 una sola vez
@@ -212,6 +343,21 @@ if not df_vista.empty:
         "⚠️ ALTA" if alert_val else "OK",
         delta_color="inverse" if alert_val else "normal"
     )
+
+    # 4. Autonomía: horas hasta el volumen mínimo de trabajo según el pronóstico en línea
+    pron = grafo.obtener('pronostico')
+    horas = pron.get('horas_para_umbral')
+    c5.metric(
+        "Autonomía",
+        "Estable" if horas is None else f"{horas:.1f} h",
+        f"Mañana: {pron.get('consumo_24h_m3', 0):.1f} M3",
+        delta_color="off",
+        help=f"Horas hasta bajar de {pronostico.VOLUMEN_MINIMO_M3:.0f} M3 y consumo esperado en 24 h."
+    )
+    st.caption(f"Última lectura: {last['Marca temporal']:%d/%m/%Y %H:%M:%S} · se actualiza cada {INTERVALO_VIVO_S:.0f} s")
+
+kpis_en_vivo()
+
 # --- 7. TABLA EDITOR INTERACTIVO ---
 col_table, col_btn = st.columns([0.8, 0.2])
 
@@ -223,18 +369,52 @@ with col_table:
         "Marca temporal": st.column_config.DatetimeColumn("Tiempo (Editable)", format="D MMM YYYY, H:mm", required=True),
         "Temperatura Celsius": st.column_config.NumberColumn("Temp (°C)", format="%.2f", step=0.1),
         "Presión": st.column_config.NumberColumn("Presión (PSI)", format="%.2f", step=0.1),
-        "Volume in Cubic Meters ( M3 )": st.column_config.NumberColumn("Volumen (M³)", format="%.4f", disabled=True),
-        "Consumo Absoluto M3": st.column_config.NumberColumn("Consumo (M³)", format="%.4f", disabled=True),
     }
 
-    edited_df = st.data_editor(
-        df_vista,
-        column_config=column_cfg,
-        use_container_width=True,
-        key="data_editor",
-        num_rows="fixed",
-        on_change=update_data_callback
-    )
+    # Paginación: la página 1 son las lecturas más recientes
+    col_pag, col_tam = st.columns(2)
+    filas_por_pagina = col_tam.selectbox("Filas por página:", [50, 100, 250], key="filas_por_pagina")
+    total_paginas = max(1, -(-len(df_vista) // filas_por_pagina))
+    pagina = col_pag.number_input("Página:", min_value=1, max_value=total_paginas, value=1, step=1, key="pagina_editor")
+    fin = len(df_vista) - (pagina - 1) * filas_por_pagina
+    df_pagina = df_vista.iloc[max(0, fin - filas_por_pagina):fin][ediciones.COLUMNAS_EDITABLES]
+
+    # La clave cambia con la versión de datos para que el editor arranque limpio tras cada parche
+    editor_key = f"data_editor_{data_version}_{pagina}_{filas_por_pagina}"
+    with telemetria.etapa("data_editor", len(df_pagina)):
+        st.data_editor(
+            df_pagina,
+            column_config=column_cfg,
+            width="stretch",
+            key=editor_key,
+            num_rows="fixed",
+            on_change=update_data_callback,
+            args=(editor_key, list(df_pagina.index))
+        )
+    st.caption(f"Página {pagina} de {total_paginas} · {len(df_vista)} lecturas en la vista")
+    with st.expander("📜 Bitácora de correcciones"):
+        st.dataframe(get_registro_correcciones().historial(50), width="stretch", hide_index=True)
+    validacion = grafo.obtener('validacion')
+    conteos = validacion['conteos']
+    with st.expander(f"🚧 Cuarentena de datos ({conteos['cuarentena']} filas)"):
+        st.caption(" · ".join(f"{regla}: {conteos[regla]}" for regla in calidad.REGLAS)
+                   + f" · huecos > {calidad.HUECO_MAX_H:g} h: {conteos['huecos_tiempo']}")
+        # Editable: una corrección equivocada puede mandar la fila aquí, y desde aquí se arregla
+        cuarentena_visible = validacion['cuarentena'].tail(200)[ediciones.COLUMNAS_EDITABLES + ['Motivo']]
+        cuarentena_key = f"cuarentena_{data_version}"
+        st.data_editor(
+            cuarentena_visible,
+            column_config=column_cfg,
+            disabled=['Motivo'],
+            width="stretch",
+            key=cuarentena_key,
+            num_rows="fixed",
+            on_change=update_data_callback,
+            args=(cuarentena_key, list(cuarentena_visible.index), True)
+        )
+        st.caption("Corrige la celda señalada en 'Motivo': la fila vuelve al historial si pasa la validación.")
+        if not validacion['huecos'].empty:
+            st.dataframe(validacion['huecos'].tail(50), width="stretch", hide_index=True)
 
 
 with col_btn:
@@ -242,41 +422,26 @@ with col_btn:
     st.write("")
     st.write("")
     # BOTÓN DE GUARDADO / DESCARGA
-    csv = df_full.to_csv(index=False).encode('utf-8')
+    # El archivo se genera al hacer clic (data callable) y se reutiliza por versión de datos
+    formato_export = st.selectbox("Formato:", exportar.formatos_disponibles(), key="formato_export")
+    info_formato = exportar.FORMATOS[formato_export]
     st.download_button(
-        label="💾 Guardar y Descargar CSV",
-        data=csv,
-        file_name=f"Helium_Report_Corregido.csv",
-        mime='text/csv',
+        label="💾 Guardar y Descargar",
+        data=lambda: exportar.exportar_cacheado(df_full, data_version, formato_export),
+        file_name=f"Helium_Report_Corregido.{info_formato['extension']}",
+        mime=info_formato['mime'],
+        on_click="ignore",
         help="Descarga el historial completo con las correcciones de tiempo y datos realizadas."
     )
 
 # --- 8. GRÁFICA DINÁMICA CON HOVERS MEJORADOS ---
 st.subheader("Análisis de Tendencia")
 
-plot_data = edited_df.copy()
-plot_data['Alerta'] = plot_data['Consumo Absoluto M3'] > 5
-
-chart = alt.Chart(plot_data).mark_line(point=True).encode(
-    x=alt.X('Marca temporal:T', title='Tiempo'),
-    y=alt.Y('Volume in Cubic Meters ( M3 ):Q', title='Volumen M3'),
-    color=alt.condition(
-        alt.datum.Alerta == True,
-        alt.value('#FF0000'), # Rojo para alertas
-        alt.value('#5271ff')  # Azul normal
-    ),
-    tooltip=[
-        alt.Tooltip('Marca temporal:T', title='Hora Real', format='%Y-%m-%d %H:%M'),
-        alt.Tooltip('Temperatura Celsius:Q', title='Temp C', format='.2f'),
-        alt.Tooltip('Presión:Q', title='Presión PSI', format='.2f'),
-        alt.Tooltip('Volume in Cubic Meters ( M3 ):Q', title='Volumen M3', format='.4f'),
-        alt.Tooltip('Consumo Absoluto M3:Q', title='Consumo Absoluto M3', format='.4f') # HOVER SOLICITADO
-    ]
-).interactive().properties(height=450)
-
-st.altair_chart(chart, use_container_width=True)
-
-if plot_data['Alerta'].any():
+# Spec como artefacto versionado: sin melt ni re-serialización mientras la vista no cambie
+with telemetria.etapa("grafica_tendencia", len(df_vista)):
+    st.vega_lite_chart(spec=graficas.para_envio(grafo.obtener('spec_tendencia')), width="stretch")
+
+if (df_vista['Consumo Absoluto M3'] > 5).any():
     st.error("🚨 Alerta: Se detectaron fluctuaciones de consumo superiores a 5 m³ en el rango seleccionado.")
 
 
@@ -284,112 +449,56 @@ if plot_data['Alerta'].any():
 # --- 9. NUEVA GRÁFICA MULTI-VARIABLE ---
 st.subheader("Correlación de Variables (PSI, Volumen, Temp °F)")
 
-# Derretimos el dataframe para que Altair pueda manejar múltiples colores por variable
-df_melted = plot_data.melt(
-    id_vars=['Marca temporal'],
-    value_vars=['Presión', 'Volume in Cubic Meters ( M3 )', 'Temperatura Fahrenheit'],
-    var_name='Variable',
-    value_name='Valor'
-)
-
-# Diccionario de colores solicitado
-color_scale = alt.Scale(
-    domain=['Presión', 'Volume in Cubic Meters ( M3 )', 'Temperatura Fahrenheit'],
-    range=['#FF0000', '#0000FF', '#FFD700'] # Rojo, Azul, Dorado/Amarillo
-)
-
-multi_chart = alt.Chart(df_melted).mark_line(point=True).encode(
-    x=alt.X('Marca temporal:T', title='Tiempo'),
-    y=alt.Y('Valor:Q', title='Escala Unificada', scale=alt.Scale(zero=False)),
-    color=alt.Color('Variable:N', scale=color_scale, title="Leyenda"),
-    tooltip=['Marca temporal:T', 'Variable:N', 'Valor:Q']
-).interactive().properties(height=450)
-
-st.altair_chart(multi_chart, use_container_width=True)
+# El fold de Vega reemplaza al melt: se envían las columnas anchas una sola vez
+with telemetria.etapa("grafica_multivariable", len(df_vista)):
+    st.vega_lite_chart(spec=graficas.para_envio(grafo.obtener('spec_multivariable')), width="stretch")
 
 # --- 9.5. SUITE DE ANÁLISIS AVANZADO (EA INNOVATION DEFINITIVE) ---
 st.divider()
 st.subheader("🔍 Intelligence Suite: Análisis Profundo")
 
-# Definimos las 4 pestañas maestras
-tab1, tab2, tab3, tab4 = st.tabs([
-    "🎬 Playback Animado",
-    "📦 Control de Dispersión",
-    "📊 Distribución de Presión",
-    "💡 Salud del Sistema"
-])
-
-with tab1:
-    st.info("Visualización dinámica de los Factores Z, Fv y Consumo.")
-
-    col_anim1, col_anim2 = st.columns([0.2, 0.8])
-    start_anim = col_anim1.button("▶️ Iniciar Playback")
-    velocidad = col_anim2.select_slider("Velocidad:", options=["Lento", "Normal", "Rápido"], value="Normal", key="v1")
-
-    # CLAVE: El placeholder se define FUERA del 'if', pero DENTRO del 'tab'
-    placeholder = st.empty()
-
-    if start_anim:
-        # Aquí pegas el bucle 'for' que ya tenemos
-        cols_interes = ['Marca temporal', 'Compressibility Factor (Z)', 'Volume Factor (Fv)', 'Consumo Absoluto M3']
-        df_anim_raw = df_full[cols_interes].iloc[::2, :].reset_index(drop=True)
-
-        color_scale_anim = alt.Scale(
-            domain=['Compressibility Factor (Z)', 'Volume Factor (Fv)', 'Consumo Absoluto M3'],
-            range=['#2ecc71', '#e67e22', '#e74c3c']
-        )
-
-        for i in range(2, len(df_anim_raw) + 1):
-            current_data = df_anim_raw.iloc[:i]
-            df_melted_anim = current_data.melt(id_vars=['Marca temporal'], var_name='Variable Termodinámica', value_name='Valor')
-
-            anim_chart = alt.Chart(df_melted_anim).mark_line(point=True).encode(
-                x=alt.X('Marca temporal:T', title='Tiempo'),
-                y=alt.Y('Valor:Q', scale=alt.Scale(zero=False)),
-                color=alt.Color('Variable Termodinámica:N', scale=color_scale_anim),
-                tooltip=['Marca temporal:T', 'Variable Termodinámica:N', 'Valor:Q']
-            ).properties(height=450)
-
-            # El placeholder ya existe, así que solo lo actualizamos
-            placeholder.altair_chart(anim_chart, use_container_width=True)
-
-            # Ajustamos el sleep según la velocidad
-            delay = {"Lento": 0.4, "Normal": 0.15, "Rápido": 0.05}[velocidad]
-            time.sleep(delay)
-
-        st.success("✅ Playback finalizado.")
-
-with tab2:
-    st.info("Identificación de anomalías y estabilidad del consumo (Outliers).")
-    # Gráfico de Caja (Boxplot) para el Consumo Absoluto
-    boxplot = alt.Chart(df_full).mark_boxplot(extent='min-max', color='#e74c3c').encode(
-        x=alt.X('Consumo Absoluto M3:Q', title="Consumo (M3)"),
-        tooltip=['Consumo Absoluto M3']
-    ).properties(height=300, title="Dispersión Estadística de Consumo")
-    st.altair_chart(boxplot, use_container_width=True)
-    st.caption("Nota: Los puntos fuera de los 'bigotes' representan consumos atípicos que requieren revisión.")
-
-with tab3:
-    st.info("Frecuencia operativa de Presión en el Recuperador.")
-    # Histograma de Presión
-    hist_presion = alt.Chart(df_full).mark_bar(color='#5271ff').encode(
-        alt.X("Vessel Pressure:Q", bin=alt.Bin(maxbins=30), title="Presión Absoluta (PSIA)"),
-        y=alt.Y('count()', title="Frecuencia (Horas/Lecturas)")
-    ).properties(height=350, title="Histograma de Distribución de Presión")
-    st.altair_chart(hist_presion, use_container_width=True)
-
-with tab4:
-    st.info("Resumen ejecutivo de eficiencia termodinámica.")
-    # Métricas de salud del sistema usando df_full
-    avg_z = df_full['Compressibility Factor (Z)'].mean()
-    total_consumo = df_full['Consumo Absoluto M3'].sum()
-
-    m1, m2, m3 = st.columns(3)
-    m1.metric("Z Promedio", f"{avg_z:.6f}", help="Cercanía al gas ideal")
-    m2.metric("Consumo Total", f"{total_consumo:.2f} M3", delta="Acumulado Histórico")
-    m3.metric("Estabilidad", "98.2%", delta="Alta", help="Basado en varianza de Fv")
-
-    st.success("Sugerencia de IA: El sistema opera mayormente en rangos de presión estables.")
+# Pestañas perezosas en su propio fragmento: el contenido de cada pestaña (suite_analisis.py)
+# se importa y calcula solo al abrirla; cambiar de pestaña cuenta como interacción
+@st.fragment
+def suite_inteligencia():
+    tab1, tab2, tab3, tab4 = st.tabs([
+        "🎬 Playback Animado",
+        "📦 Control de Dispersión",
+        "📊 Distribución de Presión",
+        "💡 Salud del Sistema"
+    ], key="suite_tab", on_change=registrar_interaccion)
+
+    with tab1:
+        if tab1.open:
+            st.info("Visualización dinámica de los Factores Z, Fv y Consumo.")
+
+            col_anim1, col_anim2 = st.columns([0.2, 0.8])
+            start_anim = col_anim1.button("▶️ Iniciar Playback", on_click=registrar_interaccion)
+            velocidad = col_anim2.select_slider("Velocidad:", options=["Lento", "Normal", "Rápido"], value="Normal", key="v1")
+
+            # CLAVE: El placeholder se define FUERA del 'if', pero DENTRO del 'tab'
+            placeholder = st.empty()
+
+            if start_anim:
+                import suite_analisis
+                suite_analisis.playback(grafo, placeholder, velocidad)
+
+    with tab2:
+        if tab2.open:
+            import suite_analisis
+            suite_analisis.control_dispersion(grafo)
+
+    with tab3:
+        if tab3.open:
+            import suite_analisis
+            suite_analisis.distribucion_presion(grafo)
+
+    with tab4:
+        if tab4.open:
+            import suite_analisis
+            suite_analisis.salud_sistema(grafo)
+
+suite_inteligencia()
 
 # --- 9. FIRMA ---
 st.markdown(
@@ -408,313 +517,90 @@ st.markdown(
 
 
 # --- 10. EA INNOVATION AI AGENT (TRIPLE PODER: CÁLCULO, GRÁFICA E HISTORIAL) ---
-import google.generativeai as genai
-import altair as alt
-import ssl
-import requests
-
-# (enviar_alerta_whatsapp is now at the top, redundant import/def removed from here if strictly following plan, but let's check if there is a second definition)
-# Original code had enviar_alerta_whatsapp at line 396 as well?
-# Line 396: def enviar_alerta_whatsapp(mensaje: str):
-# "Versión Industrial EA Innovation - Corrección de Endpoint 404"
-# It seems there were DUPLICATE definitions?
-# Line 110: def enviar_alerta_whatsapp
-# Line 396: def enviar_alerta_whatsapp
-# I should remove the second one to avoid conflicts or just let it override (Python allows override).
-# But better to clean it up.
-# I will keep the one I moved to the top.
-# I will NOT include the one at the bottom in the written file.
-
-def calculadora_expert_ea(temp_c: float, presion_psi: float):
-    """Calcula Z, Fv y M3 usando las fórmulas propietarias de Erik Armenta."""
-    BASE_VOLUME = 450.00
-    temp_f = temp_c * 1.8 + 32
-    vessel_pres = presion_psi + 14.7
-    t_term = 459.7 + temp_f
-    part1 = 0.000102297 - (0.000000192998 * t_term) + (0.00000000011836 * (t_term**2))
-    z_factor = 1 + (part1 * vessel_pres) - (0.0000000002217 * (vessel_pres**2))
-    f_temp = 529.7 / (temp_f + 459.7); f_pres = vessel_pres / 14.7
-    f_comp = 1.00049 / z_factor; f_exp_metal = 1 + (0.0000189 * (temp_f - 70))
-    f_pres_efect = 1 + (0.00000074 * vessel_pres)
-    fv = f_temp * f_pres * f_comp * f_exp_metal * f_pres_efect
-    vol_m3 = (BASE_VOLUME * fv) / 35.315
-    return {"Factor_Z": round(z_factor, 6), "Factor_Fv": round(fv, 4), "Volumen_M3": round(vol_m3, 4)}
-
-def crear_grafica_agente(variable_y: str, variable_x: str = 'Marca temporal'):
-    """Genera gráficas interactivas de CUALQUIER variable del dataset."""
-    if variable_y in df_vista.columns and variable_x in df_vista.columns:
-        chart = alt.Chart(df_vista).mark_line(point=True, color='#5271ff').encode(
-            x=alt.X(f'{variable_x}:T' if 'temporal' in variable_x else f'{variable_x}:Q', title=variable_x),
-            y=alt.Y(f'{variable_y}:Q', title=variable_y, scale=alt.Scale(zero=False)),
-            tooltip=[variable_x, variable_y]
-        ).interactive().properties(height=350)
-        st.altair_chart(chart, use_container_width=True)
-        return f"Gráfica de {variable_y} generada."
-    return f"Error: Variables no encontradas."
-
-def agrupar_datos_agente(columna_agrupar: str, columna_valor: str, operacion: str = 'sum'):
-    """Agrupa datos por una columna y aplica operaciones matemáticas (sum, mean, count, max, min)."""
-    if columna_agrupar not in df_vista.columns:
-        return f"Error: La columna '{columna_agrupar}' no existe en el dataset."
-    if columna_valor not in df_vista.columns:
-        return f"Error: La columna '{columna_valor}' no existe en el dataset."
-
-    operaciones_validas = {'sum': 'sum', 'mean': 'mean', 'count': 'count', 'max': 'max', 'min': 'min',
-                           'promedio': 'mean', 'suma': 'sum', 'total': 'sum', 'contar': 'count',
-                           'maximo': 'max', 'minimo': 'min'}
-
-    op = operaciones_validas.get(operacion.lower(), 'sum')
-
-    try:
-        grupo = df_vista.groupby(columna_agrupar)[columna_valor].agg(op)
-        resultado = {
-            "columna_agrupada": columna_agrupar,
-            "columna_valor": columna_valor,
-            "operacion": op,
-            "total_grupos": len(grupo),
-            "datos": {str(k): round(v, 4) if isinstance(v, float) else v for k, v in grupo.items()}
-        }
-        return resultado
-    except Exception as e:
-        return f"Error al agrupar: {str(e)}"
-
-def crear_grafica_barras_agente(variable_x: str, variable_y: str, titulo: str = 'Gráfica de Barras'):
-    """Genera gráficas de barras interactivas para variables categóricas y numéricas."""
-    if variable_x not in df_vista.columns:
-        return f"Error: La columna '{variable_x}' no existe en el dataset."
-    if variable_y not in df_vista.columns:
-        return f"Error: La columna '{variable_y}' no existe en el dataset."
-
-    try:
-        # Determinar si X es temporal, categórica o numérica
-        if 'temporal' in variable_x.lower() or pd.api.types.is_datetime64_any_dtype(df_vista[variable_x]):
-            x_encoding = alt.X(f'{variable_x}:T', title=variable_x)
-        elif pd.api.types.is_numeric_dtype(df_vista[variable_x]):
-            x_encoding = alt.X(f'{variable_x}:Q', title=variable_x)
-        else:
-            x_encoding = alt.X(f'{variable_x}:N', title=variable_x, sort='-y')
-
-        chart = alt.Chart(df_vista).mark_bar(color='#5271ff').encode(
-            x=x_encoding,
-            y=alt.Y(f'{variable_y}:Q', title=variable_y),
-            tooltip=[variable_x, variable_y]
-        ).interactive().properties(height=350, title=titulo)
-
-        st.altair_chart(chart, use_container_width=True)
-        return f"Gráfica de barras '{titulo}' generada: {variable_x} vs {variable_y}."
-    except Exception as e:
-        return f"Error al crear gráfica de barras: {str(e)}"
-
-def analizar_tendencias_historicas(metrica: str):
-    """Consulta estadísticas de TODO el historial registrado (df_full)."""
-    if metrica in df_full.columns:
-        return {
-            "Metrica": metrica, "Promedio": round(df_full[metrica].mean(), 2),
-            "Max": round(df_full[metrica].max(), 2), "Min": round(df_full[metrica].min(), 2),
-            "Total_Muestras": len(df_full)
-        }
-    return "Métrica no válida."
-
-
-def obtener_diagnostico_avanzado():
-    """Analiza estadísticamente el historial para detectar anomalías y estabilidad."""
-    if df_full.empty:
-        return "No hay datos suficientes para un diagnóstico."
-
-    # Cálculos estadísticos para el Boxplot e Histograma
-    stats = {
-        "Consumo_Medio": round(df_full['Consumo Absoluto M3'].mean(), 4),
-        "Desviacion_Estandar": round(df_full['Consumo Absoluto M3'].std(), 4),
-        "Max_Consumo": round(df_full['Consumo Absoluto M3'].max(), 2),
-        "Outliers_Detectados": len(df_full[df_full['Consumo Absoluto M3'] > 5]),
-        "Presion_Mas_Frecuente": round(df_full['Vessel Pressure'].mode()[0], 2),
-        "Factor_Z_Promedio": round(df_full['Compressibility Factor (Z)'].mean(), 6)
-    }
+# El agente (agente.py) y el SDK de Gemini se cargan con la primera pregunta, no en cada rerun
+def modelo_agente():
+    import agente
 
-    # Interpretación automática para el Agente
-    diagnostico = (
-        f"Análisis EA Innovation:\n"
-        f"- Estabilidad: {'Alta' if stats['Desviacion_Estandar'] < 1 else 'Inestable'}\n"
-        f"- Alertas registradas: {stats['Outliers_Detectados']} eventos por encima de 5M3.\n"
-        f"- Punto de operación común: {stats['Presion_Mas_Frecuente']} PSIA.\n"
-        f"El Factor Z medio de {stats['Factor_Z_Promedio']} indica la eficiencia termodinámica actual."
-    )
-    return diagnostico
+    modelo = agente.cargar_modelo(st.secrets.get("GEMINI_API_KEY"), os.environ.get("EA_GEMINI_ENDPOINT"))
+    st.session_state.modelo_agente = modelo.model_name
+    return agente, modelo
 
-
-def procesar_audio_voz(audio_bytes: bytes) -> str:
-    """
-    Procesa audio grabado del micrófono usando Gemini.
-    Sube el archivo de audio a Gemini y obtiene la transcripción/interpretación.
-    """
-    import tempfile
-
-    if not audio_bytes:
-        return None
-
-    try:
-        # Guardar audio en archivo temporal
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as tmp_audio:
-            tmp_audio.write(audio_bytes)
-            tmp_audio_path = tmp_audio.name
-
-        # Subir archivo a Gemini usando genai.upload_file()
-        archivo_audio = genai.upload_file(
-            path=tmp_audio_path,
-            mime_type="audio/wav"
-        )
-
-        # Usar el modelo para transcribir/interpretar el audio
-        modelo_audio = genai.GenerativeModel(modelo_seleccionado)
-
-        prompt_transcripcion = """
-        Escucha este audio y transcribe exactamente lo que el usuario está diciendo.
-        Si es una pregunta o comando relacionado con análisis de helio, termodinámica,
-        gráficas o datos del sistema, devuelve el texto transcrito de forma clara.
-        Solo devuelve la transcripción sin explicaciones adicionales.
-        """
-
-        respuesta = modelo_audio.generate_content([prompt_transcripcion, archivo_audio])
-
-        # Limpiar archivo temporal
-        os.remove(tmp_audio_path)
-
-        # Eliminar el archivo subido de Gemini
-        genai.delete_file(archivo_audio.name)
-
-        return respuesta.text.strip()
-
-    except Exception as e:
-        st.error(f"Error procesando audio: {e}")
-        return None
-
-# C. CONFIGURACIÓN DEL CEREBRO (SELECTOR DE ALTA DISPONIBILIDAD)
-try:
-    api_key = st.secrets.get("GEMINI_API_KEY")
-    genai.configure(api_key=api_key)
-
-    # 1. Listamos todos los modelos activos en tu cuenta
-    modelos_disponibles = [m.name for m in genai.list_models() if 'generateContent' in m.supported_generation_methods]
-
-    # 2. PRIORIDAD: Buscamos el 1.5-flash (Tiene 1,500 solicitudes al día de cuota)
-    # Filtramos para NO usar el 2.0 o 2.5 que te están bloqueando
-    modelo_seleccionado = next(
-        (m for m in modelos_disponibles if '1.5-flash' in m and '2.0' not in m and '2.5' not in m),
-        None
-    )
-
-    # 3. FALLBACK: Si no lo encuentra, usa cualquiera que no sea de la serie 2.x
-    if not modelo_seleccionado:
-        modelo_seleccionado = next((m for m in modelos_disponibles if '1.5' in m), modelos_disponibles[0])
-
-    INSTRUCCIONES_AGENTE = """
-    Eres el Agente Senior de EA Innovation. 'Accuracy is our signature'.
-        - Tienes acceso a herramientas de cálculo, gráficas y análisis histórico.
-        - NUEVA CAPACIDAD: Puedes enviar alertas de WhatsApp ante anomalías.
-
-        ## CAPACIDAD DE VOZ - GUÍA DE INTERPRETACIÓN
-        Puedes recibir comandos por voz. Cuando el texto viene marcado como [VOZ], interpreta la solicitud hablada
-        y mapéala a la herramienta correcta. Ejemplos de comandos hablados y su acción:
-
-        ### calculadora_expert_ea (Cálculos termodinámicos con temperatura/presión):
-        - "Calcular volumen para 25 grados y 100 PSI" → usa calculadora_expert_ea con temp=25, presion=100
-        - "Cuánto helio necesito a 30 grados centígrados" → usa calculadora_expert_ea con temp=30
-        - "Haz un cálculo a 50 PSI y temperatura ambiente" → usa calculadora_expert_ea con presion=50
-        - "Dame el volumen corregido para presión de 150" → usa calculadora_expert_ea con presion=150
-
-        ### crear_grafica_agente (Gráficas de línea y visualizaciones):
-        - "Muéstrame gráfica de presión" → usa crear_grafica_agente tipo="presion"
-        - "Hazme una gráfica de consumo" → usa crear_grafica_agente tipo="consumo"
-        - "Quiero ver la tendencia de temperatura" → usa crear_grafica_agente tipo="temperatura"
-        - "Gráfica de los últimos datos" → usa crear_grafica_agente con datos recientes
-
-        ### crear_grafica_barras_agente (Gráficas de barras):
-        - "Hazme una gráfica de barras de consumo" → usa crear_grafica_barras_agente
-        - "Muestra barras de presión por fecha" → usa crear_grafica_barras_agente
-        - "Quiero ver barras del volumen" → usa crear_grafica_barras_agente
-        - "Gráfica de barras comparando temperatura" → usa crear_grafica_barras_agente
-
-        ### agrupar_datos_agente (Agrupación y agregación de datos):
-        - "Agrupa el consumo por día" → usa agrupar_datos_agente
-        - "Dame el total de presión agrupado por hora" → usa agrupar_datos_agente con operacion='sum'
-        - "Cuál es el promedio de volumen por fecha" → usa agrupar_datos_agente con operacion='mean'
-        - "Cuenta cuántas lecturas hay por día" → usa agrupar_datos_agente con operacion='count'
-
-        ### analizar_tendencias_historicas (Estadísticas y análisis):
-        - "Analiza las tendencias del mes" → usa analizar_tendencias_historicas
-        - "Dame estadísticas de consumo" → usa analizar_tendencias_historicas
-        - "Cuál es el promedio histórico" → usa analizar_tendencias_historicas
-        - "Muéstrame el análisis de datos pasados" → usa analizar_tendencias_historicas
-
-        ### enviar_alerta_whatsapp (Alertas y notificaciones):
-        - "Envía alerta al ingeniero" → usa enviar_alerta_whatsapp
-        - "Notifica por WhatsApp que hay problema" → usa enviar_alerta_whatsapp
-        - "Avísame si esto vuelve a pasar" → configura enviar_alerta_whatsapp
-        - "Manda mensaje de emergencia" → usa enviar_alerta_whatsapp con prioridad alta
-
-        ### obtener_diagnostico_avanzado (Diagnóstico y estabilidad):
-        - "Dame un diagnóstico del sistema" → usa obtener_diagnostico_avanzado
-        - "Cómo está la estabilidad" → usa obtener_diagnostico_avanzado para boxplot
-        - "Analiza si hay anomalías" → usa obtener_diagnostico_avanzado
-        - "Revisa el histograma de frecuencia" → usa obtener_diagnostico_avanzado
-
-        ## REGLAS OPERATIVAS
-        - REGLA DE ORO: Si detectas un consumo > 5 M3 o una anomalía crítica, ES OBLIGATORIO que primero ejecutes la herramienta 'enviar_alerta_whatsapp' ANTES de dar tu respuesta de texto. No solo digas que la enviaste, ¡ejecútala!
-        - Si el usuario te pide 'Avisame si esto vuelve a pasar' o si detectas un consumo > 5 M3,
-          ejecuta 'enviar_alerta_whatsapp' con un resumen técnico.
-        - CUANDO EL USUARIO PREGUNTE POR LAS GRÁFICAS DE TABS O ESTADÍSTICA: Usa 'obtener_diagnostico_avanzado' para leer la estabilidad (boxplot) y frecuencia (histograma).
-        - Si detectas inestabilidad (desviación estándar alta), advierte al Ingeniero Armenta sobre posibles fugas o errores de lectura.
-        """
-
-    model = genai.GenerativeModel(
-        model_name=modelo_seleccionado,
-        tools=[
-            calculadora_expert_ea,
-            crear_grafica_agente,
-            crear_grafica_barras_agente,
-            agrupar_datos_agente,
-            analizar_tendencias_historicas,
-            enviar_alerta_whatsapp,
-            obtener_diagnostico_avanzado # <-- PODER AÑADIDO
-        ],
-        system_instruction=INSTRUCCIONES_AGENTE
-    )
-    st.sidebar.success(f"IA Operativa: {modelo_seleccionado.split('/')[-1]}")
-
-except Exception as e:
-    st.error(f"Error en configuración IA: {e}")
 # 3. INTERFAZ DE CHAT
 st.divider()
 st.header("🤖 EA Innovation Agent")
 st.caption("Intelligence Suite: Thermodynamics, Analytics & Dynamic Visualization")
 
-if "messages" not in st.session_state: st.session_state.messages = []
-for msg in st.session_state.messages:
+# Historial persistente por usuario autenticado (st.login configurado en secrets); solo se lee la ventana visible.
+# Sin login, por un identificador de cliente en la URL (?cliente=...), que sobrevive a recargas y marcadores.
+# El campo "Operador" no identifica a nadie: cualquiera puede escribir otro nombre
+usuario_st = getattr(st, "user", None)
+if usuario_st is None:
+    usuario_st = getattr(st, "experimental_user", None)
+if usuario_st is not None and usuario_st.get("is_logged_in") and usuario_st.get("email"):
+    usuario_chat = f"usuario:{usuario_st['email'].casefold()}"
+else:
+    cliente = st.query_params.get("cliente", "")
+    try:
+        valido = uuid.UUID(cliente).hex == cliente
+    except ValueError:
+        valido = False
+    if not valido:
+        cliente = st.query_params["cliente"] = uuid.uuid4().hex
+    usuario_chat = f"cliente:{cliente}"
+    st.caption("🔖 Sin inicio de sesión, la conversación se guarda para este enlace: "
+               "guárdalo en marcadores para retomarla (quien tenga el enlace la puede leer).")
+registro_chat = get_historial_chat()
+paginas_chat = st.session_state.setdefault('paginas_chat', 1)
+limite_chat = min(historial_chat.MENSAJES_POR_PAGINA * paginas_chat, historial_chat.MAX_MENSAJES_CHAT)
+mensajes_chat, hay_anteriores = registro_chat.ultimos(usuario_chat, limite_chat)
+recortados = historial_chat.recortar_chat(mensajes_chat)
+if hay_anteriores and not recortados and limite_chat < historial_chat.MAX_MENSAJES_CHAT:
+    st.button("⬆️ Cargar mensajes anteriores", on_click=cargar_anteriores_callback)
+elif hay_anteriores or recortados:
+    st.caption(f"Mostrando los últimos {len(mensajes_chat)} mensajes.")
+for msg in mensajes_chat:
     with st.chat_message(msg["role"]): st.markdown(msg["content"])
 
-# Entrada de voz con micrófono
+# Entrada de voz con micrófono: el componente de grabación se carga al activarla
 col_mic, col_chat = st.columns([1, 11])
+audio_bytes = None
 with col_mic:
-    audio_bytes = audio_recorder(
-        text="",
-        recording_color="#e74c3c",
-        neutral_color="#3498db",
-        icon_size="2x",
-        pause_threshold=2.0
-    )
+    if st.session_state.get("voz_activa") or st.button("🎤", help="Activar entrada por voz"):
+        st.session_state.voz_activa = True
+        from audio_recorder_streamlit import audio_recorder
+
+        audio_bytes = audio_recorder(
+            text="",
+            recording_color="#e74c3c",
+            neutral_color="#3498db",
+            icon_size="2x",
+            pause_threshold=2.0,
+            # Clave nueva tras cada grabación procesada: Streamlit suelta los bytes de la anterior
+            key=f"grabadora_{st.session_state.get('grabaciones', 0)}"
+        )
 
 # Inicializar estado para audio transcrito
 if "audio_transcrito" not in st.session_state:
     st.session_state.audio_transcrito = None
 
 # Procesar audio si existe (nueva grabación)
-if audio_bytes and st.session_state.get("ultimo_audio") != hash(audio_bytes):
-    st.session_state.ultimo_audio = hash(audio_bytes)
-    with st.spinner("🎤 Procesando comando de voz..."):
-        texto_transcrito = procesar_audio_voz(audio_bytes)
-        if texto_transcrito:
-            st.session_state.audio_transcrito = texto_transcrito
-            st.rerun()  # Refrescar para mostrar el texto transcrito
+# El texto se entrega en esta misma ejecución: no hace falta st.rerun()
+if audio_bytes:
+    import voz
+
+    digest_audio = voz.digest_audio(audio_bytes)
+    if st.session_state.get("ultimo_audio") != digest_audio:
+        st.session_state.ultimo_audio = digest_audio
+        st.session_state.grabaciones = st.session_state.get('grabaciones', 0) + 1
+        with st.spinner("🎤 Procesando comando de voz..."):
+            try:
+                agente, modelo = modelo_agente()
+                texto_transcrito = agente.procesar_audio_voz(audio_bytes, modelo, get_gestor_cuota())
+            except Exception as e:
+                st.error(f"Error en configuración IA: {e}")
+                texto_transcrito = None
+            if texto_transcrito:
+                st.session_state.audio_transcrito = texto_transcrito
 
 # Mostrar texto transcrito si existe con feedback visual mejorado
 if st.session_state.audio_transcrito:
@@ -731,77 +617,62 @@ if entrada_usuario:
     # Limpiar el audio transcrito después de usarlo
     st.session_state.audio_transcrito = None
 
-    st.session_state.messages.append({"role": "user", "content": entrada_usuario})
+    # Solo los últimos mensajes viajan al modelo como historia de la conversación
+    historia, _ = registro_chat.ultimos(usuario_chat, historial_chat.MENSAJES_CONTEXTO)
+    registro_chat.agregar(usuario_chat, "user", entrada_usuario)
     with st.chat_message("user"): st.markdown(entrada_usuario)
     with st.chat_message("assistant"):
         try:
-            chat = model.start_chat(enable_automatic_function_calling=True)
-            # Indicar si el mensaje vino por voz con instrucciones claras para el modelo
-            if texto_input is None:
-                prefijo_voz = """[🎤 ENTRADA POR VOZ]
-El usuario está usando ENTRADA POR VOZ. Interpreta su solicitud hablada y usa las herramientas apropiadas según lo que pida:
-- Cálculos de helio/volumen/presión → usa calculadora_expert_ea
-- Gráficas o visualizaciones → usa crear_grafica_agente
-- Análisis o tendencias → usa analizar_tendencias_historicas
-- Alertas o notificaciones → usa enviar_alerta_whatsapp
-- Diagnóstico del sistema → usa obtener_diagnostico_avanzado
-
-SOLICITUD DE VOZ: """
-            else:
-                prefijo_voz = "PREGUNTA: "
-            contexto = f"DATOS RECIENTES:\n{df_vista.tail(10).to_string(index=False)}\n\n{prefijo_voz}{entrada_usuario}"
-            response = chat.send_message(contexto)
-            st.markdown(response.text)
-            st.session_state.messages.append({"role": "assistant", "content": response.text})
+            agente, modelo = modelo_agente()
+            meta_turno = {"data_version": data_version, "vista": view_option, "filas": len(df_full)}
+            with agente.sesion(grafo, get_registro_fugas()), \
+                    perfilador.perfil("turno_agente", perfilador.solicitado(st.query_params), meta_turno):
+                texto_respuesta, origen = agente.responder(
+                    modelo, get_gestor_cuota(), entrada_usuario, por_voz=texto_input is None, historia=historia
+                )
+            st.markdown(texto_respuesta)
+            if origen in ("cache", "coalescida"):
+                st.caption("♻️ Respuesta reutilizada: otra sesión hizo la misma pregunta sobre los mismos datos.")
+            registro_chat.agregar(usuario_chat, "assistant", texto_respuesta)
         except Exception as e: st.error(f"Obstáculo técnico: {e}")
 
+# Estado de la IA: el modelo se elige con la primera pregunta de la sesión
+if st.session_state.get("modelo_agente"):
+    st.sidebar.success(f"IA Operativa: {st.session_state.modelo_agente.split('/')[-1]}")
+else:
+    st.sidebar.info("🤖 La IA se conecta con la primera pregunta.")
+st.sidebar.caption(f"Cuota Gemini hoy: {get_gestor_cuota().dia.usadas()}/{cuota.SOLICITUDES_POR_DIA} solicitudes")
+
+# --- 11. PANEL DE RENDIMIENTO ---
+telemetria.registrar("rerun_total", (time.perf_counter() - inicio_rerun) * 1000, len(df_full))
+if mostrar_rendimiento:
+    with st.sidebar:
+        st.markdown("---")
+        st.subheader("⏱️ Rendimiento por etapa")
+        st.dataframe(telemetria.resumen(), width="stretch", hide_index=True)
+        st.caption("Ventana móvil de las últimas lecturas por etapa (todas las sesiones).")
+
+        st.subheader("🧠 Memoria por sesión")
+        registro_sesiones = get_registro_sesiones()
+        st.dataframe(registro_sesiones.resumen(), width="stretch", hide_index=True)
+        rss = sesiones.rss_mb()
+        almacen = artefactos.almacen_proceso()
+        st.caption(
+            f"RSS del proceso: {'n/d' if rss is None else f'{rss:.0f} MB'} · "
+            f"almacén compartido {almacen.bytes / 2**20:.1f}/{almacen.max_bytes / 2**20:.0f} MB · "
+            f"{registro_sesiones.desalojos} desalojos por inactividad "
+            f"(> {registro_sesiones.inactiva_s / 60:.0f} min)"
+        )
 
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
+if perfil_rerun is not None:
+    ruta_perfil = perfilador.finalizar({
+        "rerun": telemetria.rerun_actual(),
+        "data_version": data_version,
+        "vista": view_option,
+        "filas_historial": len(df_full),
+        "filas_vista": len(df_vista),
+    })
+    st.toast(f"🧪 Perfil guardado: {ruta_perfil}")
+    # ?perfil=1 captura un solo rerun
+    if "perfil" in st.query_params:
+        del st.query_params["perfil"]
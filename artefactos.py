@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+"""
+Grafo de artefactos derivados con invalidación por versión.
+
+    hoja, correcciones ─► historial ─► vista ─► specs de gráficas / contexto del agente
+                                   └─► estadísticas, specs de la suite, exportaciones
+
+Las fuentes reciben su versión desde fuera (digest de la descarga, versión
+de la bitácora, ventana de vista). La versión de un nodo derivado es el hash
+de su nombre y las versiones de sus dependencias, así que es determinista:
+un nodo solo se recalcula cuando cambia algo aguas arriba, y dos sesiones con
+los mismos datos obtienen la misma versión y comparten el valor a través del
+almacén compartido del proceso.
+
+El almacén se limita por entradas y por bytes estimados (EA_ARTEFACTOS_MAX_MB).
+Otra sesión puede desalojar los valores de un grafo inactivo (desalojar());
+el grafo conserva versiones y cargadores y los recupera en el siguiente obtener().
+"""
+
+import hashlib
+import os
+import sys
+import threading
+import types
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+MAX_ARTEFACTOS_COMPARTIDOS = 64
+MAX_BYTES_COMPARTIDOS = int(float(os.environ.get("EA_ARTEFACTOS_MAX_MB", "1024")) * 2**20)
+_MAX_ELEMENTOS_TAMANO = 10_000 # Colecciones más largas se estiman con una muestra
+
+
+def tamano_bytes(valor, _vistos: set = None) -> int:
+    """
+    Bytes aproximados de un artefacto: memory_usage(deep=False) para frames
+    (no recorre las cadenas de columnas object), nbytes para arreglos y
+    getsizeof recursivo para contenedores y objetos.
+    """
+    vistos = set() if _vistos is None else _vistos
+    if id(valor) in vistos:
+        return 0
+    vistos.add(id(valor))
+    if isinstance(valor, pd.DataFrame):
+        return int(valor.memory_usage(index=True, deep=False).sum())
+    if isinstance(valor, (pd.Series, pd.Index)):
+        return int(valor.memory_usage(deep=False))
+    if isinstance(valor, np.ndarray):
+        return int(valor.nbytes)
+    if isinstance(valor, dict):
+        elementos = [*valor.keys(), *valor.values()]
+    elif isinstance(valor, (list, tuple, set, frozenset)):
+        elementos = list(valor)
+    elif hasattr(valor, "__dict__") and not isinstance(valor, (type, types.ModuleType)):
+        elementos = list(vars(valor).values())
+    else:
+        return sys.getsizeof(valor)
+    total = sys.getsizeof(valor)
+    muestra = elementos[:_MAX_ELEMENTOS_TAMANO]
+    if muestra:
+        total += sum(tamano_bytes(e, vistos) for e in muestra) * len(elementos) // len(muestra)
+    return total
+
+
+class AlmacenCompartido:
+    """LRU de valores por (nodo, versión), compartido entre sesiones."""
+
+    def __init__(self, max_entradas: int = MAX_ARTEFACTOS_COMPARTIDOS, max_bytes: int = MAX_BYTES_COMPARTIDOS):
+        self.max_entradas = max_entradas
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._valores = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obtener(self, clave):
+        with self._lock:
+            if clave in self._valores:
+                self._valores.move_to_end(clave)
+                return True, self._valores[clave][0]
+        return False, None
+
+    def guardar(self, clave, valor):
+        tamano = tamano_bytes(valor)
+        with self._lock:
+            if clave in self._valores:
+                self.bytes -= self._valores[clave][1]
+            self._valores[clave] = (valor, tamano)
+            self._valores.move_to_end(clave)
+            self.bytes += tamano
+            # La entrada recién guardada se conserva aunque sola exceda el límite de bytes
+            while len(self._valores) > self.max_entradas or (self.bytes > self.max_bytes and len(self._valores) > 1):
+                _, (_, liberado) = self._valores.popitem(last=False)
+                self.bytes -= liberado
+
+    def valores(self) -> list:
+        """[(clave, valor, bytes)] de las entradas actuales."""
+        with self._lock:
+            return [(clave, valor, tamano) for clave, (valor, tamano) in self._valores.items()]
+
+
+_almacen_proceso = AlmacenCompartido()
+
+
+def almacen_proceso() -> AlmacenCompartido:
+    return _almacen_proceso
+
+
+class _Nodo:
+    __slots__ = ("nombre", "funcion", "dependencias", "compartir",
+                 "version", "valor", "cargador", "calculado")
+
+    def __init__(self, nombre, funcion=None, dependencias=(), compartir=False):
+        self.nombre = nombre
+        self.funcion = funcion
+        self.dependencias = tuple(dependencias)
+        self.compartir = compartir
+        self.version = None
+        self.valor = None
+        self.cargador = None
+        self.calculado = False
+
+
+class GrafoArtefactos:
+    def __init__(self, almacen: AlmacenCompartido = None):
+        self._nodos = {}
+        self._almacen = almacen or _almacen_proceso
+        self.recalculos = {}
+        # La sesión dueña y el barrido de sesiones inactivas pueden tocar el grafo a la vez
+        self._lock = threading.RLock()
+
+    def fuente(self, nombre: str):
+        self._nodos[nombre] = _Nodo(nombre)
+        return self
+
+    def derivado(self, nombre: str, funcion, dependencias, compartir: bool = False):
+        faltantes = [d for d in dependencias if d not in self._nodos]
+        if faltantes:
+            raise KeyError(f"Dependencias no definidas para '{nombre}': {faltantes}")
+        self._nodos[nombre] = _Nodo(nombre, funcion, dependencias, compartir)
+        return self
+
+    def fijar(self, nombre: str, version, valor=None, cargador=None) -> bool:
+        """
+        Actualiza una fuente. Si la versión no cambió no invalida nada.
+        'cargador' permite diferir la lectura del valor hasta que alguien lo pida.
+        Devuelve True si la versión cambió.
+        """
+        with self._lock:
+            nodo = self._nodos[nombre]
+            if nodo.version == version and (nodo.calculado or nodo.cargador is not None):
+                return False
+            nodo.version = version
+            nodo.valor = valor
+            nodo.cargador = cargador
+            nodo.calculado = cargador is None
+            return True
+
+    def version(self, nombre: str):
+        nodo = self._nodos[nombre]
+        if not nodo.dependencias:
+            return nodo.version
+        crudo = "|".join([nombre] + [str(self.version(d)) for d in nodo.dependencias])
+        return hashlib.blake2b(crudo.encode("utf-8"), digest_size=12).hexdigest()
+
+    def obtener(self, nombre: str):
+        with self._lock:
+            nodo = self._nodos[nombre]
+            if not nodo.dependencias:
+                if not nodo.calculado:
+                    if nodo.cargador is None:
+                        raise LookupError(f"La fuente '{nombre}' no tiene valor")
+                    nodo.valor = nodo.cargador()
+                    nodo.calculado = True
+                return nodo.valor
+
+            version = self.version(nombre)
+            if nodo.calculado and nodo.version == version:
+                return nodo.valor
+
+            encontrado, valor = self._almacen.obtener((nombre, version)) if nodo.compartir else (False, None)
+            if not encontrado:
+                valor = nodo.funcion(*[self.obtener(d) for d in nodo.dependencias])
+                self.recalculos[nombre] = self.recalculos.get(nombre, 0) + 1
+                if nodo.compartir:
+                    self._almacen.guardar((nombre, version), valor)
+
+            nodo.version = version
+            nodo.valor = valor
+            nodo.calculado = True
+            return valor
+
+    def liberar(self, nombre: str):
+        """Suelta el valor en memoria; se recalcula (o recarga) en el siguiente obtener()."""
+        with self._lock:
+            nodo = self._nodos[nombre]
+            if nodo.dependencias or nodo.cargador is not None:
+                nodo.valor = None
+                nodo.calculado = False
+
+    def valores(self) -> dict:
+        """{nodo: valor} de lo que está en memoria (para la contabilidad por sesión)."""
+        with self._lock:
+            return {nodo.nombre: nodo.valor for nodo in self._nodos.values() if nodo.calculado}
+
+    def desalojar(self):
+        """
+        Libera todo lo recuperable (derivados y fuentes con cargador) y devuelve
+        los nodos liberados; None si la sesión dueña está usando el grafo.
+        """
+        if not self._lock.acquire(blocking=False):
+            return None
+        try:
+            liberados = [n.nombre for n in self._nodos.values()
+                         if n.calculado and (n.dependencias or n.cargador is not None)]
+            for nombre in liberados:
+                self.liberar(nombre)
+            return liberados
+        finally:
+            self._lock.release()
+
+    def nodos(self):
+        return list(self._nodos)
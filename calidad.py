@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""
+Validación de calidad de datos antes del cálculo termodinámico.
+
+Todas las reglas se evalúan vectorizadas en una sola pasada sobre la hoja ya
+corregida. Cada fila recibe un código de bits con sus motivos. Las filas con
+algún motivo pasan a la tabla de cuarentena, que conserva el número de fila
+de la hoja. Las demás siguen al historial ordenadas por tiempo.
+
+Los huecos de tiempo no invalidan la lectura: se cuentan y se listan aparte,
+porque la diferencia de volumen que sigue a un hueco acumula horas de consumo.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+TEMP_MIN_C = float(os.environ.get("EA_TEMP_MIN_C", "-30"))
+TEMP_MAX_C = float(os.environ.get("EA_TEMP_MAX_C", "60"))
+PRESION_MIN_PSI = float(os.environ.get("EA_PRESION_MIN_PSI", "0"))
+PRESION_MAX_PSI = float(os.environ.get("EA_PRESION_MAX_PSI", "500"))
+HUECO_MAX_H = float(os.environ.get("EA_HUECO_MAX_H", "12"))
+
+# Código de motivo -> bit
+REGLAS = {
+    'marca_invalida': 1,
+    'temp_invalida': 2, # vacía o no numérica
+    'presion_invalida': 4,
+    'temp_fuera_rango': 8,
+    'presion_fuera_rango': 16,
+    'marca_duplicada': 32, # se conserva la primera lectura con esa marca
+}
+
+_NS_POR_H = 3_600 * 10**9
+
+
+def _motivos(codigos: np.ndarray) -> pd.Series:
+    """Texto de motivos por fila; solo se arma una vez por código distinto."""
+    textos = {
+        int(c): ", ".join(regla for regla, bit in REGLAS.items() if c & bit) for c in np.unique(codigos)
+    }
+    return pd.Series(codigos).map(textos)
+
+
+def validar(df) -> dict:
+    """
+    Devuelve {'limpio', 'cuarentena', 'huecos', 'conteos'}.
+    'limpio' va ordenado por 'Marca temporal'; 'cuarentena' lleva 'Motivo' y 'Codigo'.
+    """
+    n = len(df)
+    marcas = df['Marca temporal']
+    if not pd.api.types.is_datetime64_any_dtype(marcas):
+        marcas = pd.to_datetime(marcas, errors='coerce')
+    t = marcas.to_numpy('datetime64[ns]')
+    temp = pd.to_numeric(df['Temperatura Celsius'], errors='coerce').to_numpy(np.float64)
+    presion = pd.to_numeric(df['Presión'], errors='coerce').to_numpy(np.float64)
+
+    codigos = np.zeros(n, dtype=np.uint8)
+    codigos[np.isnat(t)] |= REGLAS['marca_invalida']
+    codigos[np.isnan(temp)] |= REGLAS['temp_invalida']
+    codigos[np.isnan(presion)] |= REGLAS['presion_invalida']
+    with np.errstate(invalid='ignore'):
+        codigos[(temp < TEMP_MIN_C) | (temp > TEMP_MAX_C)] |= REGLAS['temp_fuera_rango']
+        codigos[(presion < PRESION_MIN_PSI) | (presion > PRESION_MAX_PSI)] |= REGLAS['presion_fuera_rango']
+
+    # Duplicados y huecos solo entre lecturas que pasaron las reglas de valor
+    orden = np.flatnonzero(codigos == 0)
+    ts = t[orden].astype(np.int64)
+    if not (ts[1:] >= ts[:-1]).all(): # La hoja suele llegar en orden: se evita el argsort
+        por_tiempo = np.argsort(ts, kind='stable')
+        orden, ts = orden[por_tiempo], ts[por_tiempo]
+    repetida = np.concatenate(([False], ts[1:] == ts[:-1]))
+    codigos[orden[repetida]] |= REGLAS['marca_duplicada']
+    orden, ts = orden[~repetida], ts[~repetida]
+
+    salto_h = np.diff(ts) / _NS_POR_H
+    hueco = np.flatnonzero(salto_h > HUECO_MAX_H)
+    huecos = pd.DataFrame({
+        'Desde': pd.to_datetime(ts[hueco]),
+        'Hasta': pd.to_datetime(ts[hueco + 1]),
+        'Horas': salto_h[hueco].round(2),
+    })
+
+    en_cuarentena = np.flatnonzero(codigos)
+    cuarentena = df.iloc[en_cuarentena].copy()
+    cuarentena['Motivo'] = _motivos(codigos[en_cuarentena]).to_numpy()
+    cuarentena['Codigo'] = codigos[en_cuarentena]
+
+    conteos = {"filas": n, "validas": len(orden), "cuarentena": len(en_cuarentena)}
+    conteos.update({regla: int(np.count_nonzero(codigos & bit)) for regla, bit in REGLAS.items()})
+    conteos["huecos_tiempo"] = len(hueco)
+    return {"limpio": df.iloc[orden], "cuarentena": cuarentena, "huecos": huecos, "conteos": conteos}
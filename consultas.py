@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+"""
+Motor SQL embebido, de solo lectura, sobre el historial para el agente.
+
+Con DuckDB instalado los frames se registran sin copia y cada consulta se
+ejecuta por columnas directamente sobre los arreglos del historial en
+memoria (solo se leen las columnas que usa la consulta). Sin DuckDB se usa
+SQLite en memoria, que copia los datos una vez por versión del historial.
+
+Guardas: una sola sentencia SELECT/WITH, resultado limitado a MAX_FILAS_SQL
+filas, tiempo máximo EA_SQL_TIMEOUT_S y sin acceso a archivos (DuckDB:
+enable_external_access=false con la configuración bloqueada; SQLite:
+autorizador que solo permite lecturas).
+
+    python prueba_modulos.py consultas --filas 5000000
+"""
+
+import os
+import re
+import sqlite3
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+MAX_FILAS_SQL = int(os.environ.get("EA_SQL_MAX_FILAS", "200"))
+TIMEOUT_S = float(os.environ.get("EA_SQL_TIMEOUT_S", "5"))
+MEMORIA_DUCKDB = os.environ.get("EA_SQL_MEMORIA", "1GB")
+
+# Tabla -> {columna SQL: columna del frame}; None es el índice (número de fila de la hoja)
+TABLAS = {
+    'historial': {
+        'fila': None,
+        'marca_temporal': 'Marca temporal',
+        'temperatura_c': 'Temperatura Celsius',
+        'presion_psi': 'Presión',
+        'presion_absoluta_psia': 'Vessel Pressure',
+        'factor_z': 'Compressibility Factor (Z)',
+        'factor_fv': 'Volume Factor (Fv)',
+        'volumen_m3': 'Volume in Cubic Meters ( M3 )',
+        'diferencia_m3': 'Diferencia M3',
+        'consumo_m3': 'Consumo Absoluto M3',
+    },
+    'cuarentena': {
+        'fila': None,
+        'marca_temporal': 'Marca temporal',
+        'temperatura_c': 'Temperatura Celsius',
+        'presion_psi': 'Presión',
+        'motivo': 'Motivo',
+    },
+    'fugas': {
+        'inicio': 'Inicio',
+        'fin': 'Fin',
+        'lecturas': 'Lecturas',
+        'pendiente_m3_h': 'Pendiente M3/h',
+        'perdida_m3': 'Pérdida M3',
+        'temp_media_c': 'Temp media C',
+    },
+    'correcciones': {c: c for c in ['seq', 'fila', 'columna', 'anterior', 'nuevo', 'autor', 'creado']},
+}
+
+
+class ConsultaRechazada(ValueError):
+    pass
+
+
+def duckdb_disponible() -> bool:
+    try:
+        import duckdb  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def esquema() -> str:
+    return "\n".join(f"{tabla}({', '.join(columnas)})" for tabla, columnas in TABLAS.items())
+
+
+def _tabla(df, columnas: dict) -> pd.DataFrame:
+    """Vista angosta con nombres SQL; las columnas se comparten con el frame original."""
+    datos = {}
+    for alias, col in columnas.items():
+        if col is None:
+            datos[alias] = df.index.to_numpy()
+        elif col in df.columns:
+            datos[alias] = df[col]
+        else:
+            datos[alias] = df.ea[col] # Derivables del esquema compacto
+    return pd.DataFrame(datos, copy=False).reset_index(drop=True)
+
+
+def _cargar_sqlite(con, nombre: str, frame: pd.DataFrame):
+    """Inserción directa por columnas (más rápida que to_sql); fechas como texto ISO."""
+    columnas = []
+    for col in frame.columns:
+        valores = frame[col].to_numpy()
+        if np.issubdtype(valores.dtype, np.datetime64):
+            texto = np.datetime_as_string(valores, unit='s').astype(object)
+            texto[np.isnat(valores)] = None
+            valores = texto
+        columnas.append(valores.tolist())
+    con.execute(f"CREATE TABLE {nombre} ({', '.join(frame.columns)})")
+    con.executemany(f"INSERT INTO {nombre} VALUES ({', '.join('?' * len(frame.columns))})", zip(*columnas))
+
+
+def _solo_lectura(accion, *_):
+    permitidas = (sqlite3.SQLITE_SELECT, sqlite3.SQLITE_READ, sqlite3.SQLITE_FUNCTION)
+    return sqlite3.SQLITE_OK if accion in permitidas else sqlite3.SQLITE_DENY
+
+
+class MotorConsultas:
+    """Una conexión en memoria por versión del historial; las consultas se serializan con un lock."""
+
+    def __init__(self, tablas: dict, usar_duckdb: bool = None):
+        self.usar_duckdb = duckdb_disponible() if usar_duckdb is None else usar_duckdb
+        self._lock = threading.Lock()
+        self._frames = {nombre: _tabla(df, TABLAS[nombre]) for nombre, df in tablas.items()}
+        if self.usar_duckdb:
+            import duckdb
+
+            self._con = duckdb.connect(config={"memory_limit": MEMORIA_DUCKDB})
+            for nombre, frame in self._frames.items():
+                self._con.register(nombre, frame)
+            self._con.execute("SET enable_external_access = false")
+            self._con.execute("SET lock_configuration = true")
+        else:
+            self._con = sqlite3.connect(":memory:", check_same_thread=False)
+            for nombre, frame in self._frames.items():
+                _cargar_sqlite(self._con, nombre, frame)
+            self._frames = {} # SQLite ya tiene su copia
+            self._con.set_authorizer(_solo_lectura)
+
+    @property
+    def motor(self) -> str:
+        return "duckdb" if self.usar_duckdb else "sqlite"
+
+    def _validar(self, consulta: str) -> str:
+        consulta = consulta.strip().rstrip(';').strip()
+        if not re.match(r'(select|with)\b', consulta, re.IGNORECASE):
+            raise ConsultaRechazada("Solo se permiten consultas SELECT (o WITH ... SELECT).")
+        if self.usar_duckdb:
+            import duckdb
+
+            sentencias = self._con.extract_statements(consulta)
+            if len(sentencias) != 1 or sentencias[0].type != duckdb.StatementType.SELECT:
+                raise ConsultaRechazada("Se permite exactamente una sentencia SELECT.")
+        # SQLite ejecuta una sola sentencia por execute() y el autorizador rechaza escrituras
+        return consulta
+
+    def consultar(self, consulta: str, max_filas: int = MAX_FILAS_SQL):
+        """(DataFrame con a lo más max_filas filas, truncado)."""
+        consulta = self._validar(consulta)
+        # El LIMIT externo deja que el motor corte temprano; el salto de línea protege de un '--' final
+        envuelta = f"SELECT * FROM (\n{consulta}\n) AS consulta LIMIT {int(max_filas) + 1}"
+        with self._lock:
+            if self.usar_duckdb:
+                reloj = threading.Timer(TIMEOUT_S, self._con.interrupt)
+                reloj.start()
+            else:
+                limite = time.monotonic() + TIMEOUT_S
+                self._con.set_progress_handler(lambda: time.monotonic() > limite, 10_000)
+            try:
+                cursor = self._con.execute(envuelta)
+                columnas = [d[0] for d in cursor.description]
+                filas = cursor.fetchall()
+            finally:
+                if self.usar_duckdb:
+                    reloj.cancel()
+                else:
+                    self._con.set_progress_handler(None, 0)
+        return pd.DataFrame(filas[:max_filas], columns=columnas), len(filas) > max_filas
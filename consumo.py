@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""
+Índice de consumo y recargas con sumas acumuladas.
+
+Cada cambio de volumen entre lecturas consecutivas se clasifica como recarga
+(subida mayor que EA_UMBRAL_RECARGA_M3), consumo (bajada) o subida menor
+(recarga lenta o ruido de lectura por debajo del umbral). El consumo solo
+suma bajadas, así que nunca es negativo; el neto sí incluye las subidas
+menores. Se guardan las sumas acumuladas de los tres, así que el consumo
+entre dos fechas cualesquiera son dos búsquedas binarias y una resta:
+
+    indice = IndiceConsumo(historial)
+    indice.rango('2026-01-12 06:00', '2026-01-14 18:00')
+
+Un cambio cuenta dentro del rango si la lectura donde termina cae en
+(inicio, fin].
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+UMBRAL_RECARGA_M3 = float(os.environ.get("EA_UMBRAL_RECARGA_M3", "5"))
+
+
+def _ns(momento) -> int:
+    return pd.Timestamp(momento).to_datetime64().astype('datetime64[ns]').astype(np.int64)
+
+
+class IndiceConsumo:
+    def __init__(self, historial, umbral_recarga: float = UMBRAL_RECARGA_M3):
+        self.umbral_recarga = umbral_recarga
+        self.tiempos = historial['Marca temporal'].to_numpy('datetime64[ns]').astype(np.int64)
+        diferencia = historial.ea['Diferencia M3'].to_numpy(np.float64)
+
+        es_recarga = diferencia > umbral_recarga
+        es_subida = (diferencia > 0) & ~es_recarga
+        self.pref_recarga = np.concatenate(([0.0], np.cumsum(np.where(es_recarga, diferencia, 0.0))))
+        self.pref_subida = np.concatenate(([0.0], np.cumsum(np.where(es_subida, diferencia, 0.0))))
+        self.pref_consumo = np.concatenate(([0.0], np.cumsum(np.where(diferencia < 0, -diferencia, 0.0))))
+
+        # Eventos de recarga: tramos de lecturas de recarga consecutivas
+        bordes = np.diff(np.concatenate(([0], es_recarga.astype(np.int8), [0])))
+        inicios, fines = np.flatnonzero(bordes == 1), np.flatnonzero(bordes == -1) - 1
+        self.recarga_inicio = self.tiempos[np.maximum(inicios - 1, 0)] # última lectura antes de subir
+        self.recarga_fin = self.tiempos[fines]
+        self.recarga_m3 = self.pref_recarga[fines + 1] - self.pref_recarga[inicios]
+
+    def __len__(self):
+        return len(self.tiempos)
+
+    def _posiciones(self, inicio, fin):
+        lo = 0 if inicio is None else int(np.searchsorted(self.tiempos, _ns(inicio), side='right'))
+        hi = len(self.tiempos) if fin is None else int(np.searchsorted(self.tiempos, _ns(fin), side='right'))
+        return lo, max(lo, hi)
+
+    def rango(self, inicio=None, fin=None) -> dict:
+        """Consumo, recargas, subidas menores y cambio neto de volumen entre inicio y fin, en O(log n)."""
+        lo, hi = self._posiciones(inicio, fin)
+        consumo = self.pref_consumo[hi] - self.pref_consumo[lo]
+        recarga = self.pref_recarga[hi] - self.pref_recarga[lo]
+        subida = self.pref_subida[hi] - self.pref_subida[lo]
+        e_lo = int(np.searchsorted(self.recarga_fin, self.tiempos[lo], side='left')) if lo < hi else 0
+        e_hi = int(np.searchsorted(self.recarga_fin, self.tiempos[hi - 1], side='right')) if lo < hi else 0
+        return {
+            "consumo_m3": float(consumo),
+            "recarga_m3": float(recarga),
+            "subida_menor_m3": float(subida),
+            "neto_m3": float(recarga + subida - consumo),
+            "lecturas": hi - lo,
+            "recargas": max(0, e_hi - e_lo),
+        }
+
+    def recargas(self, inicio=None, fin=None) -> pd.DataFrame:
+        """Eventos de recarga que terminan dentro del rango."""
+        lo = 0 if inicio is None else int(np.searchsorted(self.recarga_fin, _ns(inicio), side='right'))
+        hi = len(self.recarga_fin) if fin is None else int(np.searchsorted(self.recarga_fin, _ns(fin), side='right'))
+        return pd.DataFrame({
+            'Inicio': pd.to_datetime(self.recarga_inicio[lo:hi]),
+            'Fin': pd.to_datetime(self.recarga_fin[lo:hi]),
+            'Recarga M3': self.recarga_m3[lo:hi].round(3),
+        })
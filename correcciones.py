@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+"""
+Bitácora persistente de correcciones del operador (event sourcing).
+
+Cada parche del editor se guarda como evento append-only (autor y hora) en
+SQLite. Cada cierto número de eventos se guarda un snapshot del estado
+materializado {(fila, columna): valor}, de modo que al recargar la hoja solo
+se leen el último snapshot y la cola de eventos posteriores.
+
+Las ediciones concurrentes usan versionado optimista: quien edita declara la
+versión de la bitácora que vio y el registro se rechaza si otra sesión cambió
+las mismas celdas después de esa versión.
+"""
+
+import json
+import os
+import sqlite3
+from contextlib import closing
+from datetime import datetime
+
+import pandas as pd
+
+DIRECTORIO_DATOS = os.environ.get("EA_DATA_DIR", "datos")
+EVENTOS_POR_SNAPSHOT = 200
+
+
+class ConflictoEdicion(Exception):
+    """Otra sesión corrigió las mismas celdas después de la versión leída."""
+
+
+def _a_json(valor):
+    if isinstance(valor, pd.Timestamp):
+        return json.dumps({"t": valor.isoformat()})
+    if valor is None or pd.isna(valor):
+        return json.dumps(None)
+    return json.dumps(float(valor))
+
+
+def _desde_json(texto):
+    valor = json.loads(texto)
+    if isinstance(valor, dict):
+        return pd.Timestamp(valor["t"])
+    return valor
+
+
+def aplicar_estado(df, estado: dict):
+    """
+    Aplica un estado materializado {(fila, columna): valor_json} sobre df (in-place).
+    Las columnas enteras corregidas pasan a float64: una corrección puede ser
+    fraccionaria o vaciar la celda.
+    """
+    celdas = [(fila, columna, valor) for (fila, columna), valor in estado.items()
+              if fila in df.index and columna in df.columns]
+    for columna in {columna for _, columna, _ in celdas}:
+        if pd.api.types.is_integer_dtype(df[columna]) or pd.api.types.is_bool_dtype(df[columna]):
+            df[columna] = df[columna].astype('float64')
+    for fila, columna, valor in celdas:
+        df.at[fila, columna] = _desde_json(valor)
+    return df
+
+
+class RegistroCorrecciones:
+    def __init__(self, ruta: str = None, eventos_por_snapshot: int = EVENTOS_POR_SNAPSHOT):
+        if ruta is None:
+            os.makedirs(DIRECTORIO_DATOS, exist_ok=True)
+            ruta = os.path.join(DIRECTORIO_DATOS, "correcciones.db")
+        self.ruta = ruta
+        self.eventos_por_snapshot = eventos_por_snapshot
+        with closing(self._conectar()) as con:
+            con.executescript("""
+                CREATE TABLE IF NOT EXISTS eventos (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    fila INTEGER NOT NULL,
+                    columna TEXT NOT NULL,
+                    anterior TEXT,
+                    nuevo TEXT,
+                    autor TEXT,
+                    creado TEXT NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS snapshots (
+                    seq INTEGER PRIMARY KEY,
+                    creado TEXT NOT NULL,
+                    estado TEXT NOT NULL
+                );
+            """)
+
+    def _conectar(self):
+        return sqlite3.connect(self.ruta, timeout=10, isolation_level=None)
+
+    def version(self) -> int:
+        with closing(self._conectar()) as con:
+            return con.execute("SELECT COALESCE(MAX(seq), 0) FROM eventos").fetchone()[0]
+
+    def registrar(self, parches: list, autor: str, version_esperada: int) -> int:
+        """Agrega los parches a la bitácora y devuelve la nueva versión."""
+        if not parches:
+            return version_esperada
+        ahora = datetime.now().isoformat(timespec="seconds")
+        with closing(self._conectar()) as con:
+            con.execute("BEGIN IMMEDIATE")
+            try:
+                celdas = {(p["fila"], p["columna"]) for p in parches}
+                recientes = con.execute(
+                    "SELECT fila, columna FROM eventos WHERE seq > ?", (version_esperada,)
+                ).fetchall()
+                if celdas.intersection(recientes):
+                    raise ConflictoEdicion("Otra sesión corrigió estas lecturas; recarga los datos.")
+                con.executemany(
+                    "INSERT INTO eventos (fila, columna, anterior, nuevo, autor, creado) VALUES (?, ?, ?, ?, ?, ?)",
+                    [(int(p["fila"]), p["columna"], _a_json(p["anterior"]), _a_json(p["nuevo"]), autor, ahora)
+                     for p in parches]
+                )
+                nueva_version = con.execute("SELECT MAX(seq) FROM eventos").fetchone()[0]
+                con.execute("COMMIT")
+            except Exception:
+                con.execute("ROLLBACK")
+                raise
+
+        ultimo_snapshot = self._ultimo_snapshot()[0]
+        if nueva_version - ultimo_snapshot >= self.eventos_por_snapshot:
+            self.guardar_snapshot()
+        return nueva_version
+
+    def _ultimo_snapshot(self):
+        with closing(self._conectar()) as con:
+            fila = con.execute("SELECT seq, estado FROM snapshots ORDER BY seq DESC LIMIT 1").fetchone()
+        if fila is None:
+            return 0, {}
+        return fila[0], json.loads(fila[1])
+
+    def estado(self):
+        """
+        Estado materializado: último snapshot + eventos posteriores.
+        Devuelve (version, {(fila, columna): valor_json}).
+        """
+        seq_snapshot, estado_snapshot = self._ultimo_snapshot()
+        estado = {(int(k.split("|", 1)[0]), k.split("|", 1)[1]): v for k, v in estado_snapshot.items()}
+        version = seq_snapshot
+        with closing(self._conectar()) as con:
+            for seq, fila, columna, nuevo in con.execute(
+                "SELECT seq, fila, columna, nuevo FROM eventos WHERE seq > ? ORDER BY seq", (seq_snapshot,)
+            ):
+                estado[(fila, columna)] = nuevo
+                version = seq
+        return version, estado
+
+    def guardar_snapshot(self):
+        version, estado = self.estado()
+        serializado = json.dumps({f"{fila}|{columna}": v for (fila, columna), v in estado.items()})
+        with closing(self._conectar()) as con:
+            con.execute(
+                "INSERT OR REPLACE INTO snapshots (seq, creado, estado) VALUES (?, ?, ?)",
+                (version, datetime.now().isoformat(timespec="seconds"), serializado)
+            )
+        return version
+
+    def aplicar(self, df):
+        """Aplica las correcciones vigentes sobre df (in-place). Devuelve (df, version)."""
+        version, estado = self.estado()
+        return aplicar_estado(df, estado), version
+
+    def historial(self, limite: int = 100) -> pd.DataFrame:
+        """Últimos eventos de la bitácora, más recientes primero."""
+        with closing(self._conectar()) as con:
+            return pd.read_sql_query(
+                "SELECT seq, fila, columna, anterior, nuevo, autor, creado FROM eventos ORDER BY seq DESC LIMIT ?",
+                con, params=(limite,)
+            )
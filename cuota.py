@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+"""
+Cuota de Gemini compartida por todas las sesiones del proceso.
+
+- Límite por minuto: cubeta de tokens (EA_GEMINI_RPM) que se rellena de
+  forma continua; si está vacía se espera hasta EA_GEMINI_ESPERA_MAX_S.
+- Cuota diaria (EA_GEMINI_RPD): contador por día en horario del Pacífico,
+  que es cuando Google reinicia la cuota, persistido en SQLite
+  (EA_DATA_DIR/cuota.db) para que sobreviva a reinicios.
+- Peticiones idénticas (mismo modelo, prompt y versión de datos) en vuelo
+  esperan a la primera en lugar de llamar otra vez, y la respuesta se
+  reutiliza durante EA_GEMINI_CACHE_S. Un turno con efectos (alerta
+  enviada, gráfica dibujada) no se reutiliza: quien esperaba hace su propia
+  solicitud, y la cache no lo guarda.
+- Sin cuota, responder() devuelve el respaldo (p. ej. el diagnóstico
+  precalculado) en lugar de llamar a la API.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter, OrderedDict
+from concurrent.futures import Future
+from contextlib import closing
+from datetime import datetime, timedelta, timezone
+
+DIRECTORIO_DATOS = os.environ.get("EA_DATA_DIR", "datos")
+SOLICITUDES_POR_MINUTO = int(os.environ.get("EA_GEMINI_RPM", "15"))
+SOLICITUDES_POR_DIA = int(os.environ.get("EA_GEMINI_RPD", "1500"))
+CACHE_S = float(os.environ.get("EA_GEMINI_CACHE_S", "300"))
+ESPERA_MAX_S = float(os.environ.get("EA_GEMINI_ESPERA_MAX_S", "10"))
+ESPERA_COALESCIDA_S = 180
+MAX_RESPUESTAS_CACHE = 128
+
+
+def _zona_cuota():
+    try:
+        from zoneinfo import ZoneInfo
+
+        return ZoneInfo("America/Los_Angeles")
+    except Exception:
+        return timezone(timedelta(hours=-8)) # Sin base de zonas horarias (p. ej. Windows sin tzdata)
+
+
+def _es_cuota_agotada(error: Exception) -> bool:
+    return type(error).__name__ in ("ResourceExhausted", "TooManyRequests") or "429" in str(error)
+
+
+class CubetaTokens:
+    def __init__(self, capacidad: float, por_segundo: float):
+        self.capacidad = capacidad
+        self.por_segundo = por_segundo
+        self.tokens = float(capacidad)
+        self._t = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _rellenar(self):
+        ahora = time.monotonic()
+        self.tokens = min(self.capacidad, self.tokens + (ahora - self._t) * self.por_segundo)
+        self._t = ahora
+
+    def tomar(self, espera_max_s: float = 0.0) -> bool:
+        """Toma un token; espera a que se rellene si alcanza dentro de espera_max_s."""
+        limite = time.monotonic() + espera_max_s
+        while True:
+            with self._lock:
+                self._rellenar()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return True
+                faltan_s = (1 - self.tokens) / self.por_segundo
+            if time.monotonic() + faltan_s > limite:
+                return False
+            time.sleep(faltan_s)
+
+    def cargar(self, n: float):
+        """Descuenta n tokens ya gastados; la cubeta puede quedar en deuda."""
+        with self._lock:
+            self._rellenar()
+            self.tokens -= n
+
+
+class CuotaDiaria:
+    def __init__(self, limite: int = SOLICITUDES_POR_DIA, ruta: str = None):
+        if ruta is None:
+            os.makedirs(DIRECTORIO_DATOS, exist_ok=True)
+            ruta = os.path.join(DIRECTORIO_DATOS, "cuota.db")
+        self.limite = limite
+        self.ruta = ruta
+        self.zona = _zona_cuota()
+        with closing(self._conectar()) as con:
+            con.execute("CREATE TABLE IF NOT EXISTS uso (dia TEXT PRIMARY KEY, solicitudes INTEGER NOT NULL)")
+
+    def _conectar(self):
+        return sqlite3.connect(self.ruta, timeout=10, isolation_level=None)
+
+    def _dia(self) -> str:
+        return datetime.now(self.zona).date().isoformat()
+
+    def reservar(self, n: int = 1) -> bool:
+        dia = self._dia()
+        with closing(self._conectar()) as con:
+            con.execute("INSERT OR IGNORE INTO uso VALUES (?, 0)", (dia,))
+            cursor = con.execute(
+                "UPDATE uso SET solicitudes = solicitudes + ? WHERE dia = ? AND solicitudes + ? <= ?",
+                (n, dia, n, self.limite)
+            )
+            return cursor.rowcount == 1
+
+    def cargar(self, n: int):
+        """Ajusta el uso de hoy sin tope (solicitudes extra de una llamada, o devolución si n < 0)."""
+        dia = self._dia()
+        with closing(self._conectar()) as con:
+            con.execute("INSERT OR IGNORE INTO uso VALUES (?, 0)", (dia,))
+            con.execute("UPDATE uso SET solicitudes = MAX(solicitudes + ?, 0) WHERE dia = ?", (n, dia))
+
+    def usadas(self) -> int:
+        with closing(self._conectar()) as con:
+            fila = con.execute("SELECT solicitudes FROM uso WHERE dia = ?", (self._dia(),)).fetchone()
+        return fila[0] if fila else 0
+
+
+class GestorCuota:
+    def __init__(self, por_minuto: int = SOLICITUDES_POR_MINUTO, por_dia: int = SOLICITUDES_POR_DIA,
+                 cache_s: float = CACHE_S, ruta: str = None):
+        self.minuto = CubetaTokens(por_minuto, por_minuto / 60)
+        self.dia = CuotaDiaria(por_dia, ruta)
+        self.cache_s = cache_s
+        self.conteo = Counter()
+        self._lock = threading.Lock()
+        self._en_vuelo = {}
+        self._respuestas = OrderedDict()
+
+    def reservar(self, espera_max_s: float = ESPERA_MAX_S) -> bool:
+        """Una solicitud a la API: primero la cuota diaria y luego el límite por minuto."""
+        if not self.dia.reservar():
+            return False
+        if not self.minuto.tomar(espera_max_s):
+            self.dia.cargar(-1)
+            return False
+        return True
+
+    def _guardar(self, clave: str, texto: str):
+        with self._lock:
+            self._respuestas[clave] = (time.monotonic() + self.cache_s, texto)
+            self._respuestas.move_to_end(clave)
+            while len(self._respuestas) > MAX_RESPUESTAS_CACHE:
+                self._respuestas.popitem(last=False)
+
+    def responder(self, clave, generar, respaldo) -> tuple:
+        """
+        (texto, origen), con origen en 'api', 'cache', 'coalescida' o 'respaldo'.
+        generar() -> (texto, solicitudes hechas a la API, reutilizable); respaldo() -> texto.
+        """
+        clave = hashlib.blake2b(repr(clave).encode("utf-8"), digest_size=16).hexdigest()
+        while True:
+            with self._lock:
+                guardada = self._respuestas.get(clave)
+                if guardada is not None and guardada[0] > time.monotonic():
+                    self.conteo['cache'] += 1
+                    return guardada[1], 'cache'
+                futuro = self._en_vuelo.get(clave)
+                lider = futuro is None
+                if lider:
+                    futuro = self._en_vuelo[clave] = Future()
+            if lider:
+                break
+            texto, origen = futuro.result(timeout=ESPERA_COALESCIDA_S)
+            if origen is None: # El turno del líder tuvo efectos: este hace el suyo
+                continue
+            origen = 'coalescida' if origen == 'api' else origen
+            with self._lock:
+                self.conteo[origen] += 1
+            return texto, origen
+
+        try:
+            resultado, compartido = None, None
+            if self.reservar():
+                try:
+                    texto, solicitudes, reutilizable = generar()
+                except Exception as e:
+                    if not _es_cuota_agotada(e):
+                        raise
+                else:
+                    # Con llamadas a herramientas un turno hace varias solicitudes
+                    extra = max(solicitudes - 1, 0)
+                    if extra:
+                        self.minuto.cargar(extra)
+                        self.dia.cargar(extra)
+                    resultado = (texto, 'api')
+                    if reutilizable:
+                        self._guardar(clave, texto)
+                    else:
+                        compartido = (None, None)
+            if resultado is None:
+                resultado = (respaldo(), 'respaldo')
+        except Exception as e:
+            futuro.set_exception(e)
+            raise
+        else:
+            futuro.set_result(compartido or resultado)
+        finally:
+            with self._lock:
+                self._en_vuelo.pop(clave, None)
+        with self._lock:
+            self.conteo[resultado[1]] += 1
+        return resultado
+
+    def estado(self) -> dict:
+        with self._lock:
+            conteo = dict(self.conteo)
+        return {"usadas_hoy": self.dia.usadas(), "limite_dia": self.dia.limite,
+                "tokens_minuto": round(self.minuto.tokens, 2), **conteo}
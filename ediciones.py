@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+"""
+Ediciones del operador sobre el historial.
+
+El editor trabaja por páginas y cada cambio se captura como un parche
+compacto (fila, columna, anterior, nuevo) que se registra en la bitácora de
+correcciones, sin reconstruir ni comparar el DataFrame completo.
+"""
+
+import pandas as pd
+
+COLUMNAS_EDITABLES = ['Marca temporal', 'Temperatura Celsius', 'Presión']
+
+
+def _convertir_valor(columna, valor):
+    if valor is None:
+        return None
+    if columna == 'Marca temporal':
+        return pd.to_datetime(valor)
+    return float(valor)
+
+
+def construir_parches(edited_rows: dict, filas_pagina, df) -> list:
+    """
+    Traduce el estado 'edited_rows' del data_editor (posiciones dentro de la
+    página) a parches con la clave estable de fila ('Fila') del historial.
+    """
+    parches = []
+    for posicion, cambios in edited_rows.items():
+        fila = filas_pagina[int(posicion)]
+        for columna, nuevo in cambios.items():
+            if columna not in COLUMNAS_EDITABLES:
+                continue
+            nuevo = _convertir_valor(columna, nuevo)
+            anterior = df.at[fila, columna]
+            if (pd.isna(nuevo) and pd.isna(anterior)) or nuevo == anterior:
+                continue
+            parches.append({"fila": fila, "columna": columna, "anterior": anterior, "nuevo": nuevo})
+    return parches
+
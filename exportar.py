@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+"""
+Exportación del historial para el botón de descarga.
+
+Los archivos se generan solo cuando el usuario pide la descarga, se escriben
+por bloques de filas (sin materializar el CSV completo como texto) y se
+guardan por versión de datos para que clics repetidos no vuelvan a serializar.
+Con el esquema compacto, las columnas derivables se reconstruyen por bloque.
+
+Los bloques se escriben directamente en un SpooledTemporaryFile (los archivos
+chicos quedan en memoria, los grandes en disco), y la descarga se sirve con
+una sola lectura de ese archivo. La cache se limita por bytes totales
+(EA_EXPORTES_MAX_MB) y cierra los archivos que desaloja; dos clics
+simultáneos sobre la misma versión y formato comparten una sola generación.
+"""
+
+import gzip
+import importlib.util
+import io
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+import termodinamica
+
+FILAS_POR_BLOQUE = 50_000
+MAX_EXPORTES_CACHE = 4
+MAX_BYTES_EXPORTES = int(float(os.environ.get("EA_EXPORTES_MAX_MB", "256")) * 2**20)
+EN_MEMORIA_MAX_BYTES = 8 * 2**20 # Por encima, el archivo guardado pasa a disco
+
+FORMATOS = {
+    "CSV": {"extension": "csv", "mime": "text/csv"},
+    "CSV comprimido (gzip)": {"extension": "csv.gz", "mime": "application/gzip"},
+    "Parquet": {"extension": "parquet", "mime": "application/vnd.apache.parquet"},
+}
+
+_cache = OrderedDict() # (versión, formato) -> _Exportado
+_cache_lock = threading.Lock()
+_en_vuelo = {}
+
+
+def parquet_disponible() -> bool:
+    # Sin importar pyarrow.parquet: la lista de formatos se pinta en el primer render
+    try:
+        return importlib.util.find_spec("pyarrow.parquet") is not None
+    except ImportError:
+        return False
+
+
+def formatos_disponibles():
+    return [f for f in FORMATOS if f != "Parquet" or parquet_disponible()]
+
+
+def _bloques(df, filas_por_bloque):
+    volumen = 'Volume in Cubic Meters ( M3 )'
+    for inicio in range(0, max(len(df), 1), filas_por_bloque):
+        anterior = None
+        if inicio > 0 and volumen in df.columns:
+            anterior = float(df[volumen].iloc[inicio - 1])
+        yield inicio, termodinamica.materializar(df.iloc[inicio:inicio + filas_por_bloque], anterior)
+
+
+def _escribir_csv(df, destino, filas_por_bloque):
+    texto = io.TextIOWrapper(destino, encoding="utf-8", newline="")
+    for inicio, bloque in _bloques(df, filas_por_bloque):
+        bloque.to_csv(texto, index=False, header=(inicio == 0))
+    texto.flush()
+    texto.detach()
+
+
+def exportar_csv(df, destino, comprimir: bool = False, filas_por_bloque: int = FILAS_POR_BLOQUE):
+    if comprimir:
+        with gzip.GzipFile(fileobj=destino, mode="wb", compresslevel=6) as gz:
+            _escribir_csv(df, gz, filas_por_bloque)
+    else:
+        _escribir_csv(df, destino, filas_por_bloque)
+
+
+def exportar_parquet(df, destino, filas_por_bloque: int = FILAS_POR_BLOQUE):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = None
+    writer = None
+    for _, bloque in _bloques(df, filas_por_bloque):
+        if writer is None:
+            schema = pa.Table.from_pandas(bloque, preserve_index=False).schema
+            writer = pq.ParquetWriter(destino, schema, compression="zstd")
+        writer.write_table(pa.Table.from_pandas(bloque, schema=schema, preserve_index=False))
+    writer.close()
+
+
+def generar_exportacion(df, formato: str, destino):
+    """Escribe el archivo por bloques directamente en destino (un archivo binario)."""
+    if formato == "Parquet":
+        exportar_parquet(df, destino)
+    else:
+        exportar_csv(df, destino, comprimir=(formato == "CSV comprimido (gzip)"))
+
+
+class _Exportado:
+    """Archivo generado; al salir de la cache se cierra en cuanto nadie lo está leyendo."""
+
+    def __init__(self, df, formato: str):
+        self.archivo = tempfile.SpooledTemporaryFile(max_size=EN_MEMORIA_MAX_BYTES)
+        self._lock = threading.Lock()
+        try:
+            generar_exportacion(df, formato, self.archivo)
+        except Exception:
+            self.archivo.close()
+            raise
+        self.tamano = self.archivo.tell()
+
+    def leer(self):
+        """Contenido del archivo, o None si ya se cerró."""
+        with self._lock:
+            if self.archivo.closed:
+                return None
+            self.archivo.seek(0)
+            return self.archivo.read()
+
+    def cerrar(self):
+        with self._lock:
+            self.archivo.close()
+
+
+def _bytes_en_cache() -> int:
+    return sum(e.tamano for e in _cache.values())
+
+
+def exportar_cacheado(df, version, formato: str) -> bytes:
+    """Genera (o reutiliza) el archivo para esta versión de datos y formato."""
+    clave = (version, formato)
+    while True:
+        with _cache_lock:
+            exportado = _cache.get(clave)
+            if exportado is not None:
+                _cache.move_to_end(clave)
+            else:
+                futuro = _en_vuelo.get(clave)
+                lider = futuro is None
+                if lider:
+                    futuro = _en_vuelo[clave] = Future()
+        if exportado is None:
+            break
+        contenido = exportado.leer()
+        if contenido is not None:
+            return contenido
+        # Se cerró al salir de la cache entre la búsqueda y la lectura: se vuelve a buscar
+    if not lider:
+        return futuro.result()
+
+    try:
+        exportado = _Exportado(df, formato)
+        contenido = exportado.leer()
+    except Exception as e:
+        with _cache_lock:
+            _en_vuelo.pop(clave, None)
+        futuro.set_exception(e)
+        raise
+
+    desalojados = []
+    with _cache_lock:
+        if exportado.tamano <= MAX_BYTES_EXPORTES:
+            _cache[clave] = exportado
+            while len(_cache) > MAX_EXPORTES_CACHE or _bytes_en_cache() > MAX_BYTES_EXPORTES:
+                desalojados.append(_cache.popitem(last=False)[1])
+        else:
+            desalojados.append(exportado)
+        _en_vuelo.pop(clave, None)
+    for viejo in desalojados:
+        viejo.cerrar()
+    futuro.set_result(contenido)
+    return contenido
@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+"""
+Detección de posibles fugas por regresión en ventanas deslizantes.
+
+Para cada ventana de N lecturas se ajusta la pendiente del volumen corregido
+a condiciones estándar ('Volume in Cubic Meters ( M3 )', ya normalizado por
+temperatura vía Fv) contra el tiempo. Una ventana se marca si la temperatura
+se mantuvo estable (desviación estándar baja) y el volumen cae más rápido
+que el umbral con un ajuste lineal bueno (R^2), es decir, una caída sostenida
+y no ruido de lectura. Todas las pendientes salen de sumas acumuladas, en O(n).
+
+Las sumas acumuladas se calculan por bloques con el origen de tiempo local
+del bloque: con un solo prefijo sobre años de historial, sum(x^2) pierde la
+precisión que necesita la resta de dos prefijos.
+
+Los intervalos marcados se guardan en SQLite (EA_DATA_DIR/fugas.db).
+"""
+
+import os
+import sqlite3
+from contextlib import closing
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+DIRECTORIO_DATOS = os.environ.get("EA_DATA_DIR", "datos")
+VENTANA_LECTURAS = int(os.environ.get("EA_FUGAS_VENTANA", "12"))
+TEMP_ESTABLE_C = float(os.environ.get("EA_FUGAS_TEMP_ESTABLE_C", "0.5")) # desviación estándar máxima
+PENDIENTE_FUGA_M3_H = float(os.environ.get("EA_FUGAS_PENDIENTE_M3_H", "0.5")) # caída mínima
+R2_MINIMO = float(os.environ.get("EA_FUGAS_R2", "0.8")) # caída sostenida, no ruido
+FILAS_POR_BLOQUE = 65_536
+
+_NS_POR_H = 3_600 * 10**9
+
+
+def _acumulada(valores):
+    return np.concatenate(([0.0], np.cumsum(valores)))
+
+
+def pendientes_ventana(x_h, y, temp, ventana: int = VENTANA_LECTURAS, filas_por_bloque: int = FILAS_POR_BLOQUE):
+    """
+    Pendiente de y contra x_h (horas), R^2 del ajuste y desviación estándar de
+    temp para cada ventana de 'ventana' lecturas que termina en la fila i.
+    NaN si i < ventana - 1.
+    """
+    n = len(y)
+    pendiente = np.full(n, np.nan)
+    r2 = np.full(n, np.nan)
+    desv_temp = np.full(n, np.nan)
+    w = ventana
+    for inicio in range(w - 1, n, filas_por_bloque):
+        fin = min(n, inicio + filas_por_bloque)
+        a = inicio - w + 1
+        # Origen local del bloque (tiempo, volumen y temperatura) para conservar precisión
+        xs, ys, ts = x_h[a:fin] - x_h[a], y[a:fin] - y[a], temp[a:fin] - temp[a]
+        sx, sy, sxx, sxy = _acumulada(xs), _acumulada(ys), _acumulada(xs * xs), _acumulada(xs * ys)
+        syy = _acumulada(ys * ys)
+        st, stt = _acumulada(ts), _acumulada(ts * ts)
+
+        hi = np.arange(w, fin - a + 1)
+        lo = hi - w
+        vx, vy = sx[hi] - sx[lo], sy[hi] - sy[lo]
+        vxx, vxy = sxx[hi] - sxx[lo], sxy[hi] - sxy[lo]
+        vyy = syy[hi] - syy[lo]
+        den = w * vxx - vx * vx
+        cov = w * vxy - vx * vy
+        var_y = w * vyy - vy * vy
+        with np.errstate(invalid='ignore', divide='ignore'):
+            pendiente[inicio:fin] = np.where(den > 1e-12, cov / den, np.nan)
+            r2[inicio:fin] = np.where((den > 1e-12) & (var_y > 1e-12), cov * cov / (den * var_y), np.nan)
+        media_t = (st[hi] - st[lo]) / w
+        desv_temp[inicio:fin] = np.sqrt(np.maximum((stt[hi] - stt[lo]) / w - media_t * media_t, 0.0))
+    return pendiente, r2, desv_temp
+
+
+def detectar(historial, ventana: int = VENTANA_LECTURAS, temp_estable: float = TEMP_ESTABLE_C,
+             pendiente_min: float = PENDIENTE_FUGA_M3_H, r2_min: float = R2_MINIMO) -> pd.DataFrame:
+    """Intervalos (unión de ventanas marcadas) con su pendiente más pronunciada y la pérdida de volumen."""
+    columnas = ['Inicio', 'Fin', 'Lecturas', 'Pendiente M3/h', 'Pérdida M3', 'Temp media C']
+    n = len(historial)
+    if n < ventana:
+        return pd.DataFrame(columns=columnas)
+
+    tiempos = historial['Marca temporal'].to_numpy('datetime64[ns]').astype(np.int64)
+    x_h = (tiempos - tiempos[0]) / _NS_POR_H
+    y = historial['Volume in Cubic Meters ( M3 )'].to_numpy(np.float64)
+    temp = historial['Temperatura Celsius'].to_numpy(np.float64)
+
+    pendiente, r2, desv_temp = pendientes_ventana(x_h, y, temp, ventana)
+    with np.errstate(invalid='ignore'):
+        marcada = (desv_temp <= temp_estable) & (pendiente <= -pendiente_min) & (r2 >= r2_min)
+    if not marcada.any():
+        return pd.DataFrame(columns=columnas)
+
+    # Cobertura de filas por ventanas marcadas (arreglo de diferencias) y sus tramos contiguos
+    fin_ventana = np.flatnonzero(marcada)
+    cobertura = np.zeros(n + 1, dtype=np.int64)
+    np.add.at(cobertura, fin_ventana - ventana + 1, 1)
+    np.add.at(cobertura, fin_ventana + 1, -1)
+    cubierta = np.cumsum(cobertura[:-1]) > 0
+    bordes = np.diff(np.concatenate(([0], cubierta.astype(np.int8), [0])))
+    inicios, fines = np.flatnonzero(bordes == 1), np.flatnonzero(bordes == -1) - 1
+
+    marcas = historial['Marca temporal'].to_numpy()
+    filas = []
+    for i0, i1 in zip(inicios, fines):
+        pendientes = pendiente[i0:i1 + 1][marcada[i0:i1 + 1]]
+        filas.append([
+            pd.Timestamp(marcas[i0]), pd.Timestamp(marcas[i1]), int(i1 - i0 + 1),
+            round(float(pendientes.min()), 4), round(float(y[i0] - y[i1]), 4), round(float(temp[i0:i1 + 1].mean()), 2),
+        ])
+    return pd.DataFrame(filas, columns=columnas)
+
+
+class RegistroFugas:
+    """Intervalos marcados, persistidos entre reinicios; conserva la fecha de primera detección."""
+
+    def __init__(self, ruta: str = None):
+        if ruta is None:
+            os.makedirs(DIRECTORIO_DATOS, exist_ok=True)
+            ruta = os.path.join(DIRECTORIO_DATOS, "fugas.db")
+        self.ruta = ruta
+        with closing(self._conectar()) as con:
+            con.execute("""
+                CREATE TABLE IF NOT EXISTS intervalos (
+                    inicio TEXT NOT NULL,
+                    fin TEXT NOT NULL,
+                    lecturas INTEGER NOT NULL,
+                    pendiente_m3_h REAL NOT NULL,
+                    perdida_m3 REAL NOT NULL,
+                    temp_media_c REAL,
+                    detectado TEXT NOT NULL,
+                    PRIMARY KEY (inicio, fin)
+                )
+            """)
+
+    def _conectar(self):
+        return sqlite3.connect(self.ruta, timeout=10, isolation_level=None)
+
+    def guardar(self, intervalos: pd.DataFrame):
+        """
+        Reemplaza los intervalos por los de la última detección sobre el historial completo.
+        Un intervalo que se traslapa con otros ya guardados (p. ej. una fuga en curso, cuyo fin
+        avanza con cada lectura) conserva la detección más antigua de ellos.
+        """
+        ahora = datetime.now().isoformat(timespec="seconds")
+        with closing(self._conectar()) as con:
+            con.execute("BEGIN IMMEDIATE")
+            try:
+                # Los intervalos de una detección no se traslapan: ordenados por inicio, también lo están por fin
+                previos = [(pd.Timestamp(i), pd.Timestamp(f), d) for i, f, d in
+                           con.execute("SELECT inicio, fin, detectado FROM intervalos ORDER BY inicio")]
+                con.execute("DELETE FROM intervalos")
+                registros = []
+                j = 0
+                for fila in intervalos.sort_values('Inicio').itertuples(index=False):
+                    inicio, fin = fila[0], fila[1]
+                    while j < len(previos) and previos[j][1] < inicio:
+                        j += 1
+                    traslapados = []
+                    for previo_inicio, _, detectado in previos[j:]:
+                        if previo_inicio > fin:
+                            break
+                        traslapados.append(detectado)
+                    registros.append((inicio.isoformat(), fin.isoformat(), fila[2], fila[3], fila[4], fila[5],
+                                      min(traslapados, default=ahora)))
+                con.executemany("INSERT INTO intervalos VALUES (?, ?, ?, ?, ?, ?, ?)", registros)
+                con.execute("COMMIT")
+            except Exception:
+                con.execute("ROLLBACK")
+                raise
+
+    def consultar(self, desde=None) -> pd.DataFrame:
+        """Intervalos que terminan en o después de 'desde' (todos si None), más recientes primero."""
+        desde = pd.Timestamp(desde).isoformat() if desde is not None else ""
+        with closing(self._conectar()) as con:
+            df = pd.read_sql_query(
+                "SELECT inicio, fin, lecturas, pendiente_m3_h, perdida_m3, temp_media_c, detectado "
+                "FROM intervalos WHERE fin >= ? ORDER BY inicio DESC", con, params=(desde,)
+            )
+        for col in ('inicio', 'fin'):
+            df[col] = pd.to_datetime(df[col])
+        return df
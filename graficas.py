@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+"""
+Especificaciones Vega-Lite cacheadas para las gráficas del dashboard.
+
+Cada spec es un nodo del grafo de artefactos (artefactos.py), así que se
+construye una sola vez por versión de sus datos: se valida con Altair una
+vez y sus datos viajan como dataset con nombre ya serializado en Arrow, por
+lo que un rerun sin cambios (p. ej. un mensaje de chat) no vuelve a hacer
+melt, to_dict ni serializar.
+La gráfica multivariable usa el transform `fold` de Vega en lugar de un
+melt en el servidor, por lo que se envían 3 columnas en vez de 3x filas.
+"""
+
+import altair as alt
+
+COLUMNAS_TENDENCIA = [
+    'Marca temporal', 'Temperatura Celsius', 'Presión', 'Temperatura Fahrenheit',
+    'Volume in Cubic Meters ( M3 )', 'Consumo Absoluto M3',
+]
+VARIABLES_MULTI = ['Presión', 'Volume in Cubic Meters ( M3 )', 'Temperatura Fahrenheit']
+
+
+def _datos(nombre: str):
+    return alt.Chart(alt.NamedData(name=nombre))
+
+
+def _arrow(df) -> bytes:
+    """Stream IPC de Arrow, el formato que st.vega_lite_chart envía tal cual para un dataset en bytes."""
+    import pyarrow as pa
+
+    tabla = pa.Table.from_pandas(df.reset_index(drop=True))
+    destino = pa.BufferOutputStream()
+    with pa.ipc.new_stream(destino, tabla.schema) as escritor:
+        escritor.write_table(tabla)
+    return destino.getvalue().to_pybytes()
+
+
+def _tendencia():
+    return _datos('tendencia').mark_line(point=True).transform_calculate(
+        Alerta="datum['Consumo Absoluto M3'] > 5"
+    ).encode(
+        x=alt.X('Marca temporal:T', title='Tiempo'),
+        y=alt.Y('Volume in Cubic Meters ( M3 ):Q', title='Volumen M3'),
+        color=alt.condition(
+            alt.datum.Alerta == True,
+            alt.value('#FF0000'), # Rojo para alertas
+            alt.value('#5271ff')  # Azul normal
+        ),
+        tooltip=[
+            alt.Tooltip('Marca temporal:T', title='Hora Real', format='%Y-%m-%d %H:%M'),
+            alt.Tooltip('Temperatura Celsius:Q', title='Temp C', format='.2f'),
+            alt.Tooltip('Presión:Q', title='Presión PSI', format='.2f'),
+            alt.Tooltip('Volume in Cubic Meters ( M3 ):Q', title='Volumen M3', format='.4f'),
+            alt.Tooltip('Consumo Absoluto M3:Q', title='Consumo Absoluto M3', format='.4f') # HOVER SOLICITADO
+        ]
+    ).interactive().properties(height=450)
+
+
+def _banda_pronostico():
+    base = _datos('pronostico').encode(x=alt.X('Marca temporal:T'))
+    banda = base.mark_area(opacity=0.2, color='#f39c12').encode(
+        y='Inferior:Q', y2='Superior:Q',
+        tooltip=[
+            alt.Tooltip('Marca temporal:T', title='Hora', format='%Y-%m-%d %H:%M'),
+            alt.Tooltip('Pronóstico:Q', format='.2f'),
+            alt.Tooltip('Inferior:Q', format='.2f'),
+            alt.Tooltip('Superior:Q', format='.2f'),
+        ]
+    )
+    linea = base.mark_line(strokeDash=[6, 4], color='#f39c12').encode(y='Pronóstico:Q')
+    return banda + linea
+
+
+def _multivariable():
+    # Diccionario de colores solicitado
+    color_scale = alt.Scale(
+        domain=VARIABLES_MULTI,
+        range=['#FF0000', '#0000FF', '#FFD700'] # Rojo, Azul, Dorado/Amarillo
+    )
+    return _datos('tendencia').transform_fold(
+        VARIABLES_MULTI, as_=['Variable', 'Valor']
+    ).mark_line(point=True).encode(
+        x=alt.X('Marca temporal:T', title='Tiempo'),
+        y=alt.Y('Valor:Q', title='Escala Unificada', scale=alt.Scale(zero=False)),
+        color=alt.Color('Variable:N', scale=color_scale, title="Leyenda"),
+        tooltip=['Marca temporal:T', 'Variable:N', 'Valor:Q']
+    ).interactive().properties(height=450)
+
+
+def _boxplot():
+    return _datos('consumo').mark_boxplot(extent='min-max', color='#e74c3c').encode(
+        x=alt.X('Consumo Absoluto M3:Q', title="Consumo (M3)"),
+        tooltip=['Consumo Absoluto M3:Q']
+    ).properties(height=300, title="Dispersión Estadística de Consumo")
+
+
+def _histograma():
+    return _datos('presion').mark_bar(color='#5271ff').encode(
+        alt.X("Vessel Pressure:Q", bin=alt.Bin(maxbins=30), title="Presión Absoluta (PSIA)"),
+        y=alt.Y('count()', title="Frecuencia (Horas/Lecturas)")
+    ).properties(height=350, title="Histograma de Distribución de Presión")
+
+
+# tipo -> (constructor, nombre del dataset, columnas enviadas)
+GRAFICAS = {
+    'tendencia': (_tendencia, 'tendencia', COLUMNAS_TENDENCIA),
+    'multivariable': (_multivariable, 'tendencia', ['Marca temporal'] + VARIABLES_MULTI),
+    'boxplot': (_boxplot, 'consumo', ['Consumo Absoluto M3']),
+    'histograma': (_histograma, 'presion', ['Vessel Pressure']),
+}
+
+
+def construir_spec(tipo: str, df) -> dict:
+    constructor, nombre, columnas = GRAFICAS[tipo]
+    spec = constructor().to_dict()
+    spec['datasets'] = {nombre: _arrow(df[columnas])}
+    return spec
+
+
+def _intervalos_fuga():
+    return _datos('fugas').mark_rect(opacity=0.15, color='#e74c3c').encode(
+        x='Inicio:T', x2='Fin:T',
+        tooltip=[
+            alt.Tooltip('Inicio:T', format='%Y-%m-%d %H:%M'),
+            alt.Tooltip('Fin:T', format='%Y-%m-%d %H:%M'),
+            alt.Tooltip('Pendiente M3/h:Q', format='.3f'),
+            alt.Tooltip('Pérdida M3:Q', format='.2f'),
+        ]
+    )
+
+
+def construir_spec_tendencia(df, banda=None, fugas=None) -> dict:
+    """Tendencia de volumen con la banda de pronóstico y los intervalos de posible fuga (si los hay)."""
+    _, nombre, columnas = GRAFICAS['tendencia']
+    capas, datasets = [_tendencia()], {nombre: _arrow(df[columnas])}
+    if fugas is not None and not fugas.empty and not df.empty:
+        # Solo los intervalos dentro de la vista, para no estirar el eje de tiempo
+        visibles = fugas[(fugas['Fin'] >= df['Marca temporal'].min()) & (fugas['Inicio'] <= df['Marca temporal'].max())]
+        if not visibles.empty:
+            capas.insert(0, _intervalos_fuga())
+            datasets['fugas'] = _arrow(visibles)
+    if banda is not None and not banda.empty:
+        capas.append(_banda_pronostico())
+        datasets['pronostico'] = _arrow(banda)
+    if len(capas) == 1:
+        return construir_spec('tendencia', df)
+    spec = alt.layer(*capas).to_dict()
+    spec['datasets'] = datasets
+    return spec
+
+
+def para_envio(spec: dict) -> dict:
+    """Copia superficial para st.vega_lite_chart, que retira 'datasets' del spec al enviarlo."""
+    copia = dict(spec)
+    copia['datasets'] = dict(spec['datasets'])
+    return copia
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""
+Historial persistente del chat del agente, por usuario (EA_DATA_DIR/chat.db).
+
+Cada mensaje es una fila append-only (usuario, rol, contenido, hora). La
+página no guarda la conversación en la sesión: en cada rerun lee solo la
+ventana visible (los últimos EA_CHAT_PAGINA mensajes por página cargada) con
+el índice (usuario, seq), así que el costo del rerun no depende del largo de
+la conversación. Al modelo solo se envían los últimos EA_CHAT_CONTEXTO
+mensajes como historia.
+
+La ventana en memoria se recorta a EA_CHAT_MAX_MENSAJES mensajes y
+EA_CHAT_MAX_KB kilobytes por más páginas que se carguen. En disco se
+conservan a lo más EA_CHAT_MAX_FILAS mensajes por usuario y nada más viejo
+que EA_CHAT_RETENCION_DIAS.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from datetime import datetime, timedelta
+
+DIRECTORIO_DATOS = os.environ.get("EA_DATA_DIR", "datos")
+MENSAJES_POR_PAGINA = int(os.environ.get("EA_CHAT_PAGINA", "20"))
+MENSAJES_CONTEXTO = int(os.environ.get("EA_CHAT_CONTEXTO", "6"))
+MAX_MENSAJES_CHAT = int(os.environ.get("EA_CHAT_MAX_MENSAJES", "100"))
+MAX_CHAT_BYTES = int(float(os.environ.get("EA_CHAT_MAX_KB", "256")) * 1024)
+MAX_FILAS_USUARIO = int(os.environ.get("EA_CHAT_MAX_FILAS", "2000"))
+RETENCION_DIAS = float(os.environ.get("EA_CHAT_RETENCION_DIAS", "90"))
+PODA_POR_EDAD_S = 3600 # La poda por edad recorre toda la tabla: a lo más una vez por hora
+
+
+def recortar_chat(mensajes: list, max_mensajes: int = MAX_MENSAJES_CHAT, max_bytes: int = MAX_CHAT_BYTES) -> int:
+    """Descarta en sitio los mensajes más antiguos que excedan los límites; devuelve cuántos."""
+    tamanos = [len(m["content"].encode("utf-8")) for m in mensajes]
+    total, inicio = sum(tamanos), 0
+    # Siempre se conserva el último mensaje, aunque solo exceda el límite de bytes
+    while inicio < len(mensajes) - 1 and (len(mensajes) - inicio > max_mensajes or total > max_bytes):
+        total -= tamanos[inicio]
+        inicio += 1
+    del mensajes[:inicio]
+    return inicio
+
+
+class HistorialChat:
+    def __init__(self, ruta: str = None, max_filas: int = MAX_FILAS_USUARIO, retencion_dias: float = RETENCION_DIAS):
+        if ruta is None:
+            os.makedirs(DIRECTORIO_DATOS, exist_ok=True)
+            ruta = os.path.join(DIRECTORIO_DATOS, "chat.db")
+        self.ruta = ruta
+        self.max_filas = max_filas
+        self.retencion_dias = retencion_dias
+        self._ultima_poda = None
+        self._lock = threading.Lock()
+        with closing(self._conectar()) as con:
+            con.executescript("""
+                CREATE TABLE IF NOT EXISTS mensajes (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    usuario TEXT NOT NULL,
+                    rol TEXT NOT NULL,
+                    contenido TEXT NOT NULL,
+                    creado TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS mensajes_usuario ON mensajes (usuario, seq);
+                CREATE INDEX IF NOT EXISTS mensajes_creado ON mensajes (creado);
+            """)
+
+    def _conectar(self):
+        return sqlite3.connect(self.ruta, timeout=10, isolation_level=None)
+
+    def agregar(self, usuario: str, rol: str, contenido: str) -> int:
+        with closing(self._conectar()) as con:
+            cursor = con.execute(
+                "INSERT INTO mensajes (usuario, rol, contenido, creado) VALUES (?, ?, ?, ?)",
+                (usuario, rol, contenido, datetime.now().isoformat(timespec="seconds"))
+            )
+            # Tope por usuario: se borra lo que quede detrás de las últimas max_filas (por el índice)
+            con.execute(
+                """DELETE FROM mensajes WHERE usuario = ? AND seq <= (
+                       SELECT seq FROM mensajes WHERE usuario = ? ORDER BY seq DESC LIMIT 1 OFFSET ?)""",
+                (usuario, usuario, self.max_filas)
+            )
+            self._podar_por_edad(con)
+            return cursor.lastrowid
+
+    def _podar_por_edad(self, con):
+        ahora = time.monotonic()
+        with self._lock:
+            if self._ultima_poda is not None and ahora - self._ultima_poda < PODA_POR_EDAD_S:
+                return
+            self._ultima_poda = ahora
+        limite = (datetime.now() - timedelta(days=self.retencion_dias)).isoformat(timespec="seconds")
+        con.execute("DELETE FROM mensajes WHERE creado < ?", (limite,))
+
+    def ultimos(self, usuario: str, limite: int = MENSAJES_POR_PAGINA):
+        """([{'role', 'content', 'creado'}] en orden cronológico, hay mensajes anteriores)."""
+        with closing(self._conectar()) as con:
+            filas = con.execute(
+                "SELECT rol, contenido, creado FROM mensajes WHERE usuario = ? ORDER BY seq DESC LIMIT ?",
+                (usuario, limite + 1)
+            ).fetchall()
+        mensajes = [{"role": rol, "content": contenido, "creado": creado} for rol, contenido, creado in filas[:limite]]
+        return mensajes[::-1], len(filas) > limite
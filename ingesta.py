@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+"""
+Descarga y parseo de la hoja del formulario.
+
+Perfil de parseo explícito en lugar de inferencia: solo columnas con
+encabezado, numéricos siempre float64 (una hoja con puros enteros no cambia
+el tipo) y formato fijo para 'Marca temporal', parseado dentro del lector de
+pyarrow cuando está instalado.
+El resultado se guarda por digest del contenido descargado, así que una
+descarga sin cambios nunca se parsea dos veces.
+"""
+
+import csv
+import hashlib
+import io
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+import termodinamica
+
+FORMATO_MARCA_TEMPORAL = '%d/%m/%Y %H:%M:%S' # Formato de Google Forms (es-MX)
+COLUMNAS_NUMERICAS = ['Temperatura Celsius', 'Presión']
+TIPO_NUMERICO = 'float64'
+MAX_PARSEOS_CACHE = 2
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def pyarrow_disponible() -> bool:
+    try:
+        import pyarrow.csv  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def digest(contenido: bytes) -> str:
+    return hashlib.blake2b(contenido, digest_size=16).hexdigest()
+
+
+def descargar(url: str, timeout: float = 30) -> bytes:
+    import requests
+
+    respuesta = requests.get(url, timeout=timeout)
+    respuesta.raise_for_status()
+    return respuesta.content
+
+
+def _encabezados(contenido: bytes) -> list:
+    """Encabezados con nombre; las columnas sin nombre (p. ej. una coma final) no se leen."""
+    primera_linea = contenido.split(b'\n', 1)[0].decode('utf-8-sig').rstrip('\r')
+    return [c for c in next(csv.reader([primera_linea]), []) if c.strip()]
+
+
+def parsear_marca_temporal(serie):
+    """Formato fijo; si la hoja cambia de formato se vuelve a la inferencia."""
+    fechas = pd.to_datetime(serie, format=FORMATO_MARCA_TEMPORAL, errors='coerce')
+    if fechas.isna().sum() > serie.isna().sum():
+        return pd.to_datetime(serie)
+    return fechas
+
+
+def _parsear_pyarrow(contenido: bytes, columnas: list) -> pd.DataFrame:
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+
+    opciones = pacsv.ConvertOptions(
+        include_columns=columnas,
+        column_types={'Marca temporal': pa.timestamp('us'),
+                      **{col: pa.float64() for col in COLUMNAS_NUMERICAS if col in columnas}},
+        timestamp_parsers=[FORMATO_MARCA_TEMPORAL],
+    )
+    return pacsv.read_csv(io.BytesIO(contenido), convert_options=opciones).to_pandas()
+
+
+def parsear_csv(contenido: bytes) -> pd.DataFrame:
+    columnas = [c for c in _encabezados(contenido) if termodinamica.usar_columna(c)]
+    df = None
+    if pyarrow_disponible():
+        try:
+            df = _parsear_pyarrow(contenido, columnas)
+        except Exception:
+            df = None # Formato inesperado: se usa el parser de pandas
+    if df is None:
+        tipos = {col: TIPO_NUMERICO for col in COLUMNAS_NUMERICAS if col in columnas}
+        try:
+            df = pd.read_csv(io.BytesIO(contenido), usecols=columnas, dtype=tipos)
+        except ValueError:
+            df = pd.read_csv(io.BytesIO(contenido), usecols=columnas) # Celda no numérica: se convierte abajo
+
+    # Una celda no numérica deja la columna como texto: se convierte una sola vez aquí
+    for col in COLUMNAS_NUMERICAS:
+        if col in df.columns and df[col].dtype != TIPO_NUMERICO:
+            df[col] = pd.to_numeric(df[col], errors='coerce').astype(TIPO_NUMERICO)
+    if not pd.api.types.is_datetime64_any_dtype(df['Marca temporal']):
+        df['Marca temporal'] = parsear_marca_temporal(df['Marca temporal'])
+    return df
+
+
+def parsear_cacheado(contenido: bytes, clave: str = None) -> pd.DataFrame:
+    """Parsea (o reutiliza) el CSV por digest; el digest queda en df.attrs['digest']."""
+    clave = clave or digest(contenido)
+    with _cache_lock:
+        df = _cache.get(clave)
+        if df is not None:
+            _cache.move_to_end(clave)
+            return df
+
+    df = parsear_csv(contenido)
+    df.attrs['digest'] = clave
+    with _cache_lock:
+        _cache[clave] = df
+        while len(_cache) > MAX_PARSEOS_CACHE:
+            _cache.popitem(last=False)
+    return df
@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+"""
+Modo de perfilado bajo demanda.
+
+Se activa con EA_PERFIL=1 (todos los reruns) o con el parámetro de URL
+?perfil=1 (solo el siguiente rerun o turno del agente). Cada captura deja en
+EA_PERFILES_DIR (por defecto datos/perfiles):
+
+    <id>.pstats     perfil determinista de cProfile
+    <id>.collapsed  pilas muestreadas en formato "a;b;c N" (flamegraph.pl, speedscope)
+    <id>.json       metadatos: etiqueta, versión de datos, vista, duración
+
+Para comparar dos capturas:
+
+    python perfilador.py comparar datos/perfiles/A.pstats datos/perfiles/B.pstats
+"""
+
+import cProfile
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+
+DIRECTORIO_PERFILES = os.environ.get("EA_PERFILES_DIR", os.path.join("datos", "perfiles"))
+PERFIL_SIEMPRE = os.environ.get("EA_PERFIL", "0") == "1"
+INTERVALO_MUESTREO_S = 0.005
+
+_activo = threading.local()
+
+
+class _Muestreador(threading.Thread):
+    """
+    Muestrea la pila de un hilo a intervalos fijos (pilas colapsadas). Si el
+    hilo termina sin cerrar la captura (st.stop o una excepción; Streamlit
+    suele usar un hilo nuevo por rerun) se detiene solo y llama a al_abandonar.
+    """
+
+    def __init__(self, hilo_objetivo: threading.Thread, intervalo: float = INTERVALO_MUESTREO_S, al_abandonar=None):
+        super().__init__(daemon=True, name="ea-muestreador")
+        self.hilo_objetivo = hilo_objetivo
+        self.intervalo = intervalo
+        self.al_abandonar = al_abandonar
+        self.pilas = Counter()
+        self._detener = threading.Event()
+
+    def run(self):
+        while not self._detener.wait(self.intervalo):
+            if not self.hilo_objetivo.is_alive():
+                if self.al_abandonar is not None:
+                    self.al_abandonar()
+                return
+            frame = sys._current_frames().get(self.hilo_objetivo.ident)
+            pila = []
+            while frame is not None:
+                codigo = frame.f_code
+                pila.append(f"{os.path.basename(codigo.co_filename)}:{codigo.co_name}")
+                frame = frame.f_back
+            if pila:
+                self.pilas[";".join(reversed(pila))] += 1
+
+    def detener(self):
+        self._detener.set()
+        self.join()
+
+
+class Captura:
+    def __init__(self, etiqueta: str):
+        self.etiqueta = etiqueta
+        self.id = f"{datetime.now():%Y%m%d_%H%M%S_%f}_{etiqueta}"
+        self.perfil = cProfile.Profile()
+        self.muestreador = _Muestreador(threading.current_thread(), al_abandonar=self.perfil.disable)
+        self.inicio = None
+
+    def iniciar(self):
+        self.inicio = time.perf_counter()
+        self.muestreador.start()
+        self.perfil.enable()
+
+    def finalizar(self, metadatos: dict = None) -> str:
+        self.perfil.disable()
+        self.muestreador.detener()
+        duracion_ms = (time.perf_counter() - self.inicio) * 1000
+
+        os.makedirs(DIRECTORIO_PERFILES, exist_ok=True)
+        base = os.path.join(DIRECTORIO_PERFILES, self.id)
+        self.perfil.dump_stats(base + ".pstats")
+        with open(base + ".collapsed", "w", encoding="utf-8") as f:
+            for pila, n in self.muestreador.pilas.most_common():
+                f.write(f"{pila} {n}\n")
+        with open(base + ".json", "w", encoding="utf-8") as f:
+            json.dump({
+                "etiqueta": self.etiqueta,
+                "creado": datetime.now().isoformat(timespec="seconds"),
+                "duracion_ms": round(duracion_ms, 1),
+                "muestras": sum(self.muestreador.pilas.values()),
+                **(metadatos or {}),
+            }, f, ensure_ascii=False, indent=2, default=str)
+        return base + ".pstats"
+
+
+def solicitado(query_params=None) -> bool:
+    """True si el perfilado está activo por entorno o por ?perfil=1."""
+    if PERFIL_SIEMPRE:
+        return True
+    return query_params is not None and query_params.get("perfil") == "1"
+
+
+def iniciar(etiqueta: str):
+    """Inicia una captura en el hilo actual; None si ya hay otra activa."""
+    if getattr(_activo, "captura", None) is not None:
+        return None
+    captura = Captura(etiqueta)
+    try:
+        captura.iniciar()
+    except ValueError:
+        # Otro perfilador ya está activo en el proceso (p. ej. otra sesión)
+        captura.muestreador.detener()
+        return None
+    _activo.captura = captura
+    return captura
+
+
+def finalizar(metadatos: dict = None):
+    """Cierra la captura activa del hilo y devuelve la ruta del .pstats (o None)."""
+    captura = getattr(_activo, "captura", None)
+    if captura is None:
+        return None
+    _activo.captura = None
+    return captura.finalizar(metadatos)
+
+
+def descartar():
+    """Descarta una captura que quedó abierta (p. ej. un rerun interrumpido con st.stop)."""
+    captura = getattr(_activo, "captura", None)
+    if captura is not None:
+        captura.perfil.disable()
+        captura.muestreador.detener()
+        _activo.captura = None
+
+
+@contextmanager
+def perfil(etiqueta: str, activo: bool = True, metadatos: dict = None):
+    """Perfila el bloque si activo y no hay otra captura en curso en el hilo."""
+    captura = iniciar(etiqueta) if activo else None
+    try:
+        yield captura
+    finally:
+        if captura is not None:
+            finalizar(metadatos)
+
+
+def comparar(ruta_a: str, ruta_b: str, top: int = 20) -> list:
+    """Diferencia de tiempo acumulado por función entre dos capturas .pstats."""
+    def _acumulado(ruta):
+        stats = pstats.Stats(ruta).stats
+        return {
+            f"{os.path.basename(archivo)}:{linea}({funcion})": datos[3]
+            for (archivo, linea, funcion), datos in stats.items()
+        }
+
+    a, b = _acumulado(ruta_a), _acumulado(ruta_b)
+    filas = [
+        {"funcion": f, "a_s": round(a.get(f, 0.0), 4), "b_s": round(b.get(f, 0.0), 4),
+         "delta_s": round(b.get(f, 0.0) - a.get(f, 0.0), 4)}
+        for f in set(a) | set(b)
+    ]
+    filas.sort(key=lambda fila: abs(fila["delta_s"]), reverse=True)
+    return filas[:top]
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 4 and sys.argv[1] == "comparar":
+        for fila in comparar(sys.argv[2], sys.argv[3]):
+            print(f"{fila['delta_s']:+10.4f}s  {fila['a_s']:10.4f}s -> {fila['b_s']:10.4f}s  {fila['funcion']}")
+    else:
+        print(__doc__)
@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+"""
+Pronóstico en línea de volumen y consumo.
+
+Regresión lineal con ponderación exponencial en el tiempo sobre 'Volume in
+Cubic Meters ( M3 )': el estado son unas cuantas sumas ponderadas que decaen
+con exp(-dt/tau), así que cada lectura nueva cuesta O(1) y nunca se reajusta
+sobre todo el historial. El consumo esperado sale de la tasa ponderada de
+'Consumo Absoluto M3' por hora.
+
+El modelo del proceso se actualiza solo con las filas nuevas cuando el
+historial anterior es un prefijo exacto del nuevo; cualquier otro cambio
+(correcciones, ediciones de la hoja, lecturas tardías) lo reajusta de forma
+vectorizada.
+"""
+
+import copy
+import math
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+TAU_H = float(os.environ.get("EA_PRONOSTICO_TAU_H", "12"))
+VOLUMEN_MINIMO_M3 = float(os.environ.get("EA_VOLUMEN_MINIMO_M3", "30"))
+HORIZONTE_H = 24
+Z_BANDA = 1.96 # Banda del 95 %
+
+_NS_POR_H = 3_600 * 10**9
+
+
+def _ns(tiempos) -> np.ndarray:
+    return np.asarray(pd.to_datetime(tiempos).to_numpy('datetime64[ns]').astype(np.int64))
+
+
+class PronosticadorEW:
+    """Sumas ponderadas con el origen de tiempo en la última lectura (horas)."""
+
+    def __init__(self, tau_h: float = TAU_H):
+        self.tau_h = tau_h
+        self.n = 0
+        self.t_ult = None # ns de la última lectura
+        self.y_ult = None
+        self.s0 = self.s1 = self.s2 = 0.0 # sum w, sum w t, sum w t^2
+        self.sy = self.sty = self.syy = 0.0 # sum w y, sum w t y, sum w y^2
+        self.w2 = 0.0 # sum w^2 (para el tamaño efectivo de muestra)
+        self.consumo = 0.0 # sum w consumo
+        self.horas = 0.0 # sum w dt
+
+    def actualizar(self, t_ns: int, volumen: float, consumo: float = 0.0):
+        """Incorpora una lectura en O(1). Las lecturas deben llegar en orden de tiempo."""
+        if self.n == 0:
+            dt = 0.0
+        else:
+            dt = (t_ns - self.t_ult) / _NS_POR_H
+            if dt < 0:
+                raise ValueError("Lectura fuera de orden")
+            d = math.exp(-dt / self.tau_h)
+            # Mover el origen a la nueva lectura (t -> t - dt) y aplicar el decaimiento
+            self.s2 = d * (self.s2 - 2 * dt * self.s1 + dt * dt * self.s0)
+            self.sty = d * (self.sty - dt * self.sy)
+            self.s1 = d * (self.s1 - dt * self.s0)
+            self.s0 *= d
+            self.sy *= d
+            self.syy *= d
+            self.w2 *= d * d
+            self.consumo *= d
+            self.horas *= d
+        self.s0 += 1.0
+        self.sy += volumen
+        self.syy += volumen * volumen
+        self.w2 += 1.0
+        self.consumo += consumo
+        self.horas += dt
+        self.n += 1
+        self.t_ult, self.y_ult = t_ns, volumen
+
+    def ajustar(self, tiempos_ns: np.ndarray, volumen: np.ndarray, consumo: np.ndarray):
+        """Estado equivalente a actualizar() fila por fila, calculado vectorizado."""
+        self.__init__(self.tau_h)
+        if len(tiempos_ns) == 0:
+            return self
+        t = (tiempos_ns - tiempos_ns[-1]) / _NS_POR_H
+        w = np.exp(t / self.tau_h)
+        dt = np.diff(t, prepend=t[0])
+        self.s0, self.s1, self.s2 = w.sum(), (w * t).sum(), (w * t * t).sum()
+        self.sy, self.sty, self.syy = (w * volumen).sum(), (w * t * volumen).sum(), (w * volumen * volumen).sum()
+        self.w2 = (w * w).sum()
+        self.consumo, self.horas = (w * consumo).sum(), (w * dt).sum()
+        self.n = len(tiempos_ns)
+        self.t_ult, self.y_ult = int(tiempos_ns[-1]), float(volumen[-1])
+        return self
+
+    def coeficientes(self):
+        """(volumen ajustado ahora, pendiente M3/h, sigma residual)."""
+        if self.n == 0:
+            return float('nan'), 0.0, float('nan')
+        det = self.s0 * self.s2 - self.s1 * self.s1
+        b = (self.s0 * self.sty - self.s1 * self.sy) / det if det > 1e-12 else 0.0
+        a = (self.sy - b * self.s1) / self.s0
+        sse = (self.syy - 2 * a * self.sy - 2 * b * self.sty
+               + a * a * self.s0 + 2 * a * b * self.s1 + b * b * self.s2)
+        return a, b, math.sqrt(max(sse, 0.0) / self.s0)
+
+    def intervalo(self, horas) -> tuple:
+        """(pronóstico, inferior, superior) a 'horas' de la última lectura."""
+        a, b, sigma = self.coeficientes()
+        horas = np.asarray(horas, dtype=float)
+        n_ef = self.s0 * self.s0 / self.w2 if self.w2 else 1.0
+        t_media = self.s1 / self.s0 if self.s0 else 0.0
+        var_t = max(self.s2 / self.s0 - t_media * t_media, 1e-12) if self.s0 else 1e-12
+        error = sigma * np.sqrt(1 + 1 / n_ef + (horas - t_media) ** 2 / (var_t * n_ef))
+        centro = a + b * horas
+        return centro, centro - Z_BANDA * error, centro + Z_BANDA * error
+
+    def horas_hasta(self, umbral: float):
+        """Horas hasta cruzar 'umbral' según la tendencia; None si no va a la baja."""
+        a, b, _ = self.coeficientes()
+        if a <= umbral:
+            return 0.0
+        if b >= 0:
+            return None
+        return float((umbral - a) / b)
+
+    def consumo_por_hora(self) -> float:
+        return self.consumo / self.horas if self.horas > 0 else 0.0
+
+
+_modelo = {"firma": None, "pronosticador": None, "columnas": None}
+_lock = threading.Lock()
+
+
+def _columnas(historial):
+    return (_ns(historial['Marca temporal']),
+            historial['Volume in Cubic Meters ( M3 )'].to_numpy(np.float64),
+            historial['Consumo Absoluto M3'].to_numpy(np.float64))
+
+
+def _es_extension(anteriores, actuales) -> bool:
+    """True si actuales empieza con anteriores: solo se agregaron lecturas al final."""
+    k = len(anteriores[0])
+    return len(actuales[0]) >= k and all(
+        np.array_equal(previa, actual[:k], equal_nan=True) for previa, actual in zip(anteriores, actuales)
+    )
+
+
+def _modelo_actualizado(historial, firma):
+    """Actualiza el modelo del proceso solo con las filas nuevas (o reajusta si cambió el pasado)."""
+    columnas = _columnas(historial)
+    with _lock:
+        p = _modelo["pronosticador"]
+        incremental = (
+            p is not None and p.n > 0 and _modelo["firma"] == firma
+            and _es_extension(_modelo["columnas"], columnas)
+        )
+        if incremental:
+            for t, volumen, consumo in zip(*(columna[p.n:] for columna in columnas)):
+                p.actualizar(int(t), float(volumen), float(consumo))
+        else:
+            p = PronosticadorEW().ajustar(*columnas)
+            _modelo["firma"], _modelo["pronosticador"] = firma, p
+        _modelo["columnas"] = columnas
+        return p
+
+
+def pronosticar(historial, firma=None, umbral: float = VOLUMEN_MINIMO_M3, horizonte_h: int = HORIZONTE_H) -> dict:
+    """
+    Resumen del pronóstico sobre el historial ordenado por tiempo.
+    'firma' identifica el pasado del historial (p. ej. el estado de correcciones).
+    """
+    if historial.empty:
+        return {"lecturas": 0}
+    p = _modelo_actualizado(historial, firma)
+    a, b, sigma = p.coeficientes()
+    ultima = pd.Timestamp(p.t_ult)
+    horas = p.horas_hasta(umbral)
+    pasos = np.arange(horizonte_h + 1, dtype=float)
+    centro, inferior, superior = p.intervalo(pasos)
+    return {
+        "lecturas": p.n,
+        "ultima": ultima,
+        "volumen_ajustado_m3": float(a),
+        "pendiente_m3_h": float(b),
+        "sigma_m3": float(sigma),
+        "umbral_m3": umbral,
+        "horas_para_umbral": horas,
+        "fecha_umbral": None if horas is None else ultima + pd.Timedelta(hours=horas),
+        "consumo_24h_m3": float(p.consumo_por_hora() * 24),
+        "banda": pd.DataFrame({
+            'Marca temporal': ultima + pd.to_timedelta(pasos, unit='h'),
+            'Pronóstico': centro,
+            'Inferior': inferior,
+            'Superior': superior,
+        }),
+        "modelo": copy.copy(p), # Copia fija: el modelo del proceso sigue actualizándose
+    }
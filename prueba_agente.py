@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+"""
+Banco de pruebas offline y determinista del ciclo de herramientas del agente.
+
+Un Gemini simulado (el servidor de prueba_carga.py) responde con secuencias
+guionizadas de llamadas a función. El SDK ejecuta las herramientas reales
+dentro de appRecuperador.py (AppTest, sin navegador) y devuelve sus
+resultados al simulador. La latencia del modelo se inyecta (fija + jitter
+con semilla), así que no hace falta red ni clave de API.
+
+Por guion y tamaño de historial reporta la mediana de: latencia del turno
+(span gemini_chat), tiempo de modelo inyectado, tiempo de cada herramienta
+(spans 'herramienta:<nombre>'), construcción del prompt, resto del SDK
+(serialización y HTTP), tamaño de las peticiones al modelo y cuántas
+herramientas respondieron con un texto de error.
+
+    python prueba_agente.py --filas 1000 10000 100000 --latencia-ms 300 --repeticiones 3
+"""
+
+import argparse
+import json
+import os
+import random
+import re
+import threading
+import time
+
+import numpy as np
+
+import prueba_carga
+import telemetria
+
+# Cada turno debe llegar al modelo simulado: sin cache de respuestas ni límites de cuota
+os.environ.setdefault("EA_GEMINI_CACHE_S", "0")
+os.environ.setdefault("EA_GEMINI_RPM", "1000000")
+os.environ.setdefault("EA_GEMINI_RPD", "1000000000")
+
+# Guion -> llamadas a función en orden; después el modelo responde con texto
+GUIONES = {
+    "calculo": [("calculadora_expert_ea", {"temp_c": 25, "presion_psi": 100})],
+    "grafica": [("crear_grafica_agente", {"variable_y": "Presión"})],
+    "agrupacion": [("agrupar_datos_agente", {"columna_agrupar": "Comentarios",
+                                             "columna_valor": "Consumo Absoluto M3", "operacion": "sum"})],
+    "tendencias": [("analizar_tendencias_historicas", {"metrica": "Consumo Absoluto M3"})],
+    "diagnostico_alerta": [("obtener_diagnostico_avanzado", {}),
+                           ("enviar_alerta_whatsapp", {"mensaje": "Prueba: consumo mayor a 5 M3"})],
+}
+
+
+def _respuesta(parte: dict) -> dict:
+    return {"candidates": [{"content": {"role": "model", "parts": [parte]}, "finishReason": "STOP"}]}
+
+
+class GeminiGuionizado(prueba_carga.ServidorSimulado):
+    """Elige la siguiente llamada por la etiqueta [guion:<nombre>] y las respuestas de función ya recibidas."""
+
+    def __init__(self, filas: int, latencia_ms: float = 300, jitter_ms: float = 0, semilla: int = 0):
+        super().__init__(filas_iniciales=filas, filas_por_segundo=0, filas_max=filas)
+        self.latencia_ms = latencia_ms
+        self.jitter_ms = jitter_ms
+        self._rng = random.Random(semilla)
+        self._lock_peticiones = threading.Lock()
+        self.peticiones = []
+
+    def responder_gemini(self, cuerpo: bytes) -> dict:
+        peticion = json.loads(cuerpo)
+        contenidos = peticion.get("contents", [])
+        texto = " ".join(p.get("text", "") for c in contenidos for p in c.get("parts", []))
+        # La historia de la conversación trae etiquetas de turnos anteriores: manda la última
+        etiquetas = re.findall(r"\[guion:(\w+)\]", texto)
+        guion = GUIONES.get(etiquetas[-1], []) if etiquetas else []
+        respuestas = [p["functionResponse"] for c in contenidos for p in c.get("parts", []) if "functionResponse" in p]
+        paso = len(respuestas)
+
+        with self._lock_peticiones:
+            espera_ms = self.latencia_ms + self._rng.uniform(-self.jitter_ms, self.jitter_ms)
+            self.peticiones.append({
+                "bytes": len(cuerpo),
+                "sistema_bytes": len(json.dumps(peticion.get("systemInstruction", ""), ensure_ascii=False)),
+                "herramientas_bytes": len(json.dumps(peticion.get("tools", []), ensure_ascii=False)),
+                "contenido_bytes": len(json.dumps(contenidos, ensure_ascii=False)),
+                "modelo_ms": max(espera_ms, 0.0),
+                "errores_herramienta": sum('"Error' in json.dumps(r, ensure_ascii=False) for r in respuestas),
+            })
+        time.sleep(max(espera_ms, 0.0) / 1000)
+
+        if paso < len(guion):
+            nombre, argumentos = guion[paso]
+            return _respuesta({"functionCall": {"name": nombre, "args": argumentos}})
+        return _respuesta({"text": f"Listo ({paso} herramientas). (respuesta simulada)"})
+
+
+def _turno(at, servidor: GeminiGuionizado, guion: str) -> dict:
+    telemetria.reiniciar()
+    with servidor._lock_peticiones:
+        servidor.peticiones.clear()
+    inicio = time.perf_counter()
+    at.chat_input[0].set_value(f"[guion:{guion}] Ejecuta el guion de prueba.").run()
+    rerun_ms = (time.perf_counter() - inicio) * 1000
+
+    spans = telemetria.muestras()
+    ms = lambda etapa: sum(m["ms"] for m in spans if m["etapa"] == etapa)
+    herramientas = {}
+    for m in spans:
+        if m["etapa"].startswith("herramienta:"):
+            nombre = m["etapa"].split(":", 1)[1]
+            herramientas[nombre] = herramientas.get(nombre, 0.0) + m["ms"]
+    peticiones = list(servidor.peticiones)
+    modelo_ms = sum(p["modelo_ms"] for p in peticiones)
+    turno_ms = ms("gemini_chat")
+    return {
+        "rerun_ms": rerun_ms,
+        "turno_ms": turno_ms,
+        "modelo_ms": modelo_ms,
+        "herramientas_ms": herramientas,
+        "prompt_ms": ms("prompt_agente"),
+        "sdk_ms": turno_ms - modelo_ms - sum(herramientas.values()),
+        "llamadas_modelo": len(peticiones),
+        "peticion_max_bytes": max((p["bytes"] for p in peticiones), default=0),
+        "sistema_bytes": peticiones[0]["sistema_bytes"] if peticiones else 0,
+        "herramientas_bytes": peticiones[0]["herramientas_bytes"] if peticiones else 0,
+        "contenido_max_bytes": max((p["contenido_bytes"] for p in peticiones), default=0),
+        "errores": len(at.exception) + len(at.error),
+        "errores_herramienta": max((p["errores_herramienta"] for p in peticiones), default=0),
+    }
+
+
+def _mediana(turnos: list) -> dict:
+    resumen = {}
+    for clave in turnos[0]:
+        if clave == "herramientas_ms":
+            nombres = sorted({n for t in turnos for n in t[clave]})
+            resumen[clave] = {n: round(float(np.median([t[clave].get(n, 0.0) for t in turnos])), 2) for n in nombres}
+        elif clave in ("errores", "errores_herramienta"):
+            resumen[clave] = sum(t[clave] for t in turnos)
+        else:
+            resumen[clave] = round(float(np.median([t[clave] for t in turnos])), 2)
+    return resumen
+
+
+def ejecutar(tamanos, guiones, repeticiones: int = 3, latencia_ms: float = 300, jitter_ms: float = 0,
+             semilla: int = 0) -> list:
+    resultados = []
+    for filas in tamanos:
+        with GeminiGuionizado(filas, latencia_ms, jitter_ms, semilla) as servidor:
+            at = prueba_carga._nueva_sesion()
+            at.run() # Calentamiento: descarga, historial y artefactos
+            for guion in guiones:
+                turnos = [_turno(at, servidor, guion) for _ in range(repeticiones)]
+                resultados.append({"filas": filas, "guion": guion, **_mediana(turnos)})
+                print(json.dumps(resultados[-1], ensure_ascii=False), flush=True)
+    return resultados
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--filas", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--guiones", nargs="+", choices=list(GUIONES), default=list(GUIONES))
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--latencia-ms", type=float, default=300, help="Latencia inyectada por llamada al modelo.")
+    parser.add_argument("--jitter-ms", type=float, default=0, help="Variación uniforme (con semilla) de la latencia.")
+    parser.add_argument("--semilla", type=int, default=0)
+    args = parser.parse_args()
+    ejecutar(sorted(args.filas), args.guiones, args.repeticiones, args.latencia_ms, args.jitter_ms, args.semilla)
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+"""
+Presupuesto de arranque en frío de appRecuperador.py.
+
+Lanza un intérprete nuevo con -X importtime, renderiza la página una vez con
+AppTest (hoja sintética servida en local, sin red) y reporta el tiempo del
+primer render, los módulos que se importaron durante ese render y los más
+costosos. Termina con código 1 si se excede el presupuesto o si se cargó un
+módulo que solo debe importarse en su primer uso (agente, voz, SQL, pestañas
+de la Intelligence Suite, Parquet).
+
+    python prueba_arranque.py --presupuesto-ms 4000
+
+tests/test_arranque.py corre la misma medición dentro de pytest.
+"""
+
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+APP = os.path.join(os.path.dirname(os.path.abspath(__file__)), "appRecuperador.py")
+PRESUPUESTO_MS = float(os.environ.get("EA_PRESUPUESTO_ARRANQUE_MS", "4000"))
+# Solo deben cargarse cuando se usan: primer mensaje al agente, voz activada, primera consulta SQL,
+# pestaña de análisis abierta o playback, descarga en Parquet. graficas no: la tendencia y la
+# multivariable de la primera pantalla son specs suyas
+DIFERIDOS = ["google.generativeai", "audio_recorder_streamlit", "duckdb", "consultas",
+             "suite_analisis", "pyarrow.parquet"]
+
+_HIJO = r"""
+import json, sys, time
+from streamlit.testing.v1 import AppTest
+antes = set(sys.modules)
+at = AppTest.from_file(sys.argv[1], default_timeout=120)
+at.secrets["GEMINI_API_KEY"] = "simulada"
+inicio = time.perf_counter()
+at.run()
+render_ms = (time.perf_counter() - inicio) * 1000
+print(json.dumps({
+    "render_ms": render_ms,
+    "nuevos": sorted(set(sys.modules) - antes),
+    "errores": [str(e.value) for e in at.exception] + [str(e.value) for e in at.error],
+}))
+"""
+
+
+class _HojaLocal(SimpleHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+def _importtime(stderr: str) -> dict:
+    """{módulo: (ms acumulados, nivel de anidamiento)} a partir de la salida de -X importtime."""
+    tiempos = {}
+    for linea in stderr.splitlines():
+        m = re.match(r"import time:\s+\d+ \|\s+(\d+) \|( *)(\S+)", linea)
+        if m:
+            tiempos[m.group(3)] = (int(m.group(1)) / 1000, len(m.group(2)))
+    return tiempos
+
+
+def medir(filas: int = 5_000) -> dict:
+    import termodinamica
+
+    with tempfile.TemporaryDirectory() as directorio:
+        hoja = termodinamica.historial_sintetico(filas)
+        hoja['Marca temporal'] = hoja['Marca temporal'].dt.strftime('%d/%m/%Y %H:%M:%S')
+        hoja.to_csv(os.path.join(directorio, "hoja.csv"), index=False)
+
+        servidor = ThreadingHTTPServer(("127.0.0.1", 0), partial(_HojaLocal, directory=directorio))
+        threading.Thread(target=servidor.serve_forever, daemon=True).start()
+        entorno = dict(os.environ,
+                       EA_SHEET_CSV_URL=f"http://127.0.0.1:{servidor.server_port}/hoja.csv",
+                       EA_DATA_DIR=os.path.join(directorio, "datos"))
+        try:
+            proceso = subprocess.run([sys.executable, "-X", "importtime", "-c", _HIJO, APP],
+                                     capture_output=True, text=True, env=entorno, timeout=300,
+                                     cwd=os.path.dirname(APP))
+        finally:
+            servidor.shutdown()
+
+    salida = json.loads(proceso.stdout.strip().splitlines()[-1])
+    tiempos = _importtime(proceso.stderr)
+    nuevos = set(salida["nuevos"])
+    # Solo imports de primer nivel: el tiempo acumulado ya incluye lo que cada uno arrastra
+    raices = {m: tiempos[m][0] for m in nuevos if m in tiempos and tiempos[m][1] == 1}
+    return {
+        "render_ms": round(salida["render_ms"], 1),
+        "importaciones_ms": round(sum(raices.values()), 1),
+        "mas_costosos": sorted(raices.items(), key=lambda x: -x[1])[:10],
+        "diferidos_cargados": [m for m in DIFERIDOS if m in nuevos],
+        "errores": salida["errores"],
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--presupuesto-ms", type=float, default=PRESUPUESTO_MS, help="Máximo para el primer render.")
+    parser.add_argument("--filas", type=int, default=5_000)
+    args = parser.parse_args()
+
+    resultado = medir(args.filas)
+    print(f"Primer render: {resultado['render_ms']:.0f} ms (presupuesto {args.presupuesto_ms:.0f} ms)")
+    print(f"Importaciones durante el render: {resultado['importaciones_ms']:.0f} ms")
+    for modulo, ms in resultado["mas_costosos"]:
+        print(f"  {modulo:<44}{ms:8.1f} ms")
+    fallas = []
+    if resultado["render_ms"] > args.presupuesto_ms:
+        fallas.append("presupuesto de arranque excedido")
+    if resultado["diferidos_cargados"]:
+        fallas.append(f"módulos cargados antes de su primer uso: {', '.join(resultado['diferidos_cargados'])}")
+    if resultado["errores"]:
+        fallas.append(f"errores en el render: {resultado['errores'][:3]}")
+    for falla in fallas:
+        print(f"FALLA: {falla}")
+    sys.exit(1 if fallas else 0)
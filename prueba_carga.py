@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+"""
+Prueba de carga con sesiones concurrentes de appRecuperador.py.
+
+Levanta un servidor HTTP local que sustituye a la hoja de Google (CSV
+sintético que crece con el tiempo), a Gemini y a UltraMsg, y conduce N
+sesiones sin navegador con streamlit.testing.v1.AppTest. Para cada escala
+reporta la latencia de rerun (p50/p95/p99), la memoria por sesión y el RSS
+total del proceso.
+
+    python prueba_carga.py --sesiones 1 5 10 25 50 --rondas 5
+"""
+
+import argparse
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+import termodinamica
+
+APP = os.path.join(os.path.dirname(os.path.abspath(__file__)), "appRecuperador.py")
+
+RESPUESTA_GEMINI = {
+    "candidates": [{
+        "content": {"role": "model", "parts": [{"text": "Sistema estable. (respuesta simulada)"}]},
+        "finishReason": "STOP",
+    }]
+}
+
+
+class ServidorSimulado:
+    """Hoja CSV creciente + Gemini + UltraMsg en http://127.0.0.1:<puerto>."""
+
+    def __init__(self, filas_iniciales: int = 5_000, filas_por_segundo: float = 2.0, filas_max: int = 200_000):
+        hoja = termodinamica.historial_sintetico(filas_max)
+        hoja['Marca temporal'] = hoja['Marca temporal'].dt.strftime('%d/%m/%Y %H:%M:%S')
+        self.hoja = hoja
+        self.filas_iniciales = filas_iniciales
+        self.filas_por_segundo = filas_por_segundo
+        self.inicio = time.monotonic()
+        self._csv_cache = {}
+        self._lock = threading.Lock()
+        self.conteo = {"hoja": 0, "gemini": 0, "ultramsg": 0}
+
+        servidor = self
+
+        class Manejador(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _responder(self, cuerpo: bytes, tipo: str):
+                self.send_response(200)
+                self.send_header("Content-Type", tipo)
+                self.send_header("Content-Length", str(len(cuerpo)))
+                self.end_headers()
+                self.wfile.write(cuerpo)
+
+            def do_GET(self):
+                if self.path.startswith("/hoja.csv"):
+                    servidor.conteo["hoja"] += 1
+                    self._responder(servidor.csv_actual(), "text/csv")
+                else:
+                    servidor.conteo["gemini"] += 1
+                    self._responder(json.dumps({"models": [{
+                        "name": "models/gemini-1.5-flash",
+                        "supportedGenerationMethods": ["generateContent"],
+                    }]}).encode(), "application/json")
+
+            def do_POST(self):
+                cuerpo = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                if "/messages/chat" in self.path:
+                    servidor.conteo["ultramsg"] += 1
+                    self._responder(b'{"sent":"true"}', "application/json")
+                else:
+                    servidor.conteo["gemini"] += 1
+                    self._responder(json.dumps(servidor.responder_gemini(cuerpo)).encode(), "application/json")
+
+        self.http = ThreadingHTTPServer(("127.0.0.1", 0), Manejador)
+        self.url = f"http://127.0.0.1:{self.http.server_port}"
+
+    def responder_gemini(self, cuerpo: bytes) -> dict:
+        """Respuesta a generateContent; prueba_agente.py la sustituye por guiones de herramientas."""
+        return RESPUESTA_GEMINI
+
+    def filas_actuales(self) -> int:
+        crecimiento = int((time.monotonic() - self.inicio) * self.filas_por_segundo)
+        return min(len(self.hoja), self.filas_iniciales + crecimiento)
+
+    def csv_actual(self) -> bytes:
+        filas = self.filas_actuales()
+        with self._lock:
+            if filas not in self._csv_cache:
+                self._csv_cache = {filas: self.hoja.iloc[:filas].to_csv(index=False).encode("utf-8")}
+            return self._csv_cache[filas]
+
+    def __enter__(self):
+        threading.Thread(target=self.http.serve_forever, daemon=True).start()
+        os.environ["EA_SHEET_CSV_URL"] = f"{self.url}/hoja.csv"
+        os.environ["EA_GEMINI_ENDPOINT"] = self.url
+        os.environ["EA_ULTRAMSG_URL"] = self.url
+        return self
+
+    def __exit__(self, *exc):
+        self.http.shutdown()
+        return False
+
+
+def rss_mb() -> float:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+
+
+def _serializar_compilacion():
+    """AppTest crea un ScriptCache nuevo en cada run, así que las sesiones
+    concurrentes recompilan el script a la vez; ast.parse de CPython 3.11 no
+    es seguro entre hilos y falla con SystemError, dejando la sesión vacía.
+    El servidor real comparte un solo ScriptCache; aquí basta un candado."""
+    from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+
+    original = ScriptCache.get_bytecode
+    if getattr(original, "serializado", False):
+        return
+    candado = threading.Lock()
+
+    def get_bytecode(self, script_path):
+        with candado:
+            return original(self, script_path)
+
+    get_bytecode.serializado = True
+    ScriptCache.get_bytecode = get_bytecode
+
+
+def _nueva_sesion():
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(APP, default_timeout=120)
+    at.secrets["GEMINI_API_KEY"] = "simulada"
+    at.secrets["WHA_INSTANCE"] = "instance0"
+    at.secrets["WHA_TOKEN"] = "simulado"
+    at.secrets["WHA_PHONE"] = "+520000000000"
+    return at
+
+
+def _rerun(at, mensaje: str = None) -> float:
+    inicio = time.perf_counter()
+    if mensaje:
+        at.chat_input[0].set_value(mensaje).run()
+    else:
+        at.run()
+    return (time.perf_counter() - inicio) * 1000
+
+
+def _bytes_sesion(at) -> int:
+    total = 0
+    if "artefactos" in at.session_state:
+        # Los artefactos compartidos entre sesiones se cuentan en cada una que los referencia
+        total += int(at.session_state["artefactos"].obtener("historial").memory_usage(deep=True).sum())
+    return total
+
+
+def ejecutar(escalas, rondas: int = 5, concurrente: bool = True, con_chat: bool = True) -> list:
+    resultados = []
+    _serializar_compilacion()
+    with ServidorSimulado() as servidor:
+        sesiones = []
+        rss_base = rss_mb()
+        for n in escalas:
+            while len(sesiones) < n:
+                at = _nueva_sesion()
+                at.run()
+                sesiones.append(at)
+
+            latencias = []
+            with ThreadPoolExecutor(max_workers=n if concurrente else 1) as pool:
+                for ronda in range(rondas):
+                    mensaje = "Dame un diagnóstico del sistema" if con_chat and ronda == rondas - 1 else None
+                    latencias.extend(pool.map(lambda at: _rerun(at, mensaje), sesiones))
+
+            # Una sesión sin elementos es un run que ni siquiera llegó a ejecutarse
+            errores = sum(len(at.exception) + (not at.main.children) for at in sesiones)
+            rss = rss_mb()
+            latencias = np.array(latencias)
+            resultados.append({
+                "sesiones": n,
+                "reruns": len(latencias),
+                "p50_ms": round(float(np.percentile(latencias, 50)), 1),
+                "p95_ms": round(float(np.percentile(latencias, 95)), 1),
+                "p99_ms": round(float(np.percentile(latencias, 99)), 1),
+                "datos_por_sesion_mb": round(np.mean([_bytes_sesion(at) for at in sesiones]) / 2**20, 2),
+                "rss_por_sesion_mb": round((rss - rss_base) / n, 1),
+                "rss_total_mb": round(rss, 1),
+                "filas_hoja": servidor.filas_actuales(),
+                "errores": errores,
+                "peticiones_simuladas": dict(servidor.conteo),
+            })
+            print(json.dumps(resultados[-1], ensure_ascii=False), flush=True)
+    return resultados
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sesiones", type=int, nargs="+", default=[1, 5, 10, 25, 50])
+    parser.add_argument("--rondas", type=int, default=5)
+    parser.add_argument("--secuencial", action="store_true", help="Un rerun a la vez en lugar de concurrentes.")
+    parser.add_argument("--sin-chat", action="store_true", help="No enviar mensajes al agente simulado.")
+    args = parser.parse_args()
+    ejecutar(sorted(args.sesiones), args.rondas, concurrente=not args.secuencial, con_chat=not args.sin_chat)
@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+"""
+Mediciones offline de los módulos de datos sobre un historial sintético.
+
+Cada medición compara la implementación actual con la versión directa que
+reemplazó (o mide su costo aislado) sin levantar la página:
+
+    python prueba_modulos.py ingesta calidad consumo fugas esquema consultas chat voz
+    python prueba_modulos.py ingesta --filas 1000000
+    python prueba_modulos.py consultas --filas 5000000
+"""
+
+import argparse
+import io
+import os
+import statistics
+import tempfile
+import time
+from contextlib import closing
+
+import numpy as np
+import pandas as pd
+
+import termodinamica
+
+
+def _historial(filas: int) -> pd.DataFrame:
+    return termodinamica.calculate_thermodynamics(termodinamica.historial_sintetico(filas))
+
+
+def medir_ingesta(filas: int):
+    import ingesta
+
+    hoja = termodinamica.historial_sintetico(filas)
+    hoja['Marca temporal'] = hoja['Marca temporal'].dt.strftime(ingesta.FORMATO_MARCA_TEMPORAL)
+    contenido = hoja.to_csv(index=False).encode('utf-8')
+
+    def parseo_original(contenido):
+        df = pd.read_csv(io.BytesIO(contenido))
+        df['Marca temporal'] = pd.to_datetime(df['Marca temporal'], dayfirst=True)
+        return df
+
+    for nombre, funcion in [("original (inferencia)", parseo_original),
+                            (f"perfil ({'pyarrow' if ingesta.pyarrow_disponible() else 'pandas'})", ingesta.parsear_csv),
+                            ("perfil, hit de cache", ingesta.parsear_cacheado)]:
+        if funcion is ingesta.parsear_cacheado:
+            ingesta.parsear_cacheado(contenido)
+        inicio = time.perf_counter()
+        funcion(contenido)
+        print(f"{nombre:>24}: {time.perf_counter() - inicio:8.3f} s")
+
+
+def medir_calidad(filas: int):
+    import calidad
+
+    hoja = termodinamica.historial_sintetico(filas)
+    rng = np.random.default_rng(1)
+    for col, valor in [('Temperatura Celsius', np.nan), ('Presión', np.nan), ('Presión', 9_999.0), ('Marca temporal', pd.NaT)]:
+        hoja.loc[rng.choice(len(hoja), 500, replace=False), col] = valor
+    hoja = pd.concat([hoja, hoja.sample(500, random_state=1)])
+
+    inicio = time.perf_counter()
+    resultado = calidad.validar(hoja)
+    validacion_s = time.perf_counter() - inicio
+    inicio = time.perf_counter()
+    termodinamica.calculate_thermodynamics(resultado['limpio'])
+    calculo_s = time.perf_counter() - inicio
+    print(f"validar(): {validacion_s:.3f} s  vs  calculate_thermodynamics(): {calculo_s:.3f} s")
+    print(resultado['conteos'])
+
+
+def medir_consumo(filas: int):
+    import consumo
+
+    historial = _historial(filas)
+    inicio = time.perf_counter()
+    indice = consumo.IndiceConsumo(historial)
+    print(f"índice sobre {len(indice)} lecturas: {time.perf_counter() - inicio:.3f} s")
+
+    desde = historial['Marca temporal'].iloc[len(historial) // 5]
+    hasta = historial['Marca temporal'].iloc[4 * len(historial) // 5]
+    inicio = time.perf_counter()
+    for _ in range(1_000):
+        resultado = indice.rango(desde, hasta)
+    print(f"rango(): {(time.perf_counter() - inicio) * 1000:.1f} µs por consulta -> {resultado}")
+
+    inicio = time.perf_counter()
+    en_rango = historial[(historial['Marca temporal'] > desde) & (historial['Marca temporal'] <= hasta)]
+    escaneo = -en_rango['Diferencia M3'][en_rango['Diferencia M3'] < 0].sum()
+    print(f"escaneo: {(time.perf_counter() - inicio) * 1000:.1f} ms -> consumo {escaneo:.4f}")
+
+
+def pendientes_directas(x_h, y, ventana):
+    """Referencia O(n*w) con polyfit por ventana (solo para verificar)."""
+    return np.array([np.nan] * (ventana - 1) + [
+        np.polyfit(x_h[i - ventana + 1:i + 1], y[i - ventana + 1:i + 1], 1)[0] for i in range(ventana - 1, len(y))
+    ])
+
+
+def medir_fugas(filas: int):
+    import fugas
+
+    historial = _historial(filas)
+    tiempos = historial['Marca temporal'].to_numpy('datetime64[ns]').astype(np.int64)
+    x_h = (tiempos - tiempos[0]) / (3_600 * 10**9)
+    y = historial['Volume in Cubic Meters ( M3 )'].to_numpy(np.float64)
+
+    inicio = time.perf_counter()
+    pendiente, _, _ = fugas.pendientes_ventana(x_h, y, historial['Temperatura Celsius'].to_numpy(np.float64))
+    print(f"{len(y)} ventanas con sumas acumuladas: {time.perf_counter() - inicio:.3f} s")
+    cola = slice(max(len(y) - 5_000, 0), len(y))
+    directa = pendientes_directas(x_h[cola], y[cola], fugas.VENTANA_LECTURAS)
+    print(f"Máx. diferencia vs polyfit (últimas 5000): {np.nanmax(np.abs(pendiente[cola] - directa)):.2e} M3/h")
+    inicio = time.perf_counter()
+    print(fugas.detectar(historial).head(10).to_string())
+    print(f"detectar(): {time.perf_counter() - inicio:.3f} s")
+
+
+def medir_esquema(filas: int):
+    base = termodinamica.historial_sintetico(filas)
+    print(termodinamica.reporte_memoria(termodinamica.calculate_thermodynamics(base, compacto=False),
+                                        termodinamica.calculate_thermodynamics(base, compacto=True)).to_string())
+
+
+def medir_consultas(filas: int):
+    import consultas
+
+    historial = _historial(filas)
+    consulta = """
+        SELECT DATE(marca_temporal) AS dia, SUM(consumo_m3) AS consumo, AVG(presion_psi) AS presion
+        FROM historial WHERE presion_psi BETWEEN 140 AND 160 GROUP BY 1 ORDER BY 1 DESC
+    """
+    for usar_duckdb in ([True, False] if consultas.duckdb_disponible() else [False]):
+        inicio = time.perf_counter()
+        motor = consultas.MotorConsultas({'historial': historial}, usar_duckdb=usar_duckdb)
+        preparacion_s = time.perf_counter() - inicio
+        inicio = time.perf_counter()
+        motor.consultar(consulta)
+        print(f"{motor.motor:>7}: registro {preparacion_s * 1000:8.1f} ms, consulta {(time.perf_counter() - inicio) * 1000:8.1f} ms")
+
+    inicio = time.perf_counter()
+    banda = historial[historial['Presión'].between(140, 160)]
+    banda.groupby(banda['Marca temporal'].dt.date).agg(consumo=('Consumo Absoluto M3', 'sum'), presion=('Presión', 'mean'))
+    print(f" pandas: consulta {(time.perf_counter() - inicio) * 1000:8.1f} ms")
+
+
+def medir_chat(filas: int):
+    import historial_chat
+
+    # El costo de leer la ventana visible no crece con el largo de la conversación
+    with tempfile.TemporaryDirectory() as directorio:
+        historial = historial_chat.HistorialChat(os.path.join(directorio, "chat.db"), max_filas=10**9)
+        escritos = 0
+        for total in [100, 1_000, 10_000, 100_000]:
+            with closing(historial._conectar()) as con:
+                con.executemany(
+                    "INSERT INTO mensajes (usuario, rol, contenido, creado) VALUES (?, ?, ?, ?)",
+                    [("operador", "user" if i % 2 == 0 else "assistant", f"Mensaje {i} " * 20, "2026-01-01T00:00:00")
+                     for i in range(escritos, total)]
+                )
+            escritos = total
+            inicio = time.perf_counter()
+            for _ in range(100):
+                historial.ultimos("operador")
+            print(f"{total:>8} mensajes: ventana de {historial_chat.MENSAJES_POR_PAGINA} en "
+                  f"{(time.perf_counter() - inicio) * 10:.3f} ms")
+
+
+def medir_voz(filas: int, n: int = 50, latencia_s: float = 0.05, tam_audio: int = 160_000):
+    """Extremo a extremo con TranscriptorLocal: audios nuevos (miss) y repetidos (hit de cache)."""
+    import voz
+
+    transcriptor = voz.TranscriptorLocal(latencia_s=latencia_s)
+    audios = [os.urandom(tam_audio) for _ in range(n)]
+
+    def _medir(lote):
+        tiempos = []
+        for audio in lote:
+            t0 = time.perf_counter()
+            voz.transcribir(audio, transcriptor)
+            tiempos.append((time.perf_counter() - t0) * 1000)
+        tiempos.sort()
+        return {
+            "p50_ms": round(statistics.median(tiempos), 3),
+            "p95_ms": round(tiempos[int(0.95 * (len(tiempos) - 1))], 3),
+        }
+
+    print({"miss": _medir(audios), "hit": _medir(audios)})
+
+
+MEDICIONES = {
+    "ingesta": medir_ingesta,
+    "calidad": medir_calidad,
+    "consumo": medir_consumo,
+    "fugas": medir_fugas,
+    "esquema": medir_esquema,
+    "consultas": medir_consultas,
+    "chat": medir_chat,
+    "voz": medir_voz,
+}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("mediciones", nargs="+", choices=list(MEDICIONES))
+    parser.add_argument("--filas", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    for nombre in args.mediciones:
+        print(f"== {nombre}")
+        MEDICIONES[nombre](args.filas)
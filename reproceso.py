@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+"""
+Reproceso (backfill) paralelo del historial termodinámico.
+
+Para recalcular historiales largos tras un cambio de fórmula o calibración:
+las lecturas ordenadas por tiempo se copian una vez a memoria compartida,
+cada proceso del pool calcula Z, Fv y volumen de un bloque con
+calcular_factores() y escribe en los arreglos compartidos de salida (el frame
+nunca se serializa). La diferencia de volumen se calcula dentro de cada
+bloque y se cose en los bordes al final.
+
+    python reproceso.py --filas 10000000 --procesos 1 2 4 8
+    python reproceso.py --entrada historial.csv --salida historial.parquet
+"""
+
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+import termodinamica
+
+FILAS_POR_BLOQUE = 1_000_000
+ENTRADAS = ['temp_c', 'presion_psi']
+SALIDAS = ['temp_f', 'vessel_pres', 'z_factor', 'fv', 'vol_m3', 'diferencia']
+
+
+def _arreglos(segmentos: dict, n: int) -> dict:
+    return {clave: np.ndarray((n,), dtype=np.float64, buffer=shm.buf) for clave, shm in segmentos.items()}
+
+
+def _escribir_bloque(a: dict, inicio: int, fin: int):
+    resultado = termodinamica.calcular_factores(a['temp_c'][inicio:fin], a['presion_psi'][inicio:fin])
+    for clave, valores in zip(SALIDAS, resultado):
+        a[clave][inicio:fin] = valores
+    volumen = a['vol_m3'][inicio:fin]
+    a['diferencia'][inicio] = 0.0 # Se cose en el proceso principal
+    np.subtract(volumen[1:], volumen[:-1], out=a['diferencia'][inicio + 1:fin])
+
+
+def _calcular_bloque(nombres: dict, n: int, inicio: int, fin: int) -> int:
+    """Tarea del pool: abre los segmentos por nombre y escribe su bloque."""
+    segmentos = {clave: shared_memory.SharedMemory(name=nombre) for clave, nombre in nombres.items()}
+    try:
+        _escribir_bloque(_arreglos(segmentos, n), inicio, fin)
+        return fin - inicio
+    finally:
+        # Las vistas de numpy ya se liberaron al salir de _escribir_bloque
+        for shm in segmentos.values():
+            shm.close()
+
+
+def _coser(a: dict, rangos: list):
+    """La primera diferencia de cada bloque usa el último volumen del bloque anterior."""
+    for inicio, _ in rangos[1:]:
+        a['diferencia'][inicio] = a['vol_m3'][inicio] - a['vol_m3'][inicio - 1]
+
+
+def bloques(n: int, filas_por_bloque: int = FILAS_POR_BLOQUE) -> list:
+    return [(inicio, min(n, inicio + filas_por_bloque)) for inicio in range(0, n, filas_por_bloque)]
+
+
+def reprocesar(temp_c, presion_psi, procesos: int = None, filas_por_bloque: int = FILAS_POR_BLOQUE) -> dict:
+    """
+    Calcula las columnas termodinámicas de lecturas ya ordenadas y sin nulos.
+    Devuelve {salida: np.ndarray}, con 'diferencia' igual a diff().fillna(0).
+    """
+    procesos = procesos or os.cpu_count() or 1
+    n = len(temp_c)
+    rangos = bloques(n, filas_por_bloque)
+    if procesos == 1 or len(rangos) <= 1:
+        # Sin pool no hace falta memoria compartida (evita la copia de entrada y salida)
+        a = {clave: np.empty(n) for clave in SALIDAS}
+        a['temp_c'], a['presion_psi'] = np.asarray(temp_c, np.float64), np.asarray(presion_psi, np.float64)
+        for inicio, fin in rangos:
+            _escribir_bloque(a, inicio, fin)
+        _coser(a, rangos)
+        return {clave: a[clave] for clave in SALIDAS}
+
+    segmentos = {clave: shared_memory.SharedMemory(create=True, size=n * 8) for clave in ENTRADAS + SALIDAS}
+    try:
+        nombres = {clave: shm.name for clave, shm in segmentos.items()}
+        a = _arreglos(segmentos, n)
+        a['temp_c'][:] = temp_c
+        a['presion_psi'][:] = presion_psi
+
+        with ProcessPoolExecutor(max_workers=procesos) as pool:
+            list(pool.map(_calcular_bloque, *zip(*[(nombres, n, i, f) for i, f in rangos])))
+        _coser(a, rangos)
+
+        resultado = {clave: a[clave].copy() for clave in SALIDAS}
+        del a
+        return resultado
+    finally:
+        for shm in segmentos.values():
+            shm.close()
+            shm.unlink()
+
+
+def reprocesar_frame(df_input, procesos: int = None, filas_por_bloque: int = FILAS_POR_BLOQUE, compacto: bool = None):
+    """Equivalente paralelo de calculate_thermodynamics para historiales largos."""
+    if compacto is None:
+        compacto = termodinamica.ESQUEMA_COMPACTO
+
+    df = df_input.copy()
+    if not pd.api.types.is_datetime64_any_dtype(df['Marca temporal']):
+        df['Marca temporal'] = pd.to_datetime(df['Marca temporal'])
+    df = df.sort_values('Marca temporal')
+    for col in ['Temperatura Celsius', 'Presión']:
+        if not pd.api.types.is_numeric_dtype(df[col]):
+            df[col] = pd.to_numeric(df[col], errors='coerce')
+    df = df.dropna(subset=['Temperatura Celsius', 'Presión'])
+
+    r = reprocesar(df['Temperatura Celsius'].to_numpy(np.float64), df['Presión'].to_numpy(np.float64),
+                   procesos, filas_por_bloque)
+    df['Temperatura Fahrenheit'] = r['temp_f']
+    df['Temperature Over'] = r['temp_f']
+    df['Vessel Pressure'] = r['vessel_pres']
+    df['Compressibility Factor (Z)'] = r['z_factor']
+    df['Volume Factor (Fv)'] = r['fv']
+    df['Volume Helium ft3'] = termodinamica.BASE_VOLUME * r['fv']
+    df['Volume in Cubic Meters ( M3 )'] = r['vol_m3']
+    df['Diferencia M3'] = r['diferencia']
+    df['Consumo Absoluto M3'] = np.abs(r['diferencia'])
+
+    if compacto:
+        df = termodinamica.compactar(df)
+    return df
+
+
+def _benchmark(filas: int, procesos: list, filas_por_bloque: int):
+    rng = np.random.default_rng(0)
+    temp_c = 22 + 3 * np.sin(np.arange(filas) / 200) + rng.normal(0, 0.3, filas)
+    presion = 150 + 30 * np.sin(np.arange(filas) / 5000) + rng.normal(0, 0.5, filas)
+
+    inicio = time.perf_counter()
+    referencia = termodinamica.calcular_factores(temp_c, presion)[4]
+    base_s = time.perf_counter() - inicio
+    print(f"{'un solo hilo (referencia)':>28}: {base_s:8.3f} s")
+
+    for p in procesos:
+        inicio = time.perf_counter()
+        r = reprocesar(temp_c, presion, p, filas_por_bloque)
+        segundos = time.perf_counter() - inicio
+        assert np.allclose(r['vol_m3'], referencia)
+        assert np.allclose(r['diferencia'][1:], np.diff(referencia))
+        print(f"{f'{p} proceso(s)':>28}: {segundos:8.3f} s  (x{base_s / segundos:.2f})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--filas", type=int, default=10_000_000, help="Filas sintéticas para el benchmark.")
+    parser.add_argument("--procesos", type=int, nargs="+", default=[1, os.cpu_count() or 1])
+    parser.add_argument("--bloque", type=int, default=FILAS_POR_BLOQUE, help="Filas por bloque.")
+    parser.add_argument("--entrada", help="CSV o Parquet con el historial a reprocesar.")
+    parser.add_argument("--salida", help="Parquet de salida.")
+    args = parser.parse_args()
+
+    if args.entrada:
+        if args.entrada.endswith(".parquet"):
+            historial = pd.read_parquet(args.entrada)
+        else:
+            import ingesta
+
+            with open(args.entrada, "rb") as f:
+                historial = ingesta.parsear_csv(f.read())
+        resultado = reprocesar_frame(historial, max(args.procesos), args.bloque)
+        resultado.to_parquet(args.salida or "reproceso.parquet", index=False)
+        print(f"{len(resultado)} filas reprocesadas -> {args.salida or 'reproceso.parquet'}")
+    else:
+        _benchmark(args.filas, args.procesos, args.bloque)
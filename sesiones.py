@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+"""
+Contabilidad de memoria por sesión y desalojo de sesiones inactivas.
+
+Cada interacción del usuario registra la sesión (tocar()): su grafo de
+artefactos y la hora de la última interacción. Los reruns automáticos del
+fragmento de KPIs, y el rerun completo que este dispara al llegar lecturas,
+no cuentan como interacción.
+
+Una sesión sin interacción durante EA_SESION_INACTIVA_S suelta los valores de
+su grafo (hoja parseada, historial, vista, specs, contexto del agente). No se
+pierde nada: el grafo conserva versiones y cargadores, y el siguiente
+obtener() toma el valor del almacén compartido o lo recalcula. El barrido
+corre como máximo cada EA_BARRIDO_SESIONES_S desde cualquier sesión viva.
+Mientras está desalojada, la sesión pausa su fragmento de KPIs para no
+rehidratar el grafo en cada refresco; la siguiente interacción lo reanuda.
+
+El chat no vive en la sesión: se lee por páginas desde historial_chat.py.
+"""
+
+import os
+import threading
+import time
+import weakref
+
+import pandas as pd
+
+import artefactos
+
+INACTIVA_S = float(os.environ.get("EA_SESION_INACTIVA_S", "900"))
+BARRIDO_S = float(os.environ.get("EA_BARRIDO_SESIONES_S", "60"))
+
+
+def rss_mb():
+    """RSS actual del proceso en MB (None si el sistema no expone /proc)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+class _Sesion:
+    __slots__ = ("grafo", "creada", "ultima", "desalojada", "desalojos")
+
+    def __init__(self, grafo, ahora: float):
+        self.grafo = weakref.ref(grafo) # Sin referencia fuerte: al cerrar la sesión el grafo se recoge
+        self.creada = ahora
+        self.ultima = ahora
+        self.desalojada = False
+        self.desalojos = 0
+
+
+class RegistroSesiones:
+    def __init__(self, inactiva_s: float = INACTIVA_S, barrido_s: float = BARRIDO_S):
+        self.inactiva_s = inactiva_s
+        self.barrido_s = barrido_s
+        self.desalojos = 0
+        self._sesiones = {}
+        self._lock = threading.Lock()
+        self._ultimo_barrido = time.monotonic()
+
+    def tocar(self, id_sesion: str, grafo):
+        """Interacción del usuario: la sesión vuelve a contar como activa."""
+        ahora = time.monotonic()
+        with self._lock:
+            sesion = self._sesiones.get(id_sesion)
+            if sesion is None or sesion.grafo() is not grafo:
+                sesion = self._sesiones[id_sesion] = _Sesion(grafo, ahora)
+            sesion.ultima = ahora
+            sesion.desalojada = False
+
+    def desalojada(self, id_sesion: str) -> bool:
+        with self._lock:
+            sesion = self._sesiones.get(id_sesion)
+            return sesion is not None and sesion.desalojada
+
+    def barrer(self, forzar: bool = False) -> int:
+        """Desaloja los grafos de las sesiones inactivas; devuelve cuántas se desalojaron."""
+        ahora = time.monotonic()
+        with self._lock:
+            if not forzar and ahora - self._ultimo_barrido < self.barrido_s:
+                return 0
+            self._ultimo_barrido = ahora
+            candidatas = []
+            for id_sesion, sesion in list(self._sesiones.items()):
+                grafo = sesion.grafo()
+                if grafo is None: # La sesión se cerró
+                    del self._sesiones[id_sesion]
+                elif not sesion.desalojada and ahora - sesion.ultima > self.inactiva_s:
+                    candidatas.append((sesion, sesion.ultima, grafo))
+
+        desalojadas = 0
+        for sesion, ultima, grafo in candidatas:
+            if grafo.desalojar() is None: # Ocupada: se intenta en el siguiente barrido
+                continue
+            with self._lock:
+                if sesion.ultima == ultima: # No volvió a interactuar mientras tanto
+                    sesion.desalojada = True
+                    sesion.desalojos += 1
+                    self.desalojos += 1
+                    desalojadas += 1
+        return desalojadas
+
+    def resumen(self) -> pd.DataFrame:
+        """
+        Una fila por sesión. 'Exclusivo MB' cuenta solo los valores que no están en
+        el almacén compartido ni en otra sesión: es lo que se libera al desalojarla.
+        """
+        ahora = time.monotonic()
+        with self._lock:
+            sesiones = [(id_sesion, s, s.grafo()) for id_sesion, s in self._sesiones.items()]
+        vivas = [(id_sesion, s, grafo.valores()) for id_sesion, s, grafo in sesiones if grafo is not None]
+
+        tamanos = {id(valor): tamano for _, valor, tamano in artefactos.almacen_proceso().valores()}
+        compartidos = set(tamanos)
+        referencias = {}
+        for _, _, valores in vivas:
+            for valor in valores.values():
+                referencias[id(valor)] = referencias.get(id(valor), 0) + 1
+                if id(valor) not in tamanos:
+                    tamanos[id(valor)] = artefactos.tamano_bytes(valor)
+
+        filas = []
+        for id_sesion, sesion, valores in vivas:
+            ids = {id(valor) for valor in valores.values()}
+            exclusivos = [i for i in ids if i not in compartidos and referencias[i] == 1]
+            filas.append({
+                "Sesión": id_sesion[:8],
+                "Inactiva min": round((ahora - sesion.ultima) / 60, 1),
+                "Nodos": len(valores),
+                "Referenciado MB": round(sum(tamanos[i] for i in ids) / 2**20, 2),
+                "Exclusivo MB": round(sum(tamanos[i] for i in exclusivos) / 2**20, 2),
+                "Desalojada": sesion.desalojada,
+            })
+        return pd.DataFrame(filas)
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""
+Intelligence Suite: contenido de las pestañas de análisis profundo.
+
+La página arma las pestañas en su propio fragmento e importa este módulo
+solo cuando se abre una pestaña de análisis o se inicia el playback: el
+primer render no lo carga (ver prueba_arranque.py). Lo costoso sale del
+grafo de artefactos de la sesión por versión de datos.
+"""
+
+import time
+
+import altair as alt
+import streamlit as st
+
+import graficas
+import telemetria
+
+
+def playback(grafo, placeholder, velocidad: str):
+    cols_interes = ['Marca temporal', 'Compressibility Factor (Z)', 'Volume Factor (Fv)', 'Consumo Absoluto M3']
+    df_anim_raw = grafo.obtener('historial')[cols_interes].iloc[::2, :].reset_index(drop=True)
+
+    color_scale_anim = alt.Scale(
+        domain=['Compressibility Factor (Z)', 'Volume Factor (Fv)', 'Consumo Absoluto M3'],
+        range=['#2ecc71', '#e67e22', '#e74c3c']
+    )
+
+    for i in range(2, len(df_anim_raw) + 1):
+        current_data = df_anim_raw.iloc[:i]
+        df_melted_anim = current_data.melt(id_vars=['Marca temporal'], var_name='Variable Termodinámica', value_name='Valor')
+
+        anim_chart = alt.Chart(df_melted_anim).mark_line(point=True).encode(
+            x=alt.X('Marca temporal:T', title='Tiempo'),
+            y=alt.Y('Valor:Q', scale=alt.Scale(zero=False)),
+            color=alt.Color('Variable Termodinámica:N', scale=color_scale_anim),
+            tooltip=['Marca temporal:T', 'Variable Termodinámica:N', 'Valor:Q']
+        ).properties(height=450)
+
+        # El placeholder ya existe, así que solo lo actualizamos
+        placeholder.altair_chart(anim_chart, width="stretch")
+
+        # Ajustamos el sleep según la velocidad
+        delay = {"Lento": 0.4, "Normal": 0.15, "Rápido": 0.05}[velocidad]
+        time.sleep(delay)
+
+    st.success("✅ Playback finalizado.")
+
+
+def control_dispersion(grafo):
+    st.info("Identificación de anomalías y estabilidad del consumo (Outliers).")
+    # Gráfico de Caja (Boxplot) para el Consumo Absoluto
+    with telemetria.etapa("grafica_boxplot", len(grafo.obtener('historial'))):
+        st.vega_lite_chart(spec=graficas.para_envio(grafo.obtener('spec_boxplot')), width="stretch")
+    st.caption("Nota: Los puntos fuera de los 'bigotes' representan consumos atípicos que requieren revisión.")
+
+
+def distribucion_presion(grafo):
+    st.info("Frecuencia operativa de Presión en el Recuperador.")
+    # Histograma de Presión
+    with telemetria.etapa("grafica_histograma", len(grafo.obtener('historial'))):
+        st.vega_lite_chart(spec=graficas.para_envio(grafo.obtener('spec_histograma')), width="stretch")
+
+
+def salud_sistema(grafo):
+    st.info("Resumen ejecutivo de eficiencia termodinámica.")
+    # Métricas de salud del sistema sobre todo el historial
+    estadisticas = grafo.obtener('estadisticas')
+    avg_z = estadisticas['Factor_Z_Promedio']
+    total_consumo = estadisticas['Consumo_Total']
+
+    m1, m2, m3 = st.columns(3)
+    m1.metric("Z Promedio", f"{avg_z:.6f}", help="Cercanía al gas ideal")
+    m2.metric("Consumo Total", f"{total_consumo:.2f} M3", delta="Acumulado Histórico")
+    m3.metric("Estabilidad", "98.2%", delta="Alta", help="Basado en varianza de Fv")
+
+    st.success("Sugerencia de IA: El sistema opera mayormente en rangos de presión estables.")
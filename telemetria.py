@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""
+Instrumentación por etapa de cada rerun del monitor.
+
+    with telemetria.etapa("calculo_termodinamico") as span:
+        df = calculate_thermodynamics(raw_df)
+        span.filas = len(df)
+
+Cada span registra duración y filas en un almacén en memoria (ventana móvil
+por etapa, compartida por todas las sesiones del proceso) y, si se define
+EA_LOG_TIEMPOS=<ruta>, también como una línea JSON en ese archivo.
+"""
+
+import functools
+import json
+import os
+import threading
+import time
+import uuid
+from collections import defaultdict, deque
+from datetime import datetime
+
+import numpy as np
+
+MUESTRAS_POR_ETAPA = 500
+RUTA_LOG = os.environ.get("EA_LOG_TIEMPOS")
+
+_local = threading.local()
+_lock = threading.Lock()
+_muestras = defaultdict(lambda: deque(maxlen=MUESTRAS_POR_ETAPA))
+
+
+class Span:
+    __slots__ = ("etapa", "filas", "inicio", "ms")
+
+    def __init__(self, etapa: str, filas=None):
+        self.etapa = etapa
+        self.filas = filas
+        self.inicio = None
+        self.ms = None
+
+    def __enter__(self):
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.ms = (time.perf_counter() - self.inicio) * 1000
+        registrar(self.etapa, self.ms, self.filas, error=exc_type is not None)
+        return False
+
+
+def iniciar_rerun() -> str:
+    """Marca el inicio de un rerun en el hilo actual y devuelve su id."""
+    _local.rerun = uuid.uuid4().hex[:8]
+    return _local.rerun
+
+
+def rerun_actual():
+    return getattr(_local, "rerun", None)
+
+
+def etapa(nombre: str, filas=None) -> Span:
+    return Span(nombre, filas)
+
+
+def instrumentar(funcion, prefijo: str = "herramienta"):
+    """Envuelve una función (p. ej. una herramienta del agente) en un span '<prefijo>:<nombre>'.
+    functools.wraps conserva nombre, docstring y firma para el esquema de herramientas."""
+    @functools.wraps(funcion)
+    def envuelta(*args, **kwargs):
+        with etapa(f"{prefijo}:{funcion.__name__}"):
+            return funcion(*args, **kwargs)
+    return envuelta
+
+
+def registrar(nombre: str, ms: float, filas=None, error: bool = False):
+    muestra = {
+        "rerun": rerun_actual(),
+        "etapa": nombre,
+        "ms": round(ms, 3),
+        "filas": None if filas is None else int(filas),
+        "error": error,
+        "ts": datetime.now().isoformat(timespec="milliseconds"),
+    }
+    with _lock:
+        _muestras[nombre].append(muestra)
+        if RUTA_LOG:
+            with open(RUTA_LOG, "a", encoding="utf-8") as log:
+                log.write(json.dumps(muestra, ensure_ascii=False) + "\n")
+
+
+def resumen() -> list:
+    """p50/p95 por etapa sobre la ventana móvil, ordenado por p95 descendente."""
+    with _lock:
+        copia = {nombre: list(muestras) for nombre, muestras in _muestras.items()}
+    filas = []
+    for nombre, muestras in copia.items():
+        tiempos = np.array([m["ms"] for m in muestras])
+        ultima = muestras[-1]
+        filas.append({
+            "Etapa": nombre,
+            "N": len(tiempos),
+            "p50 ms": round(float(np.percentile(tiempos, 50)), 1),
+            "p95 ms": round(float(np.percentile(tiempos, 95)), 1),
+            "Último ms": round(ultima["ms"], 1),
+            "Filas": ultima["filas"],
+        })
+    return sorted(filas, key=lambda f: f["p95 ms"], reverse=True)
+
+
+def muestras() -> list:
+    """Todas las muestras de la ventana móvil, en orden de registro por etapa."""
+    with _lock:
+        return [m for muestras in _muestras.values() for m in muestras]
+
+
+def spans_de_rerun(rerun_id: str) -> list:
+    with _lock:
+        return [m for muestras in _muestras.values() for m in muestras if m["rerun"] == rerun_id]
+
+
+def reiniciar():
+    with _lock:
+        _muestras.clear()
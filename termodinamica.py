@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+"""
+Lógica termodinámica EA Innovation (Factor Z, Fv y volumen de helio).
+
+calcular_factores() es la única copia de las fórmulas y funciona igual con
+escalares, arreglos de numpy o Series de pandas. barrido() la evalúa sobre
+una malla temperatura x presión por broadcasting y presion_para_volumen()
+resuelve el problema inverso para muchos objetivos a la vez.
+
+Esquema compacto (EA_ESQUEMA_COMPACTO=1): los numéricos se guardan como
+float32, los textos repetidos como category, se descartan columnas vacías de
+la hoja y las columnas derivables ('Temperature Over', 'Volume Helium ft3',
+'Diferencia M3') no se almacenan: se calculan al leerlas con df.ea[columna].
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+BASE_VOLUME = 450.00
+FT3_POR_M3 = 35.315
+
+COLUMNAS_REQUERIDAS = ['Marca temporal', 'Temperatura Celsius', 'Presión']
+COLUMNAS_DERIVABLES = ['Temperature Over', 'Volume Helium ft3', 'Diferencia M3']
+# Orden en que calculate_thermodynamics agrega las columnas (esquema completo)
+COLUMNAS_CALCULADAS = [
+    'Temperatura Fahrenheit', 'Temperature Over', 'Vessel Pressure', 'Compressibility Factor (Z)',
+    'Volume Factor (Fv)', 'Volume Helium ft3', 'Volume in Cubic Meters ( M3 )', 'Diferencia M3',
+    'Consumo Absoluto M3',
+]
+
+ESQUEMA_COMPACTO = os.environ.get("EA_ESQUEMA_COMPACTO", "0") == "1"
+PRESION_MAX_PSI = 3000.0 # Rango del solver inverso (el volumen crece con la presión en 0-3000 PSI)
+
+
+def calcular_factores(temp_c, presion_psi):
+    """Devuelve (temp_f, vessel_pressure, factor_z, factor_fv, volumen_m3)."""
+    temp_f = temp_c * 1.8 + 32
+    vessel_pres = presion_psi + 14.7
+
+    t_term = 459.7 + temp_f
+    part1 = 0.000102297 - (0.000000192998 * t_term) + (0.00000000011836 * (t_term**2))
+    z_factor = 1 + (part1 * vessel_pres) - (0.0000000002217 * (vessel_pres**2))
+
+    f_temp = 529.7 / (temp_f + 459.7)
+    f_pres = vessel_pres / 14.7
+    f_comp = 1.00049 / z_factor
+    f_exp_metal = 1 + (0.0000189 * (temp_f - 70))
+    f_pres_efect = 1 + (0.00000074 * vessel_pres)
+    fv = f_temp * f_pres * f_comp * f_exp_metal * f_pres_efect
+
+    vol_m3 = (BASE_VOLUME * fv) / FT3_POR_M3
+    return temp_f, vessel_pres, z_factor, fv, vol_m3
+
+
+def barrido(temps_c, presiones_psi) -> pd.DataFrame:
+    """Evalúa toda la malla temperatura x presión en una sola pasada (formato largo)."""
+    t = np.asarray(temps_c, dtype=float)[:, None]
+    p = np.asarray(presiones_psi, dtype=float)[None, :]
+    _, vessel_pres, z_factor, fv, vol_m3 = calcular_factores(t, p)
+    t, p, z_factor, fv, vol_m3 = np.broadcast_arrays(t, p, z_factor, fv, vol_m3)
+    return pd.DataFrame({
+        'Temperatura Celsius': t.ravel(),
+        'Presión': p.ravel(),
+        'Factor_Z': z_factor.ravel(),
+        'Factor_Fv': fv.ravel(),
+        'Volumen_M3': vol_m3.ravel(),
+    })
+
+
+def presion_para_volumen(volumen_m3, temp_c, tolerancia_psi: float = 1e-6):
+    """
+    Presión manométrica (PSI) que da volumen_m3 a temp_c, por bisección
+    vectorizada sobre todos los objetivos a la vez. NaN si el objetivo queda
+    fuera de [0, PRESION_MAX_PSI].
+    """
+    volumen, temp = np.broadcast_arrays(np.asarray(volumen_m3, dtype=float), np.asarray(temp_c, dtype=float))
+    bajo = np.zeros(volumen.shape)
+    alto = np.full(volumen.shape, PRESION_MAX_PSI)
+    fuera = (volumen < calcular_factores(temp, bajo)[4]) | (volumen > calcular_factores(temp, alto)[4])
+    while (alto - bajo).max(initial=0.0) > tolerancia_psi:
+        medio = (bajo + alto) / 2
+        debajo = calcular_factores(temp, medio)[4] < volumen
+        bajo = np.where(debajo, medio, bajo)
+        alto = np.where(debajo, alto, medio)
+    presion = np.where(fuera, np.nan, (bajo + alto) / 2)
+    return presion if presion.ndim else float(presion)
+
+
+def usar_columna(nombre: str, compacto: bool = None) -> bool:
+    """
+    Filtro de columnas de la hoja: descarta las que no tienen encabezado y, en
+    esquema compacto, las 'Unnamed: N' (el esquema completo conserva la hoja tal cual).
+    """
+    if compacto is None:
+        compacto = ESQUEMA_COMPACTO
+    nombre = str(nombre)
+    return bool(nombre.strip()) and not (compacto and nombre.startswith('Unnamed'))
+
+
+def calculate_thermodynamics(df_input, compacto: bool = None):
+    if compacto is None:
+        compacto = ESQUEMA_COMPACTO
+
+    df = df_input.copy()
+    # La ingesta ya entrega columnas tipadas; solo se convierte lo que venga como texto
+    if not pd.api.types.is_datetime64_any_dtype(df['Marca temporal']):
+        df['Marca temporal'] = pd.to_datetime(df['Marca temporal'])
+    df = df.sort_values('Marca temporal') # Re-ordenar por si cambió el tiempo
+
+    cols_check = ['Temperatura Celsius', 'Presión']
+    for col in cols_check:
+        if not pd.api.types.is_numeric_dtype(df[col]):
+            df[col] = pd.to_numeric(df[col], errors='coerce')
+
+    df = df.dropna(subset=cols_check)
+
+    temp_f, vessel_pres, z_factor, fv, vol_m3 = calcular_factores(df['Temperatura Celsius'], df['Presión'])
+    df['Temperatura Fahrenheit'] = temp_f
+    df['Temperature Over'] = df['Temperatura Fahrenheit']
+    df['Vessel Pressure'] = vessel_pres
+    df['Compressibility Factor (Z)'] = z_factor
+    df['Volume Factor (Fv)'] = fv
+    df['Volume Helium ft3'] = (BASE_VOLUME * df['Volume Factor (Fv)'])
+    df['Volume in Cubic Meters ( M3 )'] = vol_m3
+
+    df['Diferencia M3'] = df['Volume in Cubic Meters ( M3 )'].diff().fillna(0)
+    df['Consumo Absoluto M3'] = df['Diferencia M3'].abs()
+
+    if compacto:
+        df = compactar(df)
+    return df
+
+
+def compactar(df):
+    """Convierte un frame ya calculado al esquema compacto."""
+    df = df.drop(columns=[c for c in COLUMNAS_DERIVABLES if c in df.columns])
+    for col in df.columns:
+        serie = df[col]
+        if pd.api.types.is_float_dtype(serie):
+            df[col] = serie.astype(np.float32)
+        elif pd.api.types.is_integer_dtype(serie):
+            df[col] = pd.to_numeric(serie, downcast='integer')
+        elif serie.dtype == object or pd.api.types.is_string_dtype(serie):
+            if serie.isna().all():
+                df = df.drop(columns=col)
+            elif serie.nunique(dropna=True) <= max(1, len(serie) // 2):
+                df[col] = serie.astype('category')
+    return df
+
+
+def columna_derivada(df, nombre: str, anterior=None):
+    """
+    Calcula una columna derivable a partir de las almacenadas.
+    'anterior' es el volumen M3 de la fila previa al bloque (para exportar por bloques).
+    """
+    if nombre == 'Temperature Over':
+        return df['Temperatura Fahrenheit']
+    if nombre == 'Volume Helium ft3':
+        return df['Volume in Cubic Meters ( M3 )'].astype(np.float64) * FT3_POR_M3
+    if nombre == 'Diferencia M3':
+        volumen = df['Volume in Cubic Meters ( M3 )'].astype(np.float64)
+        diferencia = volumen.diff()
+        if len(volumen):
+            diferencia.iloc[0] = 0.0 if anterior is None else volumen.iloc[0] - anterior
+        return diferencia
+    raise KeyError(nombre)
+
+
+def materializar(df, anterior=None):
+    """Devuelve df con las columnas derivables presentes, en el orden del esquema completo (para exportar)."""
+    faltantes = [c for c in COLUMNAS_DERIVABLES if c not in df.columns]
+    if not faltantes:
+        return df
+    df = df.copy()
+    for col in faltantes:
+        df[col] = columna_derivada(df, col, anterior)
+    calculadas = [c for c in COLUMNAS_CALCULADAS if c in df.columns]
+    return df[[c for c in df.columns if c not in calculadas] + calculadas]
+
+
+@pd.api.extensions.register_dataframe_accessor("ea")
+class EAAccessor:
+    """df.ea['Volume Helium ft3'] funciona igual en esquema completo y compacto."""
+
+    def __init__(self, df):
+        self._df = df
+
+    def __getitem__(self, nombre):
+        if nombre in self._df.columns:
+            return self._df[nombre]
+        return columna_derivada(self._df, nombre)
+
+
+def reporte_memoria(df_completo, df_compacto) -> pd.DataFrame:
+    """Bytes por columna en ambos esquemas (las derivables cuentan 0 en el compacto)."""
+    antes = df_completo.memory_usage(deep=True, index=False)
+    despues = df_compacto.memory_usage(deep=True, index=False).reindex(antes.index, fill_value=0)
+    reporte = pd.DataFrame({
+        'dtype_completo': df_completo.dtypes.astype(str),
+        'dtype_compacto': df_compacto.dtypes.astype(str).reindex(antes.index).fillna('derivada'),
+        'bytes_completo': antes,
+        'bytes_compacto': despues,
+    })
+    reporte['ahorro_%'] = (100 * (1 - reporte['bytes_compacto'] / reporte['bytes_completo'])).round(1)
+    total = reporte[['bytes_completo', 'bytes_compacto']].sum()
+    reporte.loc['TOTAL'] = ['', '', total['bytes_completo'], total['bytes_compacto'],
+                            round(100 * (1 - total['bytes_compacto'] / total['bytes_completo']), 1)]
+    return reporte
+
+
+def historial_sintetico(n: int, semilla: int = 0) -> pd.DataFrame:
+    """Historial con la forma de la hoja del formulario, para pruebas de escala."""
+    rng = np.random.default_rng(semilla)
+    return pd.DataFrame({
+        'Marca temporal': pd.date_range(end=pd.Timestamp.now().floor('min'), periods=n, freq='min'),
+        'Dirección de correo electrónico': rng.choice(['erik@ea.mx', 'operador1@ea.mx', 'operador2@ea.mx'], n),
+        'Temperatura Celsius': (22 + 3 * np.sin(np.arange(n) / 200) + rng.normal(0, 0.3, n)).round(2),
+        'Presión': (150 + 30 * np.sin(np.arange(n) / 5000) + rng.normal(0, 0.5, n)).round(2),
+        'Comentarios': rng.choice(['', 'OK', 'Revisar válvula'], n),
+    })
@@ -0,0 +1,23 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+pytest.importorskip("streamlit.testing.v1")
+
+import prueba_arranque  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def arranque():
+    return prueba_arranque.medir()
+
+
+def test_primer_render_sin_errores(arranque):
+    assert arranque["errores"] == []
+
+
+def test_presupuesto_de_arranque(arranque):
+    assert arranque["render_ms"] <= prueba_arranque.PRESUPUESTO_MS, arranque["mas_costosos"]
+
+
+def test_modulos_diferidos_no_se_cargan(arranque):
+    assert arranque["diferidos_cargados"] == []
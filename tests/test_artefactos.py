@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+import threading
+
+import numpy as np
+
+import artefactos
+
+
+def _grafo(almacen=None):
+    llamadas = []
+
+    def doble(x):
+        llamadas.append("doble")
+        return x * 2
+
+    def suma(a, b):
+        llamadas.append("suma")
+        return a + b
+
+    grafo = (artefactos.GrafoArtefactos(almacen or artefactos.AlmacenCompartido())
+             .fuente("a").fuente("b")
+             .derivado("doble", doble, ["a"], compartir=True)
+             .derivado("suma", suma, ["doble", "b"]))
+    return grafo, llamadas
+
+
+def test_cambio_de_version_invalida_solo_aguas_abajo():
+    grafo, llamadas = _grafo()
+    grafo.fijar("a", 1, 10)
+    grafo.fijar("b", 1, 1)
+    assert grafo.obtener("suma") == 21
+    assert grafo.obtener("suma") == 21
+    assert llamadas == ["doble", "suma"]
+
+    # Misma versión: no invalida aunque llegue otro valor
+    assert not grafo.fijar("a", 1, 99)
+    assert grafo.obtener("suma") == 21
+
+    assert grafo.fijar("b", 2, 5)
+    assert grafo.obtener("suma") == 25
+    assert llamadas == ["doble", "suma", "suma"]
+
+    version = grafo.version("suma")
+    grafo.fijar("a", 2, 20)
+    assert grafo.version("suma") != version
+    assert grafo.obtener("suma") == 45
+    assert grafo.recalculos == {"doble": 2, "suma": 3}
+
+
+def test_grafos_con_los_mismos_datos_comparten_valores():
+    almacen = artefactos.AlmacenCompartido()
+    uno, llamadas_uno = _grafo(almacen)
+    otro, llamadas_otro = _grafo(almacen)
+    for grafo in (uno, otro):
+        grafo.fijar("a", "v1", 10)
+        grafo.fijar("b", "v1", 1)
+    assert uno.obtener("suma") == otro.obtener("suma") == 21
+    assert uno.version("doble") == otro.version("doble")
+    # 'doble' se comparte; 'suma' no
+    assert llamadas_uno == ["doble", "suma"]
+    assert llamadas_otro == ["suma"]
+
+
+def test_cargador_difiere_la_lectura():
+    grafo, _ = _grafo()
+    leidas = []
+    grafo.fijar("a", 1, cargador=lambda: leidas.append(1) or 10)
+    grafo.fijar("b", 1, 1)
+    assert leidas == []
+    assert grafo.obtener("suma") == 21
+    assert leidas == [1]
+
+
+def test_liberar_y_desalojar_recuperan_en_el_siguiente_obtener():
+    grafo, llamadas = _grafo()
+    leidas = []
+    grafo.fijar("a", 1, cargador=lambda: leidas.append(1) or 10)
+    grafo.fijar("b", 1, 1)
+    grafo.obtener("suma")
+
+    grafo.liberar("suma")
+    grafo.liberar("b") # Fuente sin cargador: no se puede recuperar, se conserva
+    assert set(grafo.valores()) == {"a", "b", "doble"}
+    assert grafo.obtener("suma") == 21
+    assert llamadas == ["doble", "suma", "suma"]
+
+    assert sorted(grafo.desalojar()) == ["a", "doble", "suma"]
+    assert set(grafo.valores()) == {"b"}
+    assert grafo.obtener("suma") == 21
+    # 'doble' vuelve del almacén compartido sin recalcularse ni releer 'a'
+    assert llamadas == ["doble", "suma", "suma", "suma"]
+    assert leidas == [1]
+    assert grafo.obtener("a") == 10
+    assert leidas == [1, 1]
+
+
+def test_desalojar_no_espera_a_la_sesion_duena():
+    grafo, _ = _grafo()
+    grafo.fijar("a", 1, 10)
+    grafo.fijar("b", 1, 1)
+    grafo.obtener("suma")
+    resultado = []
+    with grafo._lock:
+        hilo = threading.Thread(target=lambda: resultado.append(grafo.desalojar()))
+        hilo.start()
+        hilo.join()
+    assert resultado == [None]
+    assert "suma" in grafo.valores()
+
+
+def test_almacen_lru_por_entradas():
+    almacen = artefactos.AlmacenCompartido(max_entradas=2, max_bytes=2**30)
+    almacen.guardar("a", 1)
+    almacen.guardar("b", 2)
+    assert almacen.obtener("a") == (True, 1) # 'a' pasa a ser la más reciente
+    almacen.guardar("c", 3)
+    assert [clave for clave, _, _ in almacen.valores()] == ["a", "c"]
+    assert almacen.obtener("b") == (False, None)
+
+
+def test_almacen_lru_por_bytes():
+    kb = np.zeros(1024, dtype=np.uint8)
+    almacen = artefactos.AlmacenCompartido(max_entradas=100, max_bytes=2_500)
+    for clave in "abc":
+        almacen.guardar(clave, kb.copy())
+    assert [clave for clave, _, _ in almacen.valores()] == ["b", "c"]
+    assert almacen.bytes == 2_048
+
+    # Reemplazar una clave no cuenta sus bytes dos veces
+    almacen.guardar("c", kb.copy())
+    assert almacen.bytes == 2_048
+
+    # Una entrada que sola excede el límite se conserva, sola
+    almacen.guardar("grande", np.zeros(10_000, dtype=np.uint8))
+    assert [clave for clave, _, _ in almacen.valores()] == ["grande"]
+    assert almacen.bytes == 10_000
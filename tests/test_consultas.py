@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+import pandas as pd
+import pytest
+
+import consultas
+
+
+@pytest.fixture(params=["sqlite", "duckdb"])
+def motor(request):
+    if request.param == "duckdb" and not consultas.duckdb_disponible():
+        pytest.skip("duckdb no instalado")
+    cuarentena = pd.DataFrame({
+        "Marca temporal": pd.date_range("2026-01-01", periods=50, freq="h"),
+        "Temperatura Celsius": [25.0] * 50,
+        "Presión": range(50),
+        "Motivo": ["presión fuera de rango"] * 50,
+    })
+    return consultas.MotorConsultas({"cuarentena": cuarentena}, usar_duckdb=request.param == "duckdb")
+
+
+def test_select(motor):
+    df, truncado = motor.consultar("SELECT COUNT(*) AS n, MAX(presion_psi) AS maximo FROM cuarentena;")
+    assert not truncado
+    assert df.loc[0, "n"] == 50 and df.loc[0, "maximo"] == 49
+
+
+def test_limite_de_filas(motor):
+    df, truncado = motor.consultar("SELECT fila FROM cuarentena ORDER BY fila", max_filas=10)
+    assert truncado
+    assert df["fila"].tolist() == list(range(10))
+    assert not motor.consultar("SELECT fila FROM cuarentena", max_filas=50)[1]
+
+
+@pytest.mark.parametrize("consulta", [
+    "DELETE FROM cuarentena",
+    "DROP TABLE cuarentena",
+    "PRAGMA table_info(cuarentena)",
+    "ATTACH DATABASE 'otra.db' AS otra",
+])
+def test_solo_select(motor, consulta):
+    with pytest.raises(consultas.ConsultaRechazada):
+        motor.consultar(consulta)
+
+
+def test_una_sola_sentencia(motor):
+    with pytest.raises(Exception):
+        motor.consultar("SELECT 1; DELETE FROM cuarentena")
+    assert motor.consultar("SELECT COUNT(*) AS n FROM cuarentena")[0].loc[0, "n"] == 50
+
+
+def test_sin_acceso_a_archivos(motor, tmp_path):
+    ruta = tmp_path / "secreto.csv"
+    ruta.write_text("a\n1\n")
+    funcion = "read_csv_auto" if motor.motor == "duckdb" else "readfile"
+    with pytest.raises(Exception):
+        motor.consultar(f"SELECT * FROM {funcion}('{ruta}')")
@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+import pandas as pd
+import pytest
+
+import consumo
+import termodinamica  # noqa: F401  (registra el accesor df.ea)
+
+
+def _indice(volumenes, umbral=5.0):
+    historial = pd.DataFrame({
+        "Marca temporal": pd.date_range("2026-01-01", periods=len(volumenes), freq="h"),
+        "Volume in Cubic Meters ( M3 )": volumenes,
+    })
+    historial["Diferencia M3"] = historial["Volume in Cubic Meters ( M3 )"].diff().fillna(0.0)
+    return consumo.IndiceConsumo(historial, umbral_recarga=umbral)
+
+
+def test_subidas_menores_no_restan_consumo():
+    # Recarga lenta: varias subidas por debajo del umbral entre bajadas
+    resumen = _indice([100.0, 99.0, 101.0, 103.0, 102.5, 104.0]).rango()
+    assert resumen["consumo_m3"] == pytest.approx(1.5)
+    assert resumen["subida_menor_m3"] == pytest.approx(5.5)
+    assert resumen["recarga_m3"] == 0
+    assert resumen["recargas"] == 0
+    assert resumen["neto_m3"] == pytest.approx(4.0)
+
+
+def test_recarga_sobre_el_umbral():
+    indice = _indice([100.0, 98.0, 96.0, 120.0, 119.0, 119.5])
+    resumen = indice.rango()
+    assert resumen["consumo_m3"] == pytest.approx(5.0)
+    assert resumen["recarga_m3"] == pytest.approx(24.0)
+    assert resumen["subida_menor_m3"] == pytest.approx(0.5)
+    assert resumen["recargas"] == 1
+    assert resumen["neto_m3"] == pytest.approx(19.5)
+    eventos = indice.recargas()
+    assert eventos["Recarga M3"].tolist() == [24.0]
+    assert eventos["Inicio"].iloc[0] == pd.Timestamp("2026-01-01 02:00")
+
+
+def test_rango_cuenta_cambios_que_terminan_dentro():
+    indice = _indice([100.0, 99.0, 97.0, 96.0, 100.0])
+    # (01:00, 03:00]: los cambios que terminan a las 02:00 y 03:00
+    resumen = indice.rango("2026-01-01 01:00", "2026-01-01 03:00")
+    assert resumen["lecturas"] == 2
+    assert resumen["consumo_m3"] == pytest.approx(3.0)
+    assert indice.rango("2026-01-02", "2026-01-03")["lecturas"] == 0
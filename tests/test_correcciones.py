@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+import pandas as pd
+import pytest
+
+import correcciones
+
+
+def _parche(fila, columna, nuevo, anterior=0.0):
+    return {"fila": fila, "columna": columna, "anterior": anterior, "nuevo": nuevo}
+
+
+def test_conflicto_en_la_misma_celda(tmp_path):
+    registro = correcciones.RegistroCorrecciones(str(tmp_path / "correcciones.db"))
+    leida = registro.version()
+    registro.registrar([_parche(1, "Presión", 1000.0)], "a", leida)
+    with pytest.raises(correcciones.ConflictoEdicion):
+        registro.registrar([_parche(1, "Presión", 1001.0)], "b", leida)
+    # Otra celda no choca, y con la versión al día tampoco
+    registro.registrar([_parche(2, "Presión", 1002.0)], "b", leida)
+    assert registro.registrar([_parche(1, "Presión", 1003.0)], "b", registro.version()) == 3
+
+
+def test_estado_desde_snapshot_mas_eventos(tmp_path):
+    ruta = str(tmp_path / "correcciones.db")
+    registro = correcciones.RegistroCorrecciones(ruta, eventos_por_snapshot=2)
+    for i, valor in enumerate([1.0, 2.0, 3.0, 4.0, 5.0]):
+        registro.registrar([_parche(i % 2, "Presión", valor)], "a", registro.version())
+    assert registro._ultimo_snapshot()[0] == 4
+
+    version, estado = registro.estado()
+    assert version == 5
+    assert estado == {(0, "Presión"): "5.0", (1, "Presión"): "4.0"}
+    # Mismo estado que reproducir toda la bitácora sin snapshots
+    assert correcciones.RegistroCorrecciones(str(tmp_path / "otra.db")).estado() == (0, {})
+    sin_snapshot = correcciones.RegistroCorrecciones(ruta, eventos_por_snapshot=10**9)
+    assert sin_snapshot.estado() == (version, estado)
+
+
+def test_aplicar_estado(tmp_path):
+    registro = correcciones.RegistroCorrecciones(str(tmp_path / "correcciones.db"))
+    nueva = pd.Timestamp("2026-01-02 10:00:00")
+    registro.registrar([_parche(7, "Marca temporal", nueva, pd.Timestamp("2026-01-01 10:00:00")),
+                        _parche(8, "Presión", 950.0),
+                        _parche(99, "Presión", 1.0)], "a", 0)
+    df = pd.DataFrame({"Marca temporal": pd.to_datetime(["2026-01-01 10:00:00"] * 2), "Presión": [1000.0, 1010.0]},
+                      index=[7, 8])
+    df, version = registro.aplicar(df)
+    assert version == 3
+    assert df.at[7, "Marca temporal"] == nueva
+    assert df.at[8, "Presión"] == 950.0
+    assert 99 not in df.index
+
+
+def test_correccion_fraccionaria_o_vacia_en_columna_entera(tmp_path):
+    registro = correcciones.RegistroCorrecciones(str(tmp_path / "correcciones.db"))
+    registro.registrar([_parche(0, "Presión", 150.5, 150), _parche(1, "Presión", None, 151),
+                        _parche(1, "Temperatura Celsius", 26.5, 26)], "a", 0)
+    df = pd.DataFrame({"Presión": [150, 151, 152], "Temperatura Celsius": [25, 26, 27], "Lecturas": [1, 2, 3]})
+    df, _ = registro.aplicar(df)
+    assert df["Presión"].tolist()[0] == 150.5
+    assert pd.isna(df.at[1, "Presión"])
+    assert df.at[1, "Temperatura Celsius"] == 26.5
+    assert df["Lecturas"].dtype == "int64"
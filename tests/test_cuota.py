@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+import time
+
+import pytest
+
+import cuota
+
+
+def test_cubeta_toma_y_rellena():
+    cubeta = cuota.CubetaTokens(capacidad=2, por_segundo=20)
+    assert cubeta.tomar() and cubeta.tomar()
+    assert not cubeta.tomar()
+    assert cubeta.tomar(espera_max_s=1)
+    cubeta.cargar(3)
+    assert cubeta.tokens < 0
+    assert not cubeta.tomar(espera_max_s=0.01)
+
+
+def test_cubeta_no_pasa_de_su_capacidad():
+    cubeta = cuota.CubetaTokens(capacidad=1, por_segundo=1000)
+    time.sleep(0.01)
+    assert cubeta.tomar()
+    assert not cubeta.tomar()
+
+
+def test_cuota_diaria_limite_y_cambio_de_dia(tmp_path, monkeypatch):
+    diaria = cuota.CuotaDiaria(limite=2, ruta=str(tmp_path / "cuota.db"))
+    monkeypatch.setattr(diaria, "_dia", lambda: "2026-01-01")
+    assert diaria.reservar() and diaria.reservar()
+    assert not diaria.reservar()
+    diaria.cargar(-1)
+    assert diaria.reservar()
+    assert diaria.usadas() == 2
+
+    monkeypatch.setattr(diaria, "_dia", lambda: "2026-01-02")
+    assert diaria.usadas() == 0
+    assert diaria.reservar()
+    # El uso se guarda en disco: otra instancia ve el mismo contador
+    otra = cuota.CuotaDiaria(limite=2, ruta=diaria.ruta)
+    monkeypatch.setattr(otra, "_dia", lambda: "2026-01-02")
+    assert otra.usadas() == 1
+
+
+@pytest.fixture
+def gestor(tmp_path):
+    return cuota.GestorCuota(por_minuto=60, por_dia=3, ruta=str(tmp_path / "cuota.db"))
+
+
+def test_gestor_cache_y_respaldo(gestor):
+    llamadas = []
+
+    def generar():
+        llamadas.append(1)
+        return "respuesta", 2, True
+
+    assert gestor.responder("hola", generar, lambda: "respaldo") == ("respuesta", "api")
+    assert gestor.responder("hola", generar, lambda: "respaldo") == ("respuesta", "cache")
+    assert len(llamadas) == 1
+    # La llamada con herramienta hizo dos solicitudes: la cuota diaria (3) ya está agotada
+    assert gestor.dia.usadas() == 2
+    assert gestor.responder("otra", generar, lambda: "respaldo") == ("respuesta", "api")
+    assert gestor.responder("otra más", generar, lambda: "respaldo") == ("respaldo", "respaldo")
+
+
+def test_gestor_no_guarda_turnos_con_efectos(gestor):
+    llamadas = []
+
+    def generar():
+        llamadas.append(1)
+        return "alerta enviada", 1, False
+
+    assert gestor.responder("alerta", generar, lambda: "respaldo") == ("alerta enviada", "api")
+    assert gestor.responder("alerta", generar, lambda: "respaldo") == ("alerta enviada", "api")
+    assert len(llamadas) == 2
+
+
+def test_gestor_cuota_agotada_usa_respaldo(gestor):
+    class ResourceExhausted(Exception):
+        pass
+
+    def generar():
+        raise ResourceExhausted("429")
+
+    assert gestor.responder("hola", generar, lambda: "respaldo") == ("respaldo", "respaldo")
@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+import pandas as pd
+
+import ediciones
+
+
+def _historial():
+    return pd.DataFrame({
+        "Marca temporal": pd.to_datetime(["2026-01-01 10:00:00", "2026-01-01 11:00:00", "2026-01-01 12:00:00"]),
+        "Temperatura Celsius": [25.0, 26.0, float("nan")],
+        "Presión": [1000.0, 1010.0, 1020.0],
+        "Volume Factor (Fv)": [9.4, 9.5, 9.6],
+    }, index=[10, 11, 12])
+
+
+def test_posiciones_de_pagina_a_fila():
+    df = _historial()
+    parches = ediciones.construir_parches({"1": {"Presión": 999}}, [12, 10], df)
+    assert parches == [{"fila": 10, "columna": "Presión", "anterior": 1000.0, "nuevo": 999.0}]
+
+
+def test_columnas_no_editables_y_valores_iguales_se_omiten():
+    df = _historial()
+    edited_rows = {
+        0: {"Volume Factor (Fv)": 1.0, "Presión": 1010},
+        1: {"Temperatura Celsius": None},
+    }
+    assert ediciones.construir_parches(edited_rows, [11, 12], df) == []
+
+
+def test_marca_temporal_se_convierte():
+    df = _historial()
+    parches = ediciones.construir_parches({0: {"Marca temporal": "2026-01-02T10:00:00"}}, [10], df)
+    assert parches[0]["nuevo"] == pd.Timestamp("2026-01-02 10:00:00")
+    assert parches[0]["anterior"] == pd.Timestamp("2026-01-01 10:00:00")
@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+import gzip
+import io
+
+import pandas as pd
+import pytest
+
+import exportar
+import termodinamica
+
+
+@pytest.fixture
+def historial():
+    return termodinamica.calculate_thermodynamics(termodinamica.historial_sintetico(1_000))
+
+
+@pytest.fixture(autouse=True)
+def cache_vacia(monkeypatch):
+    monkeypatch.setattr(exportar, "_cache", type(exportar._cache)())
+    monkeypatch.setattr(exportar, "_en_vuelo", {})
+
+
+@pytest.mark.parametrize("formato", exportar.formatos_disponibles())
+def test_exportacion_por_bloques(historial, formato):
+    destino = io.BytesIO()
+    if formato == "Parquet":
+        exportar.exportar_parquet(historial, destino, filas_por_bloque=300)
+        leido = pd.read_parquet(io.BytesIO(destino.getvalue()))
+    else:
+        exportar.exportar_csv(historial, destino, comprimir=formato != "CSV", filas_por_bloque=300)
+        contenido = destino.getvalue()
+        leido = pd.read_csv(io.BytesIO(gzip.decompress(contenido) if formato != "CSV" else contenido))
+    assert len(leido) == len(historial)
+    assert leido["Presión"].tolist() == historial["Presión"].tolist()
+
+
+def test_cache_reutiliza_y_cierra_al_desalojar(historial, monkeypatch):
+    monkeypatch.setattr(exportar, "MAX_EXPORTES_CACHE", 1)
+    primero = exportar.exportar_cacheado(historial, "v1", "CSV")
+    guardado = exportar._cache[("v1", "CSV")]
+    assert exportar.exportar_cacheado(historial, "v1", "CSV") == primero
+    assert guardado.tamano == len(primero)
+
+    exportar.exportar_cacheado(historial, "v2", "CSV")
+    assert list(exportar._cache) == [("v2", "CSV")]
+    assert guardado.archivo.closed
+    assert guardado.leer() is None
+
+
+def test_archivo_mayor_al_limite_no_se_guarda(historial, monkeypatch):
+    monkeypatch.setattr(exportar, "MAX_BYTES_EXPORTES", 1_000)
+    contenido = exportar.exportar_cacheado(historial, "v1", "CSV")
+    assert len(contenido) > 1_000
+    assert not exportar._cache
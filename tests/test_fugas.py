@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+from contextlib import closing
+
+import numpy as np
+import pandas as pd
+
+import fugas
+
+
+def _intervalos(*tramos):
+    return pd.DataFrame(
+        [(pd.Timestamp(inicio), pd.Timestamp(fin), 12, -0.8, 1.5, 25.0) for inicio, fin in tramos],
+        columns=['Inicio', 'Fin', 'Lecturas', 'Pendiente M3/h', 'Pérdida M3', 'Temp media C'],
+    )
+
+
+def _fijar_detectado(registro, detectado):
+    with closing(registro._conectar()) as con:
+        con.execute("UPDATE intervalos SET detectado = ?", (detectado,))
+
+
+def test_fuga_en_curso_conserva_su_primera_deteccion(tmp_path):
+    registro = fugas.RegistroFugas(str(tmp_path / "fugas.db"))
+    registro.guardar(_intervalos(("2026-01-01 10:00", "2026-01-01 16:00")))
+    _fijar_detectado(registro, "2026-01-01T16:05:00")
+
+    # El fin avanza con cada lectura nueva y el inicio puede recorrerse
+    registro.guardar(_intervalos(("2026-01-01 09:30", "2026-01-01 18:00"), ("2026-01-02 10:00", "2026-01-02 16:00")))
+    guardados = registro.consultar().sort_values("inicio")
+    assert guardados["detectado"].iloc[0] == "2026-01-01T16:05:00"
+    assert guardados["detectado"].iloc[1] > "2026-01-01T16:05:00"
+    assert guardados["fin"].iloc[0] == pd.Timestamp("2026-01-01 18:00")
+
+
+def test_intervalos_que_se_unen_conservan_la_deteccion_mas_antigua(tmp_path):
+    registro = fugas.RegistroFugas(str(tmp_path / "fugas.db"))
+    registro.guardar(_intervalos(("2026-01-01 10:00", "2026-01-01 12:00")))
+    _fijar_detectado(registro, "2026-01-01T12:05:00")
+    registro.guardar(_intervalos(("2026-01-01 10:00", "2026-01-01 12:00"), ("2026-01-01 14:00", "2026-01-01 16:00")))
+    with closing(registro._conectar()) as con:
+        con.execute("UPDATE intervalos SET detectado = '2026-01-01T16:05:00' WHERE inicio > '2026-01-01T13'")
+
+    registro.guardar(_intervalos(("2026-01-01 10:00", "2026-01-01 17:00")))
+    guardados = registro.consultar()
+    assert len(guardados) == 1
+    assert guardados["detectado"].iloc[0] == "2026-01-01T12:05:00"
+
+
+def test_pendientes_ventana_igual_a_polyfit():
+    rng = np.random.default_rng(0)
+    x_h = np.cumsum(rng.uniform(0.4, 0.6, 300)) + 10_000.0
+    y = 100 - 0.3 * x_h + rng.normal(0, 0.2, 300)
+    temp = 25 + rng.normal(0, 0.1, 300)
+    pendiente, _, _ = fugas.pendientes_ventana(x_h, y, temp, ventana=12, filas_por_bloque=64)
+    directa = [np.polyfit(x_h[i - 11:i + 1], y[i - 11:i + 1], 1)[0] for i in range(11, 300)]
+    assert np.isnan(pendiente[:11]).all()
+    np.testing.assert_allclose(pendiente[11:], directa, rtol=1e-6)
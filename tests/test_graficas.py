@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+import pyarrow as pa
+import pytest
+
+import graficas
+import termodinamica
+
+
+@pytest.fixture(scope="module")
+def historial():
+    return termodinamica.calculate_thermodynamics(termodinamica.historial_sintetico(300)).iloc[100:]
+
+
+def _leer(datos):
+    return pa.ipc.open_stream(datos).read_pandas()
+
+
+@pytest.mark.parametrize("tipo", ["tendencia", "multivariable", "boxplot", "histograma"])
+def test_datasets_viajan_en_arrow(historial, tipo):
+    spec = graficas.construir_spec(tipo, historial)
+    _, nombre, columnas = graficas.GRAFICAS[tipo]
+    leido = _leer(spec["datasets"][nombre])
+    assert list(leido.columns) == columnas
+    assert len(leido) == len(historial)
+    assert leido[columnas[-1]].tolist() == historial[columnas[-1]].tolist()
+
+
+def test_para_envio_no_altera_el_spec_guardado(historial):
+    spec = graficas.construir_spec("tendencia", historial)
+    copia = graficas.para_envio(spec)
+    copia["datasets"].clear()
+    assert spec["datasets"]
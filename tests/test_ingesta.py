@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+import pandas as pd
+import pytest
+
+import ingesta
+
+ENCABEZADO = "Marca temporal,Temperatura Celsius,Presión"
+FILA = "01/01/2026 10:00:00,25.5,1000"
+
+
+@pytest.fixture(params=["pyarrow", "pandas"])
+def lector(request, monkeypatch):
+    if request.param == "pyarrow" and not ingesta.pyarrow_disponible():
+        pytest.skip("pyarrow no instalado")
+    if request.param == "pandas":
+        monkeypatch.setattr(ingesta, "pyarrow_disponible", lambda: False)
+    return request.param
+
+
+@pytest.mark.parametrize("extra_encabezado, extra_valor", [("", ""), ("", "x"), ("  ", "x")])
+def test_encabezado_vacio_se_descarta(lector, extra_encabezado, extra_valor):
+    contenido = f"{ENCABEZADO},{extra_encabezado}\r\n{FILA},{extra_valor}\r\n".encode("utf-8")
+    df = ingesta.parsear_csv(contenido)
+    assert list(df.columns) == ["Marca temporal", "Temperatura Celsius", "Presión"]
+    assert df.loc[0, "Presión"] == 1000
+
+
+def test_enteros_se_leen_como_float64(lector):
+    contenido = f"{ENCABEZADO}\n{FILA.replace('25.5', '25')}\n01/01/2026 11:00:00,26,1010\n".encode("utf-8")
+    df = ingesta.parsear_csv(contenido)
+    assert df["Temperatura Celsius"].dtype == "float64"
+    assert df["Presión"].dtype == "float64"
+    assert df["Presión"].tolist() == [1000.0, 1010.0]
+
+
+def test_celda_no_numerica_se_convierte_en_nan(lector):
+    contenido = f"{ENCABEZADO}\n{FILA}\n01/01/2026 11:00:00,sin dato,1010\n".encode("utf-8")
+    df = ingesta.parsear_csv(contenido)
+    assert df["Temperatura Celsius"].dtype == "float64"
+    assert pd.isna(df.loc[1, "Temperatura Celsius"])
+    assert df.loc[1, "Presión"] == 1010
+
+
+def test_marca_en_otro_formato_se_infiere(lector):
+    contenido = f"{ENCABEZADO}\n2026-01-13 10:00:00,25.5,1000\n".encode("utf-8")
+    df = ingesta.parsear_csv(contenido)
+    assert df.loc[0, "Marca temporal"] == pd.Timestamp("2026-01-13 10:00:00")
+
+
+def test_fin_de_linea_crlf(lector):
+    contenido = f"{ENCABEZADO}\r\n{FILA}\r\n13/01/2026 10:00:00,26,1005\r\n".encode("utf-8")
+    df = ingesta.parsear_csv(contenido)
+    assert list(df.columns) == ["Marca temporal", "Temperatura Celsius", "Presión"]
+    assert df["Marca temporal"].tolist() == [pd.Timestamp("2026-01-01 10:00:00"), pd.Timestamp("2026-01-13 10:00:00")]
+    assert df["Presión"].tolist() == [1000, 1005]
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+import json
+import os
+import threading
+
+import pytest
+
+import perfilador
+
+
+@pytest.fixture(autouse=True)
+def directorio(tmp_path, monkeypatch):
+    monkeypatch.setattr(perfilador, "DIRECTORIO_PERFILES", str(tmp_path))
+    return tmp_path
+
+
+def _en_hilo(funcion):
+    resultado = {}
+
+    def correr():
+        try:
+            funcion(resultado)
+        except RuntimeError:
+            pass
+
+    hilo = threading.Thread(target=correr)
+    hilo.start()
+    hilo.join()
+    return resultado
+
+
+def test_captura_completa(directorio):
+    def rerun(resultado):
+        with perfilador.perfil("rerun", metadatos={"vista": "24h"}) as captura:
+            sum(i * i for i in range(200_000))
+        resultado["captura"] = captura
+
+    captura = _en_hilo(rerun)["captura"]
+    assert not captura.muestreador.is_alive()
+    base = os.path.join(directorio, captura.id)
+    assert os.path.exists(base + ".pstats") and os.path.exists(base + ".collapsed")
+    with open(base + ".json", encoding="utf-8") as f:
+        assert json.load(f)["vista"] == "24h"
+
+
+def test_hilo_que_termina_sin_cerrar_la_captura():
+    # Como un rerun cortado por st.stop o una excepción: nadie llama a finalizar()
+    def rerun(resultado):
+        resultado["captura"] = perfilador.iniciar("rerun")
+        raise RuntimeError("rerun interrumpido")
+
+    captura = _en_hilo(rerun)["captura"]
+    captura.muestreador.join(timeout=5)
+    assert not captura.muestreador.is_alive()
+    # El perfilador quedó libre para la siguiente captura
+    assert _en_hilo(lambda r: r.update(captura=perfilador.iniciar("otra")))["captura"] is not None
+
+
+def test_descartar_en_el_mismo_hilo():
+    def reruns(resultado):
+        primera = perfilador.iniciar("rerun")
+        assert perfilador.iniciar("rerun") is None
+        perfilador.descartar()
+        resultado["muestreador_vivo"] = primera.muestreador.is_alive()
+        resultado["segunda"] = perfilador.iniciar("rerun")
+        perfilador.descartar()
+
+    resultado = _en_hilo(reruns)
+    assert not resultado["muestreador_vivo"]
+    assert resultado["segunda"] is not None
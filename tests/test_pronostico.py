@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pandas as pd
+import pytest
+
+import pronostico
+
+
+@pytest.fixture(autouse=True)
+def modelo_vacio(monkeypatch):
+    monkeypatch.setattr(pronostico, "_modelo", {"firma": None, "pronosticador": None, "columnas": None})
+
+
+def _historial(filas=200):
+    volumen = 120.0 - 0.1 * np.arange(filas) + np.sin(np.arange(filas))
+    return pd.DataFrame({
+        "Marca temporal": pd.date_range("2026-01-01", periods=filas, freq="30min"),
+        "Volume in Cubic Meters ( M3 )": volumen,
+        "Consumo Absoluto M3": np.abs(np.diff(volumen, prepend=volumen[0])),
+    })
+
+
+def _ajuste_directo(historial):
+    return pronostico.PronosticadorEW().ajustar(*pronostico._columnas(historial)).coeficientes()
+
+
+def test_lecturas_nuevas_se_agregan_en_linea():
+    historial = _historial()
+    primero = pronostico._modelo_actualizado(historial.iloc[:150], firma=0)
+    segundo = pronostico._modelo_actualizado(historial, firma=0)
+    assert segundo is primero # Mismo modelo, actualizado con las 50 filas nuevas
+    assert segundo.n == 200
+    assert segundo.coeficientes() == pytest.approx(_ajuste_directo(historial))
+
+
+def test_cambio_en_una_fila_anterior_reajusta():
+    historial = _historial()
+    pronostico._modelo_actualizado(historial.iloc[:150], firma=0)
+    editado = historial.copy()
+    editado.loc[10, "Volume in Cubic Meters ( M3 )"] += 40.0
+    p = pronostico._modelo_actualizado(editado, firma=0)
+    assert p.coeficientes() == pytest.approx(_ajuste_directo(editado))
+    assert p.coeficientes() != pytest.approx(_ajuste_directo(historial))
+
+
+def test_lectura_tardia_y_cambio_de_firma_reajustan():
+    historial = _historial()
+    pronostico._modelo_actualizado(historial.drop(index=100), firma=0)
+    assert pronostico._modelo_actualizado(historial, firma=0).coeficientes() == pytest.approx(_ajuste_directo(historial))
+    anterior = pronostico._modelo["pronosticador"]
+    assert pronostico._modelo_actualizado(historial, firma=1) is not anterior
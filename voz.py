@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""
+Pipeline de voz de baja latencia para el EA Innovation Agent.
+
+El audio se procesa en memoria (sin archivos temporales ni upload_file),
+la transcripción corre en un hilo aparte con timeout y los resultados se
+guardan por digest SHA-256 del contenido para no transcribir dos veces la
+misma grabación.
+
+La llamada a Gemini lleva su propio timeout de red; si aun así un hilo queda
+colgado después del timeout de la página, se cuenta como abandonado y no se
+aceptan audios nuevos mientras todos los hilos del pool estén ocupados así.
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout
+
+PROMPT_TRANSCRIPCION = """
+Escucha este audio y transcribe exactamente lo que el usuario está diciendo.
+Si es una pregunta o comando relacionado con análisis de helio, termodinámica,
+gráficas o datos del sistema, devuelve el texto transcrito de forma clara.
+Solo devuelve la transcripción sin explicaciones adicionales.
+"""
+
+TIMEOUT_VOZ_S = 20.0
+MAX_TRANSCRIPCIONES_CACHE = 256
+HILOS_VOZ = 4
+
+_executor = ThreadPoolExecutor(max_workers=HILOS_VOZ, thread_name_prefix="ea-voz")
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+_abandonados = set() # Transcripciones que superaron el timeout y siguen ocupando un hilo
+
+
+class VozSaturada(RuntimeError):
+    pass
+
+
+def digest_audio(audio_bytes: bytes) -> str:
+    """Digest estable del contenido (hash() cambia entre procesos)."""
+    return hashlib.sha256(audio_bytes).hexdigest()
+
+
+class TranscriptorGemini:
+    """Transcribe enviando el audio inline (sin upload_file/delete_file)."""
+
+    def __init__(self, modelo: str, timeout: float = TIMEOUT_VOZ_S):
+        self.modelo = modelo
+        self.timeout = timeout
+
+    def __call__(self, audio_bytes: bytes, mime_type: str = "audio/wav") -> str:
+        import google.generativeai as genai
+
+        modelo_audio = genai.GenerativeModel(self.modelo)
+        respuesta = modelo_audio.generate_content(
+            [PROMPT_TRANSCRIPCION, {"mime_type": mime_type, "data": audio_bytes}],
+            request_options={"timeout": self.timeout}
+        )
+        return respuesta.text.strip()
+
+
+class TranscriptorLocal:
+    """Transcriptor sustituto para medir latencia de voz sin red."""
+
+    def __init__(self, texto: str = "Dame un diagnóstico del sistema", latencia_s: float = 0.0):
+        self.texto = texto
+        self.latencia_s = latencia_s
+
+    def __call__(self, audio_bytes: bytes, mime_type: str = "audio/wav") -> str:
+        if self.latencia_s:
+            time.sleep(self.latencia_s)
+        return self.texto
+
+
+def _guardar_en_cache(clave: str, texto: str):
+    with _cache_lock:
+        _cache[clave] = texto
+        _cache.move_to_end(clave)
+        while len(_cache) > MAX_TRANSCRIPCIONES_CACHE:
+            _cache.popitem(last=False)
+
+
+def transcripcion_en_cache(audio_bytes: bytes):
+    """Devuelve la transcripción guardada para este audio, o None."""
+    clave = digest_audio(audio_bytes)
+    with _cache_lock:
+        texto = _cache.get(clave)
+        if texto is not None:
+            _cache.move_to_end(clave)
+        return texto
+
+
+def _al_terminar_abandonado(clave: str, futuro):
+    with _cache_lock:
+        _abandonados.discard(futuro)
+    if not futuro.cancelled() and futuro.exception() is None and futuro.result():
+        _guardar_en_cache(clave, futuro.result()) # Si se vuelve a enviar la misma grabación ya está lista
+
+
+def transcribir(audio_bytes: bytes, transcriptor, timeout: float = TIMEOUT_VOZ_S, mime_type: str = "audio/wav"):
+    """
+    Transcribe audio en memoria fuera del hilo de render.
+    Lanza concurrent.futures.TimeoutError si el transcriptor excede el timeout,
+    y VozSaturada si todos los hilos siguen ocupados por transcripciones abandonadas.
+    """
+    if not audio_bytes:
+        return None
+
+    clave = digest_audio(audio_bytes)
+    texto = transcripcion_en_cache(audio_bytes)
+    if texto is not None:
+        return texto
+
+    with _cache_lock:
+        if len(_abandonados) >= HILOS_VOZ:
+            raise VozSaturada("El servicio de transcripción no responde; intenta en unos segundos.")
+    futuro = _executor.submit(transcriptor, audio_bytes, mime_type)
+    try:
+        texto = futuro.result(timeout=timeout)
+    except FuturesTimeout:
+        if not futuro.cancel(): # Ya corre: se libera solo cuando termine
+            with _cache_lock:
+                _abandonados.add(futuro)
+            futuro.add_done_callback(lambda f: _al_terminar_abandonado(clave, f))
+        raise
+
+    if texto:
+        _guardar_en_cache(clave, texto)
+    return texto